@@ -2,4 +2,12 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'
\ No newline at end of file
+    name = 'api'
+
+    def ready(self):
+        from . import signals # noqa: F401 (registers the receivers)
+        from . import jobs, metrics, resilience, singleflight
+        metrics.register_collector(metrics.cache_stats_collector)
+        metrics.register_collector(singleflight.singleflight_collector)
+        metrics.register_collector(resilience.resilience_collector)
+        metrics.register_collector(jobs.jobs_collector)
@@ -0,0 +1,358 @@
+# /superlingo_be/api/async_views.py
+"""
+Native async versions of the AI-backed endpoints: chat_with_tutor,
+generate_cloud_tts_audio and transcribe_audio, plus job_detail with the
+?wait=N long-poll.
+
+The sync views hold a worker thread for the whole Gemini/TTS/STT round trip.
+These use the async Google clients instead, so one ASGI process
+(`uvicorn superlingo_be.asgi:application`) can keep many upstream calls in
+flight. Request and response bodies are the same as the sync views; urls.py
+routes the existing paths here when ASYNC_AI_VIEWS is enabled.
+
+DRF has no async views, so authentication and JSON parsing are done here with
+the configured DRF authentication classes (run in a thread, they hit the DB).
+"""
+import asyncio
+import base64
+import functools
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import clients, jobs, tutor_sessions, views
+from .renderers import json_bytes
+from .parsers import UploadTooLarge, loads, max_audio_upload_bytes, read_limited
+from .audio_response import AUDIO_FORMATS, audio_response, not_modified_response
+from .tts_cache import get_tts_cache, tts_cache_key
+from .tutor import build_tutor_prompt, get_tutor_model, generation_config as tutor_generation_config
+from .tutor_cache import get_tutor_answer_cache, lesson_tags, tutor_answer_key
+from .metrics import timed
+from .models import Job
+from .singleflight import AsyncSingleFlight
+from .resilience import UpstreamUnavailable, upstream
+
+logger = logging.getLogger(__name__)
+
+
+# --- Async Google clients ---
+# grpc.aio clients are bound to the event loop that created them, so keep one per loop
+# (None: could not be configured, as clients._get does for the sync clients)
+_tts_clients = weakref.WeakKeyDictionary()
+_speech_clients = weakref.WeakKeyDictionary()
+
+
+def _load_module(get_module):
+    clients.require_credentials()
+    return get_module()
+
+
+async def _async_client(per_loop, name, get_module, client_class):
+    loop = asyncio.get_running_loop()
+    if loop not in per_loop:
+        try:
+            # The first import of a Google SDK takes a while; do it in a thread, not on the loop
+            module = await sync_to_async(_load_module, thread_sensitive=False)(get_module)
+            per_loop[loop] = getattr(module, client_class)()
+            logger.info("%s async client configured.", name)
+        except Exception as e:
+            logger.error("Could not configure %s async client: %s", name, e, exc_info=True)
+            per_loop[loop] = None
+    return per_loop[loop]
+
+
+async def _tts_async_client():
+    return await _async_client(_tts_clients, 'Google Cloud TTS', clients.texttospeech_module, 'TextToSpeechAsyncClient')
+
+
+async def _speech_async_client():
+    return await _async_client(_speech_clients, 'Google Cloud STT', clients.speech_module, 'SpeechAsyncClient')
+
+
+async def _gemini_ready():
+    # The first call imports and configures google.generativeai
+    return await sync_to_async(clients.gemini_ready, thread_sensitive=False)()
+
+
+# Identical concurrent upstream calls on this event loop share one request
+_tts_flight = AsyncSingleFlight('tts')
+_gemini_flight = AsyncSingleFlight('gemini')
+
+
+def _json(data, status=200):
+    # Same bytes as the sync views' renderer (UTF-8, so Korean replies aren't \u-escaped)
+    return HttpResponse(json_bytes(data), status=status, content_type='application/json')
+
+
+# --- Request plumbing (what @api_view does for the sync views) ---
+def _authenticate(request):
+    """Return (user, None) or (None, error response)."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.APIException as e:
+        return None, _unauthorized(e.detail)
+    if not (user and user.is_authenticated):
+        return None, _unauthorized(exceptions.NotAuthenticated.default_detail)
+    return user, None
+
+
+def _unauthorized(detail):
+    response = _json({'detail': str(detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def _parse_body(request, audio_upload=False):
+    """
+    Request body as a dict, like DRF's request.data for the JSON, multipart
+    and raw `audio/*` parsers the sync views accept. With `audio_upload` a
+    JSON body may be up to TRANSCRIBE_MAX_UPLOAD_BYTES (views.AUDIO_UPLOAD_PARSERS).
+    """
+    content_type = request.content_type or ''
+    if content_type.startswith('multipart/') or content_type == 'application/x-www-form-urlencoded':
+        return {**request.POST.dict(), **request.FILES.dict()}
+    if content_type.startswith('audio/'):
+        return {'audio': read_limited(request, max_audio_upload_bytes())}
+    body = read_limited(request, max_audio_upload_bytes()) if audio_upload else request.body
+    data = loads(body or b'{}')
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    return data
+
+
+def async_api_view(view=None, *, audio_upload=False):
+    """
+    POST-only, token-authenticated async view that receives the parsed body.
+    `@async_api_view(audio_upload=True)` for views that take recordings.
+    """
+    if view is None:
+        return functools.partial(async_api_view, audio_upload=audio_upload)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return _json({'detail': f'Method "{request.method}" not allowed.'},
+                         status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        user, error = await sync_to_async(_authenticate)(request)
+        if error is not None:
+            return error
+        request.user = user
+        too_large = audio_upload and views.upload_too_large(request.META)
+        if too_large:
+            return _json(too_large, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        try:
+            data = await sync_to_async(_parse_body, thread_sensitive=False)(request, audio_upload)
+        except UploadTooLarge as e:
+            return _json({'detail': str(e.detail)}, status=e.status_code)
+        except ValueError as e:
+            return _json({'detail': f'Parse error - {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        return await view(request, data, *args, **kwargs)
+
+    wrapper.csrf_exempt = True # Token auth, same as the DRF views
+    return wrapper
+
+
+# --- Views ---
+async def _ask_gemini(system_instruction, contents):
+    async with upstream('gemini').acall() as deadline:
+        with timed('gemini'):
+            response = await get_tutor_model(system_instruction).generate_content_async(
+                contents,
+                generation_config=tutor_generation_config(),
+                request_options={'timeout': deadline},
+            )
+    return views._extract_reply(response)
+
+
+async def _session_chat(session, system_instruction, prompt_content, user_message):
+    """Async counterpart of views._session_reply; the history reads and writes run in the sync thread."""
+    try:
+        contents = await sync_to_async(tutor_sessions.next_contents)(session, prompt_content)
+        logger.debug("Sending prompt to Gemini Chat (async, session %s). User: %s", session.pk, user_message)
+        ai_reply = await _ask_gemini(system_instruction, contents)
+        if views._is_cacheable_reply(ai_reply):
+            await sync_to_async(tutor_sessions.record_turn)(session, user_message, ai_reply)
+            await sync_to_async(tutor_sessions.schedule_fold)(session)
+        return _json({'reply': ai_reply, 'session_id': session.pk})
+
+    except UpstreamUnavailable as e:
+        logger.warning("Gemini unavailable: %s", e)
+        return _json({'reply': views.TUTOR_ERROR_REPLY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Error calling Gemini API: %s", e)
+        return _json({'reply': views.TUTOR_ERROR_REPLY}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view
+async def chat_with_tutor(request, data):
+    if not await _gemini_ready():
+        logger.error("Gemini model not initialized/configured.")
+        return _json({'error': 'AI model not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    user_message = data.get('message', '')
+    activity_context = data.get('context', {})
+    lesson_title = data.get('lesson_title', 'this lesson')
+
+    if not user_message: return _json({'error': 'No message provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        session = await sync_to_async(views.requested_tutor_session)(request.user, data, activity_context)
+    except tutor_sessions.SessionNotFound:
+        return _json(views.SESSION_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+
+    system_instruction, prompt_content = build_tutor_prompt(activity_context, user_message)
+    if session is not None:
+        return await _session_chat(session, system_instruction, prompt_content, user_message)
+
+    answer_cache = get_tutor_answer_cache()
+    answer_key = tutor_answer_key(system_instruction, activity_context, user_message)
+    if answer_cache is not None:
+        cached_reply = answer_cache.get(answer_key)
+        if cached_reply is not None:
+            return _json({'reply': cached_reply})
+
+    async def ask_gemini():
+        logger.debug("Sending prompt to Gemini Chat (async). User: %s", user_message)
+        return await _ask_gemini(system_instruction, prompt_content)
+
+    try:
+        ai_reply = await _gemini_flight.do(answer_key, ask_gemini)
+        if answer_cache is not None and views._is_cacheable_reply(ai_reply):
+            answer_cache.set(answer_key, ai_reply, tags=lesson_tags(data.get('lesson_id'), lesson_title))
+        return _json({'reply': ai_reply})
+
+    except UpstreamUnavailable as e:
+        logger.warning("Gemini unavailable: %s", e)
+        return _json({'reply': views.TUTOR_ERROR_REPLY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Error calling Gemini API: %s", e)
+        return _json({'reply': views.TUTOR_ERROR_REPLY}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def _synthesize_tts_audio(text, encoding='MP3'):
+    """Async counterpart of views.synthesize_tts_audio; cache file IO runs in a thread."""
+    cache = get_tts_cache()
+    key = tts_cache_key(text, views.TTS_VOICE_NAME, encoding)
+    audio = await sync_to_async(cache.get, thread_sensitive=False)(key)
+    if audio is not None:
+        return key, audio
+
+    async def fetch():
+        logger.debug("TTS cache miss, sending text to Google Cloud TTS (async): %r", text)
+        client = await _tts_async_client()
+        async with upstream('tts').acall() as deadline:
+            with timed('tts'):
+                response = await client.synthesize_speech(**views.tts_request(text, encoding), timeout=deadline)
+        await sync_to_async(cache.set, thread_sensitive=False)(key, response.audio_content)
+        return response.audio_content
+
+    return key, await _tts_flight.do(key, fetch)
+
+
+@async_api_view
+async def generate_cloud_tts_audio(request, data):
+    if await _tts_async_client() is None:
+        logger.error("Google Cloud TTS client not initialized/configured.")
+        return _json({'error': 'AI Audio model is not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    text_to_speak = data.get('text', '')
+    if not text_to_speak: return _json({'error': 'No text provided for audio'}, status=status.HTTP_400_BAD_REQUEST)
+
+    audio_format = views._requested_audio_format(request, data.get('audio_format'))
+    encoding, content_type = AUDIO_FORMATS[audio_format or 'mp3']
+    if audio_format:
+        not_modified = not_modified_response(request, tts_cache_key(text_to_speak, views.TTS_VOICE_NAME, encoding))
+        if not_modified is not None:
+            return not_modified
+
+    try:
+        key, audio_content = await _synthesize_tts_audio(text_to_speak, encoding)
+    except UpstreamUnavailable as e:
+        logger.warning("Google Cloud TTS unavailable: %s", e)
+        return _json({'error': f'Failed audio gen: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Error calling Google Cloud TTS API: %s", e)
+        return _json({'error': f'Failed audio gen: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if audio_format:
+        return audio_response(request, audio_content, content_type, key, stream=False)
+    audio_base64 = base64.b64encode(audio_content).decode('utf-8')
+    return _json({'audioUrl': f'data:audio/mpeg;base64,{audio_base64}'})
+
+
+def _read_and_prepare_audio(audio_upload, platform, data, query_params):
+    # Decoding and NumPy preprocessing are CPU work; keep them off the event loop
+    return views.prepare_stt_audio(views.read_upload_audio(audio_upload), platform, data, query_params)
+
+
+@async_api_view(audio_upload=True)
+async def transcribe_audio(request, data):
+    client = await _speech_async_client()
+    if client is None:
+        logger.error("Google Cloud STT client not initialized/configured.")
+        return _json({'error': 'Audio transcription not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    audio_upload, correct_prompt, platform = views.transcribe_inputs(data, request.GET, request.content_type or '')
+
+    if not audio_upload or not correct_prompt:
+        return _json({'error': 'Missing audio data or correct prompt'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        audio_content = await sync_to_async(_read_and_prepare_audio, thread_sensitive=False)(
+            audio_upload, platform, data, request.GET
+        )
+        if audio_content is None:
+            logger.debug("STT: silent clip rejected locally.")
+            return _json(dict(views.NO_SPEECH_RESULT))
+        audio = clients.speech_module().RecognitionAudio(content=audio_content)
+        async with upstream('stt').acall() as deadline:
+            with timed('stt'):
+                response = await client.recognize(
+                    config=views.recognition_config(platform), audio=audio, timeout=deadline
+                )
+        return _json(views.transcription_result(response, correct_prompt))
+
+    except UpstreamUnavailable as e:
+        logger.warning("Google Cloud STT unavailable: %s", e)
+        return _json({'error': f'Failed to transcribe audio: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Error calling Google Cloud STT API: %s", e)
+        return _json({'error': f'Failed to transcribe audio: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _get_job(user, job_id):
+    return Job.objects.filter(pk=job_id, user=user).defer('payload', 'audio').first()
+
+
+async def job_detail(request, job_id):
+    """
+    GET /api/jobs/<id>/, as views.job_detail. ?wait=N holds the request until
+    the job finishes or N seconds pass (capped at JOB_LONG_POLL_MAX); the
+    waiting is asyncio.sleep between short DB reads, not a blocked thread.
+    """
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'},
+                     status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    user, error = await sync_to_async(_authenticate)(request)
+    if error is not None:
+        return error
+
+    wait = request.GET.get('wait')
+    try:
+        seconds = min(max(float(wait), 0.0), settings.JOB_LONG_POLL_MAX) if wait else 0.0
+    except ValueError:
+        return _json({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = await sync_to_async(_get_job)(user, job_id)
+    if job is None:
+        return _json({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if seconds:
+        await jobs.wait(job, seconds)
+    return _json(views.job_response_body(job))
@@ -0,0 +1,105 @@
+# /superlingo_be/api/audio_preprocess.py
+"""
+Local clean-up of LINEAR16 recordings before they are sent to Cloud STT.
+
+Native clients record a few hundred ms of silence either side of the
+sentence. Trimming it (plus downmixing to mono and resampling to the 16 kHz
+the STT config declares) cuts the bytes uploaded to Google and the
+recognition time, and clips with no speech at all are rejected locally.
+
+All steps are vectorized NumPy over the whole clip. NumPy is optional: without
+it the audio is passed through unchanged.
+"""
+import io
+import wave
+
+try:
+    import numpy as np
+except ImportError: # pragma: no cover - optional dependency
+    np = None
+
+TARGET_SAMPLE_RATE = 16000
+FRAME_MS = 20
+# Frames quieter than this (dBFS) never count as speech
+SILENCE_FLOOR_DBFS = -50.0
+# ...and frames more than this far below the loudest frame are treated as background
+DYNAMIC_RANGE_DB = 35.0
+# A clip whose loudest frame is below this is "near-silent" and not worth sending
+MIN_PEAK_DBFS = -40.0
+MIN_SPEECH_MS = 100
+PADDING_MS = 200 # Kept either side of the detected speech so word edges aren't clipped
+
+
+def is_available():
+    return np is not None
+
+
+def _read_pcm(audio, sample_rate, channels):
+    """Return (int16 samples shaped (n, channels), sample_rate) for WAV or headerless PCM."""
+    if audio[:4] == b'RIFF' and audio[8:12] == b'WAVE':
+        try:
+            with wave.open(io.BytesIO(audio)) as wav:
+                if wav.getsampwidth() != 2:
+                    raise ValueError(f"Unsupported WAV sample width: {wav.getsampwidth() * 8} bits")
+                channels = wav.getnchannels()
+                sample_rate = wav.getframerate()
+                frames = wav.readframes(wav.getnframes())
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"Malformed WAV: {e}") from e
+    else:
+        frames = audio
+    usable = len(frames) - len(frames) % (2 * channels)
+    samples = np.frombuffer(frames[:usable], dtype='<i2')
+    return samples.reshape(-1, channels), sample_rate
+
+
+def _resample(signal, sample_rate):
+    if sample_rate == TARGET_SAMPLE_RATE or len(signal) == 0:
+        return signal
+    if sample_rate > TARGET_SAMPLE_RATE:
+        # Box filter as a cheap anti-aliasing low-pass before decimating
+        width = int(round(sample_rate / TARGET_SAMPLE_RATE))
+        if width > 1:
+            signal = np.convolve(signal, np.ones(width, dtype=np.float32) / width, mode='same')
+    duration = len(signal) / sample_rate
+    target_len = int(round(duration * TARGET_SAMPLE_RATE))
+    positions = np.arange(target_len, dtype=np.float64) * (sample_rate / TARGET_SAMPLE_RATE)
+    return np.interp(positions, np.arange(len(signal)), signal).astype(np.float32)
+
+
+def _frame_dbfs(signal, frame_len):
+    n_frames = len(signal) // frame_len
+    frames = signal[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-9) / 32768.0)
+
+
+def preprocess_linear16(audio, sample_rate=TARGET_SAMPLE_RATE, channels=1):
+    """
+    Return 16 kHz mono LINEAR16 bytes (no header) with leading/trailing
+    silence trimmed, or None if the clip has no speech. Without NumPy the
+    input is returned unchanged. Raises ValueError for audio it can't read.
+    """
+    if np is None:
+        return audio
+    samples, sample_rate = _read_pcm(audio, sample_rate, max(int(channels), 1))
+    if samples.size == 0:
+        return None
+
+    signal = _resample(samples.astype(np.float32).mean(axis=1), sample_rate)
+
+    frame_len = TARGET_SAMPLE_RATE * FRAME_MS // 1000
+    dbfs = _frame_dbfs(signal, frame_len)
+    if dbfs.size == 0 or dbfs.max() < MIN_PEAK_DBFS:
+        return None
+
+    threshold = max(SILENCE_FLOOR_DBFS, dbfs.max() - DYNAMIC_RANGE_DB)
+    voiced = np.flatnonzero(dbfs > threshold)
+    if len(voiced) * FRAME_MS < MIN_SPEECH_MS:
+        return None
+
+    padding = PADDING_MS // FRAME_MS
+    start = max(voiced[0] - padding, 0) * frame_len
+    end = min((voiced[-1] + 1 + padding) * frame_len, len(signal))
+    trimmed = np.clip(np.rint(signal[start:end]), -32768, 32767).astype('<i2')
+    return trimmed.tobytes()
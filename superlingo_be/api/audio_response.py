@@ -0,0 +1,114 @@
+# /superlingo_be/api/audio_response.py
+"""
+Raw audio responses with the HTTP caching bits players and proxies expect:
+Content-Length, a strong ETag, If-None-Match (304) and single byte Range
+requests (206), so playback can start before the whole clip is downloaded.
+"""
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Client-facing format name -> (texttospeech.AudioEncoding member, Content-Type)
+AUDIO_FORMATS = {
+    'mp3': ('MP3', 'audio/mpeg'),
+    'opus': ('OGG_OPUS', 'audio/ogg'),
+}
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Compare ignoring weak validators, as RFC 9110 does for If-None-Match
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in candidates
+
+
+def _parse_range(header, length):
+    """
+    Return (start, end) inclusive for a single satisfiable byte range,
+    None when the header should be ignored, or False when it is unsatisfiable.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None # Multiple ranges or another unit: serve the full body
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        return max(length - suffix, 0), length - 1
+    start = int(first)
+    end = int(last) if last else length - 1
+    if start >= length or end < start:
+        return False
+    return start, min(end, length - 1)
+
+
+def _chunks(view):
+    for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield view[offset:offset + STREAM_CHUNK_SIZE]
+
+
+def not_modified_response(request, etag_value, cache_control='public, max-age=604800'):
+    """304 response if the client already holds this clip, else None."""
+    etag = f'"{etag_value}"'
+    if not etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        return None
+    response = HttpResponse(status=304)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def audio_response(request, audio, content_type, etag_value, cache_control='public, max-age=604800', stream=True):
+    """
+    Build a streamed response for `audio` bytes. `etag_value` should be the
+    content-addressed cache key of the clip (it is quoted here). Async views
+    pass stream=False: under ASGI Django would pull every chunk of the sync
+    iterator through sync_to_async, and the clip is in memory anyway.
+    """
+    etag = f'"{etag_value}"'
+    length = len(audio)
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = cache_control
+        return response
+
+    not_modified = not_modified_response(request, etag_value, cache_control)
+    if not_modified is not None:
+        return not_modified
+
+    view = memoryview(audio)
+    status = 200
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, length)
+        if byte_range is False:
+            response = with_headers(HttpResponse(status=416))
+            response['Content-Range'] = f'bytes */{length}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            view = view[start:end + 1]
+            status = 206
+
+    if stream:
+        response = StreamingHttpResponse(_chunks(view), content_type=content_type, status=status)
+    else:
+        response = HttpResponse(view, content_type=content_type, status=status)
+    response['Content-Length'] = str(len(view))
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{length}'
+    return with_headers(response)
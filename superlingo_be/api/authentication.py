@@ -0,0 +1,105 @@
+# /superlingo_be/api/authentication.py
+"""
+Drop-in replacement for DRF's TokenAuthentication that caches token -> user.
+
+Stock TokenAuthentication runs a Token + User join on every authenticated
+request. This keeps recently seen tokens in a bounded, TTL'd in-process cache
+(and optionally a shared Django cache, TOKEN_AUTH_CACHE_ALIAS), so
+steady-state requests make no auth queries. Entries are invalidated when a
+token is deleted or its user is saved or deleted (api/signals.py); the TTL
+bounds staleness in processes that did not see the change.
+
+The cached user is a snapshot, not a fresh row. XP awarded by api/progress.py
+is a raw UPDATE that sends no post_save, so `request.user.experience_points`
+can lag by up to the TTL; views that return XP read it from the database
+(record_lesson_completions' RETURNING total, leaderboard.around).
+"""
+import copy
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .caching import TTLCache
+
+_SHARED_KEY_PREFIX = 'auth-token:'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(key)
+        if cached is None:
+            cached = _shared_get(key)
+            if cached is None:
+                # Raises AuthenticationFailed for unknown tokens / inactive users; those aren't cached
+                cached = super().authenticate_credentials(key)
+                _shared_set(key, cached)
+            user, token = cached
+            cache.set(key, cached, tags=[f'user:{user.pk}'])
+        user, token = cached
+        # Views may modify request.user (e.g. experience_points), so hand out a copy
+        return copy.copy(user), token
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_shared_counters = {'shared_hits': 0, 'shared_misses': 0}
+
+
+def get_token_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache(
+                    maxsize=getattr(settings, 'TOKEN_AUTH_CACHE_MAX_ENTRIES', 10000),
+                    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+                )
+    return _cache
+
+
+def _shared_cache():
+    alias = getattr(settings, 'TOKEN_AUTH_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _shared_get(key):
+    shared = _shared_cache()
+    if shared is None:
+        return None
+    cached = shared.get(_SHARED_KEY_PREFIX + key)
+    _shared_counters['shared_hits' if cached is not None else 'shared_misses'] += 1
+    return cached
+
+
+def _shared_set(key, value):
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(_SHARED_KEY_PREFIX + key, value, timeout=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60))
+
+
+def invalidate_token(key):
+    get_token_cache().delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_SHARED_KEY_PREFIX + key)
+
+
+def invalidate_user(user_id):
+    """Drop every cached token of a user (e.g. after it was deactivated)."""
+    get_token_cache().invalidate_tag(f'user:{user_id}')
+    shared = _shared_cache()
+    if shared is not None:
+        # The shared cache has no tags, so look the user's keys up
+        keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+        shared.delete_many([_SHARED_KEY_PREFIX + key for key in keys])
+
+
+def auth_cache_stats():
+    stats = get_token_cache().stats()
+    if _shared_cache() is not None:
+        stats.update(_shared_counters)
+    return stats
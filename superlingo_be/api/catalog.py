@@ -0,0 +1,171 @@
+# /superlingo_be/api/catalog.py
+"""
+Versioned in-process snapshot of the lesson catalog.
+
+Lessons change rarely, so instead of re-reading and re-serializing every row
+(including the big `topics` JSON) on each GET, the catalog is compiled once
+into immutable, pre-serialized JSON bytes. Each lesson is stored without its
+closing brace so the per-user `completed` flag can be appended per request
+without touching the shared snapshot.
+
+Lessons are also kept as per-field JSON fragments, so sparse fieldsets
+(`?fields=id,title,level,completed` for the lesson picker) and delta syncs
+(`?updated_since=`) are served from the same snapshot.
+
+The version is bumped by the Lesson post_save/post_delete signals (see
+api/signals.py). Signals only fire in the process that made the change, so
+snapshots are also rebuilt after LESSON_CATALOG_MAX_AGE seconds to bound how
+stale other workers can get. Rebuilds read from the read replica when one is
+configured (api/db_router.py), except just after a lesson change.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from . import db_router
+from .models import Lesson
+from .renderers import json_bytes
+
+_COMPLETED_TRUE = b',"completed":true}'
+_COMPLETED_FALSE = b',"completed":false}'
+_COMPLETED_FIELD = {True: b'"completed":true', False: b'"completed":false'}
+
+
+def _dumps(data):
+    # Same output as the API's JSON renderer (compact, UTF-8; orjson when installed)
+    return json_bytes(data)
+
+
+class LessonCatalog:
+    """Immutable once built; safe to share between threads."""
+
+    def __init__(self, version, lessons):
+        self.version = version
+        self.built_at = time.monotonic()
+        # (lesson id, serialized lesson minus the closing brace), in id order
+        self._lessons = tuple((lesson['id'], _dumps(lesson)[:-1]) for lesson in lessons)
+        self._by_id = {lesson_id: body for lesson_id, body in self._lessons}
+        # lesson id -> {field name: b'"name":value'}
+        self._fragments = {
+            lesson['id']: {name: _dumps({name: value})[1:-1] for name, value in lesson.items()}
+            for lesson in lessons
+        }
+        self._updated_at = {lesson['id']: parse_datetime(lesson['updated_at']) for lesson in lessons}
+        # Newest change in the snapshot; clients send it back as ?updated_since=
+        self.sync_token = max((lesson['updated_at'] for lesson in lessons), key=parse_datetime, default=None)
+        self.digest = hashlib.sha256(b'\n'.join(body for _, body in self._lessons)).hexdigest()[:16]
+
+    def __contains__(self, lesson_id):
+        return lesson_id in self._by_id
+
+    def __len__(self):
+        return len(self._lessons)
+
+    def lesson_ids(self):
+        return [lesson_id for lesson_id, _ in self._lessons]
+
+    # --- List ---
+    def list_etag(self, completed_ids, fields=None, since=None):
+        done = sorted(lesson_id for lesson_id in completed_ids if lesson_id in self._by_id)
+        completed_digest = hashlib.sha1(','.join(map(str, done)).encode()).hexdigest()[:12]
+        if fields is None and since is None:
+            return f'"catalog-{self.digest}-{completed_digest}"'
+        variant = f"{','.join(fields or ())};{since.isoformat() if since else ''}"
+        variant_digest = hashlib.sha1(variant.encode()).hexdigest()[:8]
+        return f'"catalog-{self.digest}-{completed_digest}-{variant_digest}"'
+
+    def render_list(self, completed_ids, fields=None, since=None):
+        """
+        JSON array of lessons. `fields` limits each lesson to those fields
+        (None: all of them); `since` keeps only lessons changed after it.
+        """
+        parts = []
+        for lesson_id, body in self._lessons:
+            if since is not None and self._updated_at[lesson_id] <= since:
+                continue
+            completed = lesson_id in completed_ids
+            if fields is None:
+                parts.append(body + (_COMPLETED_TRUE if completed else _COMPLETED_FALSE))
+            else:
+                fragments = self._fragments[lesson_id]
+                selected = [
+                    _COMPLETED_FIELD[completed] if name == 'completed' else fragments[name]
+                    for name in fields if name == 'completed' or name in fragments
+                ]
+                parts.append(b'{' + b','.join(selected) + b'}')
+        return b'[' + b','.join(parts) + b']'
+
+    def render_delta(self, completed_ids, since, fields=None):
+        """
+        Delta sync body: the lessons changed after `since`, every current
+        lesson id (so clients can drop deleted lessons) and the sync token to
+        send next time.
+        """
+        return (
+            b'{"sync_token":' + _dumps(self.sync_token)
+            + b',"lesson_ids":' + _dumps(self.lesson_ids())
+            + b',"results":' + self.render_list(completed_ids, fields, since) + b'}'
+        )
+
+    # --- Detail ---
+    def detail_etag(self, lesson_id, completed):
+        body_digest = hashlib.sha1(self._by_id[lesson_id]).hexdigest()[:16]
+        return f'"lesson-{body_digest}-{int(bool(completed))}"'
+
+    def render_detail(self, lesson_id, completed):
+        return self._by_id[lesson_id] + (_COMPLETED_TRUE if completed else _COMPLETED_FALSE)
+
+
+def _build(version):
+    from .serializers import LessonSerializer # Avoid a models <-> serializers import cycle at load time
+
+    with db_router.replica_reads():
+        lessons = Lesson.objects.all().order_by('id')
+        # An empty completed set keeps the serializer from querying progress
+        data = LessonSerializer(lessons, many=True, context={'completed_lesson_ids': frozenset()}).data
+    for lesson in data:
+        lesson.pop('completed', None)
+    return LessonCatalog(version, data)
+
+
+_version = 0
+_snapshot = None
+_lock = threading.Lock()
+_build_lock = threading.Lock() # One rebuild at a time; other threads wait for it
+
+
+def bump_catalog_version():
+    global _version
+    with _lock:
+        _version += 1
+    # Don't rebuild from a replica that hasn't caught up with the change yet
+    db_router.pin(db_router.LESSONS_PIN)
+
+
+def _is_fresh(snapshot):
+    max_age = getattr(settings, 'LESSON_CATALOG_MAX_AGE', 60)
+    return (
+        snapshot is not None
+        and snapshot.version == _version
+        and time.monotonic() - snapshot.built_at < max_age
+    )
+
+
+def get_lesson_catalog():
+    global _snapshot
+    snapshot = _snapshot
+    if _is_fresh(snapshot):
+        return snapshot
+
+    with _build_lock:
+        snapshot = _snapshot
+        if _is_fresh(snapshot):
+            return snapshot
+        with _lock:
+            version = _version
+        snapshot = _build(version)
+        _snapshot = snapshot
+    return snapshot
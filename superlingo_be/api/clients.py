@@ -0,0 +1,151 @@
+# /superlingo_be/api/clients.py
+"""
+Lazily built Google clients (Gemini, Cloud TTS, Cloud STT).
+
+Nothing from google.* is imported until a client is first needed, so
+`manage.py` commands, migrations and worker boot don't pay for the gRPC /
+protobuf imports. Each client is built once per process: gRPC channels are
+not fork-safe, so everything built here is dropped in a forked child (e.g.
+gunicorn --preload) and rebuilt there on next use.
+
+A client that fails to configure (missing credentials etc.) is remembered as
+not ready for the life of the process, like the old import-time flags.
+
+AI_BACKEND=fake swaps all three for the in-process stand-ins in api/fakes.py
+(load tests, local development); no credentials are needed then.
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_clients = {}  # name -> client, or None if it could not be configured
+_after_fork = []
+
+
+def on_fork(callback):
+    """Run `callback()` in the child after a fork, e.g. to drop cached models."""
+    _after_fork.append(callback)
+
+
+def _reset_after_fork():
+    global _lock
+    _lock = threading.RLock() # The parent's lock may have been held mid-fork
+    _clients.clear()
+    for callback in _after_fork:
+        callback()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get(name, build):
+    try:
+        return _clients[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _clients:
+            try:
+                _clients[name] = build()
+                logger.info("%s client configured.", name)
+            except Exception as e:
+                logger.error("Could not configure %s client: %s", name, e, exc_info=True)
+                _clients[name] = None
+        return _clients[name]
+
+
+def using_fakes():
+    from django.conf import settings
+    return getattr(settings, 'AI_BACKEND', 'google') == 'fake'
+
+
+# --- Modules (imported on first use) ---
+def genai_module():
+    if using_fakes():
+        from .fakes import genai
+        return genai
+    import google.generativeai as genai
+    return genai
+
+
+def texttospeech_module():
+    if using_fakes():
+        from .fakes import texttospeech
+        return texttospeech
+    from google.cloud import texttospeech
+    return texttospeech
+
+
+def speech_module():
+    if using_fakes():
+        from .fakes import speech
+        return speech
+    from google.cloud import speech
+    return speech
+
+
+# --- Clients ---
+def _configure_gemini():
+    if using_fakes():
+        return genai_module()
+    api_key = os.environ.get('GOOGLE_API_KEY')
+    if not api_key or api_key == 'YOUR_GEMINI_API_KEY_HERE':
+        raise ValueError("GOOGLE_API_KEY missing or placeholder.")
+    genai = genai_module()
+    genai.configure(api_key=api_key)
+    return genai
+
+
+def require_credentials():
+    if using_fakes():
+        return
+    if not os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'):
+        raise ValueError("GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
+
+
+def _build_tts_client():
+    require_credentials()
+    return texttospeech_module().TextToSpeechClient()
+
+
+def _build_speech_client():
+    require_credentials()
+    return speech_module().SpeechClient()
+
+
+def gemini():
+    """The configured google.generativeai module, or None."""
+    return _get('Gemini', _configure_gemini)
+
+
+def tts_client():
+    return _get('Google Cloud TTS', _build_tts_client)
+
+
+def speech_client():
+    return _get('Google Cloud STT', _build_speech_client)
+
+
+def gemini_ready():
+    return gemini() is not None
+
+
+def tts_ready():
+    return tts_client() is not None
+
+
+def stt_ready():
+    return speech_client() is not None
+
+
+def readiness():
+    """The old gemini_api_configured / gcloud_*_configured flags, for /api/health/."""
+    return {
+        'gemini_api_configured': gemini_ready(),
+        'gcloud_tts_configured': tts_ready(),
+        'gcloud_stt_configured': stt_ready(),
+    }
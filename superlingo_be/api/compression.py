@@ -0,0 +1,112 @@
+# /superlingo_be/api/compression.py
+"""
+Response compression negotiated from Accept-Encoding: brotli when the client
+accepts it and the `brotli` package is installed, else gzip.
+
+Only complete (non-streaming) text responses of at least
+COMPRESSION_MIN_BYTES are compressed. Audio, images and other binary bodies
+are already compressed, Range/206 responses must keep their byte offsets,
+and compressing the SSE chat stream would hold back tokens in the
+compressor, so all of those pass through untouched. The JSON bodies that
+matter (lesson list, base64 TTS audio) shrink to a fraction of their size.
+"""
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError: # pragma: no cover - optional dependency
+    brotli = None
+
+_ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+_STRONG_ETAG_RE = re.compile(r'^"[^"]*"$')
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+
+def accepted_encodings(header):
+    """{'gzip': 1.0, 'br': 0.5, ...} from an Accept-Encoding header."""
+    accepted = {}
+    for item in (header or '').split(','):
+        match = _ENCODING_RE.match(item)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """'br', 'gzip' or None for this Accept-Encoding header."""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get('*', 0)
+    offers = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_quality = None, 0
+    for encoding in offers: # Server preference breaks ties
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+    # mtime=0 keeps the output (and so any cache keyed on it) deterministic
+    return gzip.compress(body, compresslevel=getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), mtime=0)
+
+
+def _compressible(response):
+    if response.streaming or response.has_header('Content-Encoding') or response.status_code == 206:
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', True) or not _compressible(response):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_BYTES', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed bytes differ, so a strong validator becomes weak (as Django's GZipMiddleware does)
+        etag = response.get('ETag')
+        if etag and _STRONG_ETAG_RE.match(etag):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,154 @@
+# /superlingo_be/api/db_router.py
+"""
+Optional read replica for the lesson endpoints.
+
+When settings.DATABASES has a 'replica' alias (DB_REPLICA_HOST or
+DB_REPLICA_NAME), reads of Lesson and UserLessonProgress made inside
+`replica_reads()` - the LessonViewSet list/retrieve views and catalog
+rebuilds - go to the replica, so the lesson list doesn't compete with
+progress writes on the primary. Everything else, including auth, and every
+write stays on 'default'.
+
+Read-your-writes: a replica lags the primary a little. After a user
+completes lessons (api/progress.py) their reads are pinned to the primary
+for REPLICA_PIN_SECONDS, so the `completed` flags they get back include the
+lesson they just finished; after a Lesson change (api/catalog.py) everyone's
+are. Pins live in process and, if REPLICA_PIN_CACHE_ALIAS names a shared
+Django cache (e.g. Redis), there too, so they hold across workers.
+
+If the replica can't be reached, lesson reads fall back to the primary for
+REPLICA_RETRY_AFTER seconds instead of failing.
+"""
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections, transaction
+
+from .caching import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+REPLICA_MODELS = frozenset({'api.Lesson', 'api.UserLessonProgress'})
+LESSONS_PIN = 'lessons'
+_PIN_KEY_PREFIX = 'db-pin:'
+
+_read_alias = contextvars.ContextVar('replica_read_alias', default=None)
+_pins = TTLCache(maxsize=100_000, ttl=5)
+_replica_down_until = 0.0
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def _shared_cache():
+    alias = getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+# --- Read-your-writes pins ---
+def user_pin(user_id):
+    return f'user:{user_id}'
+
+
+def pin(name):
+    """Read `name` (a user_pin() or LESSONS_PIN) from the primary for the next REPLICA_PIN_SECONDS."""
+    if not replica_configured():
+        return
+    seconds = _pin_seconds()
+    _pins.set(name, True, ttl=seconds)
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            shared.set(_PIN_KEY_PREFIX + name, True, seconds)
+        except Exception as e: # The in-process pin still covers this worker
+            logger.warning("Could not store replica pin %s: %s", name, e)
+
+
+def pin_after_commit(name):
+    # The lag window starts when the write is visible on the primary
+    transaction.on_commit(functools.partial(pin, name))
+
+
+def is_pinned(*names):
+    if any(_pins.get(name) for name in names):
+        return True
+    shared = _shared_cache()
+    if shared is None:
+        return False
+    try:
+        return bool(shared.get_many([_PIN_KEY_PREFIX + name for name in names]))
+    except Exception as e:
+        logger.warning("Could not read replica pins: %s", e)
+        return True # Unknown: the primary is always correct
+
+
+# --- Choosing the replica ---
+def _replica_available():
+    global _replica_down_until
+    if time.monotonic() < _replica_down_until:
+        return False
+    try:
+        connections[REPLICA_ALIAS].ensure_connection() # No-op on a live persistent connection
+    except DatabaseError as e:
+        _replica_down_until = time.monotonic() + getattr(settings, 'REPLICA_RETRY_AFTER', 30)
+        logger.warning("Read replica unavailable, reading lessons from the primary: %s", e)
+        return False
+    return True
+
+
+@contextmanager
+def replica_reads(user=None):
+    """
+    Route lesson reads in this block to the replica, unless `user` (or the
+    lessons) were written recently or the replica is down.
+    """
+    pins = (LESSONS_PIN,) if user is None or not user.is_authenticated else (LESSONS_PIN, user_pin(user.pk))
+    use_replica = replica_configured() and not is_pinned(*pins) and _replica_available()
+    token = _read_alias.set(REPLICA_ALIAS if use_replica else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def reads_from_replica(method):
+    """replica_reads(request.user) around a viewset method."""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        with replica_reads(request.user):
+            return method(self, request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """settings.DATABASE_ROUTERS entry; a no-op without a 'replica' database."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is not None and model._meta.label in REPLICA_MODELS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both sides, e.g. a replica-read Lesson linked to a new progress row
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica follows the primary's schema through replication
+        return False if db == REPLICA_ALIAS else None
@@ -0,0 +1,237 @@
+# /superlingo_be/api/fakes.py
+"""
+In-process stand-ins for Gemini, Cloud TTS and Cloud STT, for load tests and
+local development without Google credentials or quota.
+
+With AI_BACKEND=fake, api/clients.py hands out `genai`, `texttospeech` and
+`speech` from this module instead of the google.* packages. They cover the
+parts of those APIs the views use (GenerativeModel.generate_content[_async]
+incl. streaming, synthesize_speech, recognize, and the request/config types),
+so every code path above the client call - caches, single-flight, bulkheads,
+circuit breakers, metrics - runs as in production.
+
+Each call sleeps for a latency drawn from FAKE_AI[name] ('latency' is the
+median in seconds, 'jitter' the lognormal sigma, so tails look like a real
+network) and fails with FakeUpstreamError for 'error_rate' of the calls.
+Draws come from one RNG per upstream seeded with FAKE_AI_SEED, so a run with
+the same seed and request order sees the same latencies and failures.
+Settings are read on every call; override_settings works.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+import types
+
+from django.conf import settings
+
+DEFAULT_PROFILE = {'latency': 0.0, 'jitter': 0.0, 'error_rate': 0.0}
+
+
+class FakeUpstreamError(Exception):
+    """Injected upstream failure (stands in for e.g. a 503 from Google)."""
+    code = 503 # Like google.api_core's ServiceUnavailable, so it counts against the breaker
+
+
+class _Injector:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._rng = None
+        self._seed = None
+
+    def _profile(self):
+        return {**DEFAULT_PROFILE, **getattr(settings, 'FAKE_AI', {}).get(self.name, {})}
+
+    def draw(self):
+        """(delay in seconds, whether this call fails)"""
+        profile = self._profile()
+        seed = f"{getattr(settings, 'FAKE_AI_SEED', 0)}:{self.name}"
+        with self._lock:
+            if self._seed != seed: # New seed (or first call): restart the sequence
+                self._rng, self._seed = random.Random(seed), seed
+            jitter = self._rng.lognormvariate(0, profile['jitter']) if profile['jitter'] > 0 else 1.0
+            failed = self._rng.random() < profile['error_rate']
+        return profile['latency'] * jitter, failed
+
+    def _error(self):
+        return FakeUpstreamError(f"fake {self.name}: injected failure")
+
+    def call(self):
+        delay, failed = self.draw()
+        time.sleep(delay)
+        if failed:
+            raise self._error()
+
+    async def acall(self):
+        delay, failed = self.draw()
+        await asyncio.sleep(delay)
+        if failed:
+            raise self._error()
+
+
+_injectors = {name: _Injector(name) for name in ('gemini', 'tts', 'stt')}
+
+
+def reseed():
+    """Restart every upstream's latency/failure sequence from FAKE_AI_SEED."""
+    for injector in _injectors.values():
+        with injector._lock:
+            injector._seed = None
+
+
+class _Value:
+    """Plain attribute bag for request and response messages."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+# --- Gemini (google.generativeai) ---
+class _FinishReason:
+    FINISH_REASON_UNSPECIFIED = 0
+    STOP = 1
+    MAX_TOKENS = 2
+    SAFETY = 3
+
+
+class _Candidate:
+    FinishReason = _FinishReason
+
+    def __init__(self, text, finish_reason=_FinishReason.STOP):
+        self.content = _Value(parts=[_Value(text=text)] if text else [])
+        self.finish_reason = finish_reason
+
+
+class _GenerateContentResponse:
+    def __init__(self, text, finish_reason=_FinishReason.STOP):
+        self.candidates = [_Candidate(text, finish_reason)]
+
+    @property
+    def text(self):
+        return ''.join(part.text for part in self.candidates[0].content.parts)
+
+
+def _fake_reply(contents):
+    if isinstance(contents, list): # Multi-turn: answer the last message
+        contents = ' '.join(str(part) for part in contents[-1]['parts'])
+    said = str(contents).rsplit('Student said:', 1)[-1].strip()
+    return f"Nice try! You said \"{said}\". Let's keep practising."
+
+
+def _stream_chunks(reply, chunks=4):
+    words = reply.split(' ')
+    size = max(len(words) // chunks, 1)
+    return [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+
+
+class GenerativeModel:
+    def __init__(self, model_name, system_instruction=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        injector = _injectors['gemini']
+        if not stream:
+            injector.call()
+            return _GenerateContentResponse(_fake_reply(contents))
+        return self._stream(injector, contents)
+
+    def _stream(self, injector, contents):
+        injector.call() # Time to first token
+        chunks = _stream_chunks(_fake_reply(contents))
+        for i, text in enumerate(chunks):
+            if i:
+                time.sleep(injector.draw()[0] / len(chunks))
+            yield _GenerateContentResponse(text)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await _injectors['gemini'].acall()
+        return _GenerateContentResponse(_fake_reply(contents))
+
+
+def _configure(**kwargs):
+    pass
+
+
+genai = types.SimpleNamespace(
+    configure=_configure,
+    GenerativeModel=GenerativeModel,
+    types=types.SimpleNamespace(GenerationConfig=_Value, Candidate=_Candidate),
+)
+
+
+# --- Cloud TTS (google.cloud.texttospeech) ---
+class _AudioEncoding:
+    AUDIO_ENCODING_UNSPECIFIED = 0
+    LINEAR16 = 1
+    MP3 = 2
+    OGG_OPUS = 3
+
+
+BYTES_PER_CHARACTER = 270 # ~32 kbps MP3 at ~15 characters of speech per second
+
+
+def _fake_audio(text, encoding):
+    """Deterministic bytes about the size Cloud TTS would return for `text`."""
+    seed = hashlib.sha256(f'{encoding}:{text}'.encode()).digest()
+    size = max(len(text), 1) * BYTES_PER_CHARACTER
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class TextToSpeechClient:
+    def synthesize_speech(self, input, voice, audio_config, **kwargs):
+        _injectors['tts'].call()
+        return _Value(audio_content=_fake_audio(input.text, audio_config.audio_encoding))
+
+
+class TextToSpeechAsyncClient:
+    async def synthesize_speech(self, input, voice, audio_config, **kwargs):
+        await _injectors['tts'].acall()
+        return _Value(audio_content=_fake_audio(input.text, audio_config.audio_encoding))
+
+
+texttospeech = types.SimpleNamespace(
+    SynthesisInput=_Value,
+    VoiceSelectionParams=_Value,
+    AudioConfig=_Value,
+    AudioEncoding=_AudioEncoding,
+    TextToSpeechClient=TextToSpeechClient,
+    TextToSpeechAsyncClient=TextToSpeechAsyncClient,
+)
+
+
+# --- Cloud STT (google.cloud.speech) ---
+FAKE_TRANSCRIPT = 'hello' # What every fake recording "says"
+
+
+class RecognitionConfig(_Value):
+    class AudioEncoding:
+        ENCODING_UNSPECIFIED = 0
+        LINEAR16 = 1
+        WEBM_OPUS = 9
+
+
+def _recognize_response():
+    return _Value(results=[_Value(alternatives=[_Value(transcript=FAKE_TRANSCRIPT, confidence=0.9)])])
+
+
+class SpeechClient:
+    def recognize(self, config, audio, **kwargs):
+        _injectors['stt'].call()
+        return _recognize_response()
+
+
+class SpeechAsyncClient:
+    async def recognize(self, config, audio, **kwargs):
+        await _injectors['stt'].acall()
+        return _recognize_response()
+
+
+speech = types.SimpleNamespace(
+    RecognitionAudio=_Value,
+    RecognitionConfig=RecognitionConfig,
+    SpeechClient=SpeechClient,
+    SpeechAsyncClient=SpeechAsyncClient,
+)
@@ -0,0 +1,217 @@
+# /superlingo_be/api/jobs.py
+"""
+Background jobs for slow AI work: TTS synthesis, STT recognition and tutor
+replies.
+
+POST /api/jobs/ stores a Job row and returns 202 straight away; one or more
+`manage.py run_job_worker` processes claim queued jobs, run them with the same
+code as the synchronous endpoints and store the response body in Job.result.
+Clients poll GET /api/jobs/<id>/; with ASYNC_AI_VIEWS the async view also
+takes ?wait=N to long-poll without holding a worker thread.
+
+The queue is the api_job table itself, no broker. Workers claim jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so several workers never pick up the same
+row and never block each other. A failed job is retried with exponential
+backoff (JOB_RETRY_BACKOFF * 2**n seconds) until max_attempts; JobError marks
+input the upstream will never accept and fails at once. Jobs whose worker died
+mid-run are requeued after JOB_STALE_AFTER seconds, and finished jobs are
+deleted after JOB_RETENTION_DAYS.
+"""
+import asyncio
+import base64
+import logging
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+PENDING = (QUEUED, RUNNING)
+KINDS = ('tts', 'stt', 'chat') # What clients may submit; 'summary' jobs are queued internally
+
+
+class JobError(Exception):
+    """The job can never succeed (bad input); fail it without retrying."""
+
+
+# --- Handlers: job -> result body (same shape as the synchronous endpoint) ---
+def _run_tts(job):
+    from .views import synthesize_tts_audio
+    text = job.payload.get('text')
+    if not text:
+        raise JobError('No text provided for audio')
+    _, audio_content = synthesize_tts_audio(text)
+    return {'audioUrl': 'data:audio/mpeg;base64,' + base64.b64encode(audio_content).decode('utf-8')}
+
+
+def _run_stt(job):
+    from .views import transcribe
+    prompt = job.payload.get('prompt')
+    if not job.audio or not prompt:
+        raise JobError('Missing audio data or correct prompt')
+    return transcribe(bytes(job.audio), prompt, job.payload.get('platform', 'native'), job.payload, {})
+
+
+def _run_chat(job):
+    from .tutor_sessions import SessionNotFound, get_session
+    from .views import tutor_reply
+    message = job.payload.get('message')
+    if not message:
+        raise JobError('No message provided')
+    session = None
+    if job.payload.get('session_id') is not None:
+        try:
+            session = get_session(job.user_id, job.payload['session_id'])
+        except SessionNotFound:
+            raise JobError('Tutor session not found') from None
+    reply = tutor_reply(
+        message, job.payload.get('context', {}), job.payload.get('lesson_id'),
+        job.payload.get('lesson_title', 'this lesson'), session,
+    )
+    if session is not None:
+        return {'reply': reply, 'session_id': session.pk}
+    return {'reply': reply}
+
+
+def _run_summary(job):
+    # Queued by tutor_sessions.schedule_fold, not by clients
+    from .tutor_sessions import SessionNotFound, fold_overflow, get_session
+    try:
+        session = get_session(job.user_id, job.payload.get('session_id'))
+    except SessionNotFound:
+        raise JobError('Tutor session not found') from None
+    return {'session_id': session.pk, 'folded': fold_overflow(session)}
+
+
+HANDLERS = {'tts': _run_tts, 'stt': _run_stt, 'chat': _run_chat, 'summary': _run_summary}
+
+
+# --- Queue ---
+def submit(user, kind, payload, audio=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind!r}")
+    return Job.objects.create(
+        user=user, kind=kind, payload=payload, audio=audio,
+        max_attempts=getattr(settings, 'JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def claim(worker_id, limit=1):
+    """Mark up to `limit` due jobs as running for `worker_id` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids).update(
+            status=RUNNING, locked_by=worker_id, started_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids).order_by('run_after', 'id'))
+
+
+def retry_delay(attempts):
+    return getattr(settings, 'JOB_RETRY_BACKOFF', 5) * 2 ** max(attempts - 1, 0)
+
+
+def _finish(job, **fields):
+    # Only the worker holding the job may finish it; a stale requeue may have handed it on
+    return Job.objects.filter(pk=job.pk, status=RUNNING, locked_by=job.locked_by).update(**fields)
+
+
+def run(job):
+    """Run one claimed job and store its outcome. Returns the new status."""
+    try:
+        result = HANDLERS[job.kind](job)
+    except JobError as e:
+        logger.info("Job %s (%s) rejected: %s", job.pk, job.kind, e)
+        _finish(job, status=FAILED, error=str(e), finished_at=timezone.now(), locked_by='')
+        return FAILED
+    except Exception as e:
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            logger.warning("Job %s (%s) attempt %s failed, retrying in %ss: %s",
+                           job.pk, job.kind, job.attempts, delay, e)
+            _finish(job, status=QUEUED, error=str(e), locked_by='',
+                    run_after=timezone.now() + timedelta(seconds=delay))
+            return QUEUED
+        logger.exception("Job %s (%s) failed after %s attempts", job.pk, job.kind, job.attempts)
+        _finish(job, status=FAILED, error=str(e), finished_at=timezone.now(), locked_by='')
+        return FAILED
+    _finish(job, status=SUCCEEDED, result=result, error='', finished_at=timezone.now(), locked_by='')
+    return SUCCEEDED
+
+
+def requeue_stale(older_than=None):
+    """Put back jobs left running by a worker that died. Returns the number requeued."""
+    if older_than is None:
+        older_than = getattr(settings, 'JOB_STALE_AFTER', 300)
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    stale = Job.objects.filter(status=RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=FAILED, error='Worker stopped while running the job', finished_at=timezone.now(), locked_by='',
+    )
+    return stale.update(status=QUEUED, locked_by='', run_after=timezone.now())
+
+
+def purge(days=None):
+    """Delete finished jobs older than JOB_RETENTION_DAYS. Returns the number deleted."""
+    if days is None:
+        days = getattr(settings, 'JOB_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status__in=(SUCCEEDED, FAILED), finished_at__lt=cutoff).delete()
+    return deleted
+
+
+async def wait(job, timeout):
+    """Re-read `job` until it finishes or `timeout` seconds pass (long-poll, for the async view)."""
+    deadline = time.monotonic() + timeout
+    step = 0.1
+    while job.status in PENDING:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(step, remaining))
+        step = min(step * 2, 1.0)
+        await sync_to_async(job.refresh_from_db)(
+            fields=['status', 'result', 'error', 'attempts', 'started_at', 'finished_at'],
+        )
+    return job
+
+
+def jobs_collector():
+    """/metrics samples: queued and running jobs per kind (one grouped query per scrape)."""
+    counts = Job.objects.filter(status__in=PENDING).values_list('kind', 'status').annotate(n=Count('id')).order_by()
+    seen = {(kind, state): n for kind, state, n in counts}
+    for kind in HANDLERS:
+        for state in PENDING:
+            yield ('superlingo_jobs', 'gauge', 'Background jobs waiting or running.',
+                   seen.get((kind, state), 0), {'kind': kind, 'status': state})
+
+
+def job_body(job):
+    body = {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == SUCCEEDED:
+        body['result'] = job.result
+    elif job.error:
+        body['error'] = job.error # Last failure; the job may still be retried
+    return body
@@ -0,0 +1,136 @@
+# /superlingo_be/api/leaderboard.py
+"""
+XP leaderboard.
+
+Order is experience_points descending, then user id (earlier sign-ups first);
+users with equal XP share a rank ("1, 2, 2, 4"). The api_user_xp_rank_idx
+index serves the top-N and the rows around a user as short index range scans.
+
+Ranks come from XPBucket (users per XP total) rather than a COUNT over the
+user table: XP moves in XP_PER_LESSON steps, so there are only about as many
+buckets as lessons. A page of entries spans a narrow XP range, so each
+request sums the buckets above it in the database and reads only the
+buckets inside it. Buckets are moved in the same transaction that awards XP
+(api/progress.py) and by the User signals; `manage.py rebuild_leaderboard`
+recomputes them from scratch.
+"""
+import bisect
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import User, XPBucket
+
+DEFAULT_TOP = 10
+MAX_TOP = 100
+DEFAULT_NEIGHBORS = 2
+MAX_NEIGHBORS = 10
+
+LEADERBOARD_ORDER = ('-experience_points', 'id')
+
+
+# --- Maintaining the buckets ---
+def _bucket_sql():
+    qn = connection.ops.quote_name
+    table = qn(XPBucket._meta.db_table)
+    return (
+        f"INSERT INTO {table} (experience_points, user_count) VALUES (%s, %s) "
+        f"ON CONFLICT (experience_points) DO UPDATE SET user_count = {table}.user_count + excluded.user_count"
+    )
+
+
+def adjust_buckets(cursor, changes):
+    """Apply {experience_points: +/-users} in one upsert per XP value."""
+    sql = _bucket_sql()
+    for xp, delta in sorted(changes.items()): # Fixed order, so concurrent updates can't deadlock
+        if delta:
+            cursor.execute(sql, [xp, delta])
+
+
+def move_user(cursor, old_xp, new_xp):
+    if old_xp != new_xp:
+        adjust_buckets(cursor, {old_xp: -1, new_xp: 1})
+
+
+def rebuild_buckets():
+    """Recount every bucket from the user table. Returns the number of buckets."""
+    counts = User.objects.values('experience_points').annotate(n=Count('id')).order_by()
+    with transaction.atomic():
+        XPBucket.objects.all().delete()
+        XPBucket.objects.bulk_create(
+            [XPBucket(experience_points=row['experience_points'], user_count=row['n']) for row in counts],
+            batch_size=1000,
+        )
+    return XPBucket.objects.count()
+
+
+# --- Reading ---
+class RankTable:
+    """Ranks for users with XP from `low_xp` to `high_xp` (one page of the leaderboard)."""
+
+    def __init__(self, buckets, above_high, total_users):
+        buckets = sorted(((xp, n) for xp, n in buckets if n > 0), reverse=True)
+        self._neg_xp = [-xp for xp, _ in buckets]
+        self._above = []
+        total = above_high
+        for _, n in buckets:
+            self._above.append(total)
+            total += n
+        self._above_low = total
+        self.total_users = total_users
+
+    @classmethod
+    def load(cls, low_xp, high_xp):
+        # One aggregate for the users above the page, then only the page's own buckets
+        totals = XPBucket.objects.aggregate(
+            total=Sum('user_count'),
+            above=Sum('user_count', filter=Q(experience_points__gt=high_xp)),
+        )
+        buckets = XPBucket.objects.filter(
+            experience_points__gte=low_xp, experience_points__lte=high_xp, user_count__gt=0,
+        ).values_list('experience_points', 'user_count')
+        return cls(buckets, totals['above'] or 0, totals['total'] or 0)
+
+    @classmethod
+    def for_xp(cls, xps):
+        xps = list(xps)
+        return cls.load(min(xps), max(xps)) if xps else cls.load(0, 0)
+
+    def rank(self, xp):
+        """1 + the number of users with more XP than `xp` (low_xp <= xp <= high_xp)."""
+        i = bisect.bisect_left(self._neg_xp, -xp)
+        above = self._above[i] if i < len(self._above) else self._above_low
+        return above + 1
+
+
+Entry = namedtuple('Entry', ['rank', 'user_id', 'username', 'experience_points'])
+
+
+def _entries(users, table):
+    return [Entry(table.rank(xp), user_id, username, xp) for user_id, username, xp in users]
+
+
+def _rows(queryset):
+    return queryset.values_list('id', 'username', 'experience_points')
+
+
+def top(limit=DEFAULT_TOP):
+    users = list(_rows(User.objects.order_by(*LEADERBOARD_ORDER))[:limit])
+    table = RankTable.for_xp(xp for _, _, xp in users)
+    return _entries(users, table), table.total_users
+
+
+def around(user, neighbors=DEFAULT_NEIGHBORS):
+    """Return (my entry, entries above me (best first), entries below me, total users)."""
+    xp = User.objects.filter(pk=user.pk).values_list('experience_points', flat=True).first()
+    if xp is None:
+        xp = user.experience_points
+    ahead = Q(experience_points__gt=xp) | Q(experience_points=xp, id__lt=user.pk)
+    behind = Q(experience_points__lt=xp) | Q(experience_points=xp, id__gt=user.pk)
+    # Walk the index outwards from the user in both directions
+    above = list(_rows(User.objects.filter(ahead).order_by('experience_points', '-id'))[:neighbors])[::-1]
+    below = list(_rows(User.objects.filter(behind).order_by(*LEADERBOARD_ORDER))[:neighbors])
+    table = RankTable.for_xp([xp] + [row[2] for row in above + below])
+    me = Entry(table.rank(xp), user.pk, user.username, xp)
+    return me, _entries(above, table), _entries(below, table), table.total_users
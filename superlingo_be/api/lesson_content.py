@@ -0,0 +1,163 @@
+# /superlingo_be/api/lesson_content.py
+"""
+Helpers for reading the activity JSON stored in `Lesson.topics`.
+
+Shape (see migrations/0002_initial_lessons.py):
+    {"title": ..., "activities": [{"type": "MATCHING", "pairs": [["Pizza", "피자"], ...]},
+                                   {"type": "ORDERING", "prompt": "I eat breakfast", ...},
+                                   {"type": "LISTENING", "prompt_audio_text": "I like pizza", ...},
+                                   {"type": "SPEAKING", "prompt": "I like pizza"}]}
+
+clean_lesson() / topics_problems() check that shape for `manage.py import_lessons`.
+"""
+
+
+def iter_activities(topics):
+    if not isinstance(topics, dict):
+        return
+    for activity in topics.get('activities') or []:
+        if isinstance(activity, dict):
+            yield activity
+
+
+def iter_speakable_texts(topics):
+    """Yield every English string the app may ask TTS to speak for one lesson."""
+    for activity in iter_activities(topics):
+        activity_type = activity.get('type')
+        if activity_type == 'LISTENING':
+            texts = [activity.get('prompt_audio_text')]
+        elif activity_type in ('SPEAKING', 'ORDERING'):
+            texts = [activity.get('prompt')]
+        elif activity_type == 'MATCHING':
+            # pairs are [english, korean]
+            texts = [pair[0] for pair in activity.get('pairs', []) if isinstance(pair, list) and pair]
+        else:
+            texts = []
+        for text in texts:
+            # Yielded verbatim: the client sends the same string, so it must hash the same
+            if isinstance(text, str) and text.strip():
+                yield text
+
+
+# --- Validation (manage.py import_lessons) ---
+class LessonValidationError(ValueError):
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__('; '.join(problems))
+
+
+def _is_text(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _text_list(value):
+    return isinstance(value, list) and bool(value) and all(_is_text(item) for item in value)
+
+
+def _check_matching(activity):
+    pairs = activity.get('pairs')
+    if not (isinstance(pairs, list) and pairs
+            and all(isinstance(pair, list) and len(pair) == 2 and all(_is_text(p) for p in pair) for pair in pairs)):
+        return ["'pairs' must be a non-empty list of [english, korean] pairs"]
+    return []
+
+
+def _check_ordering(activity):
+    if not _is_text(activity.get('prompt')):
+        return ["'prompt' must be a non-empty string"]
+    if not _text_list(activity.get('words')):
+        return ["'words' must be a non-empty list of strings"]
+    if sorted(activity['words']) != sorted(activity['prompt'].split()):
+        return ["'words' must be the words of 'prompt'"]
+    return []
+
+
+def _check_listening(activity):
+    problems = []
+    if not _is_text(activity.get('prompt_audio_text')):
+        problems.append("'prompt_audio_text' must be a non-empty string")
+    if not _text_list(activity.get('options')):
+        problems.append("'options' must be a non-empty list of strings")
+    elif activity.get('correct_answer') not in activity['options']:
+        problems.append("'correct_answer' must be one of 'options'")
+    return problems
+
+
+def _check_speaking(activity):
+    if not _is_text(activity.get('prompt')):
+        return ["'prompt' must be a non-empty string"]
+    return []
+
+
+ACTIVITY_CHECKS = {
+    'MATCHING': _check_matching,
+    'ORDERING': _check_ordering,
+    'LISTENING': _check_listening,
+    'SPEAKING': _check_speaking,
+}
+
+
+def topics_problems(topics):
+    """Everything wrong with a Lesson.topics value, as messages (empty when valid)."""
+    if not isinstance(topics, dict):
+        return ["'topics' must be an object"]
+    activities = topics.get('activities')
+    if not isinstance(activities, list) or not activities:
+        return ["'topics.activities' must be a non-empty list"]
+    problems = []
+    for i, activity in enumerate(activities):
+        if not isinstance(activity, dict):
+            problems.append(f"activity {i}: must be an object")
+            continue
+        check = ACTIVITY_CHECKS.get(activity.get('type'))
+        if check is None:
+            problems.append(f"activity {i}: unknown type {activity.get('type')!r} "
+                            f"(expected one of {', '.join(ACTIVITY_CHECKS)})")
+            continue
+        if 'title' in activity and not isinstance(activity['title'], str):
+            problems.append(f"activity {i}: 'title' must be a string")
+        problems.extend(f"activity {i} ({activity['type']}): {problem}" for problem in check(activity))
+    return problems
+
+
+def _is_slug(value):
+    from django.core.exceptions import ValidationError
+    from django.core.validators import validate_unicode_slug
+    if not isinstance(value, str):
+        return False
+    try:
+        validate_unicode_slug(value)
+    except ValidationError:
+        return False
+    return True
+
+
+def lesson_key(title):
+    """Default stable key for a lesson: its title, slugified ("lesson-1-daily-routine")."""
+    from django.utils.text import slugify
+    return slugify(title, allow_unicode=True)[:100]
+
+
+def clean_lesson(record):
+    """
+    Validate one imported lesson record and return the Lesson field values
+    {key, title, level, order, topics}. Raises LessonValidationError.
+    """
+    if not isinstance(record, dict):
+        raise LessonValidationError(["lesson must be an object"])
+    problems = []
+    title, level, order = record.get('title'), record.get('level'), record.get('order', 0)
+    if not _is_text(title) or len(title) > 100:
+        problems.append("'title' must be a non-empty string of at most 100 characters")
+    if not _is_text(level) or len(level) > 10:
+        problems.append("'level' must be a non-empty string of at most 10 characters")
+    if not isinstance(order, int) or isinstance(order, bool):
+        problems.append("'order' must be an integer")
+    key = record.get('key') or (lesson_key(title) if _is_text(title) else None)
+    # Checked here because bulk_create doesn't run the SlugField's validators
+    if not _is_slug(key) or len(key) > 100:
+        problems.append("'key' must be a slug (letters, numbers, '-' or '_') of at most 100 characters")
+    problems.extend(topics_problems(record.get('topics')))
+    if problems:
+        raise LessonValidationError(problems)
+    return {'key': key, 'title': title, 'level': level, 'order': order, 'topics': record['topics']}
@@ -0,0 +1,30 @@
+# /superlingo_be/api/log.py
+"""
+One-line JSON log records, so log shippers can index fields instead of
+grepping message text. Used by the 'json' formatter in settings.LOGGING.
+"""
+import json
+import logging
+import time
+
+from .metrics import current_endpoint
+
+# LogRecord attributes that are not `extra=` fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'endpoint': current_endpoint(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RESERVED and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
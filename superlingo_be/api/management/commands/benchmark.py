@@ -0,0 +1,295 @@
+# /superlingo_be/api/management/commands/benchmark.py
+"""
+Load-test the API endpoints and report latency percentiles, throughput and
+DB queries per request.
+
+    python manage.py benchmark --concurrency 16 --requests 200
+    python manage.py benchmark --endpoint chat --endpoint tts --distinct 20 --json
+    python manage.py benchmark --url https://staging.example.com --token <token> --endpoint lessons
+
+By default requests go through Django in this process (django.test.Client,
+one per thread) against the configured database, with Gemini / Cloud TTS /
+Cloud STT replaced by the stand-ins in api/fakes.py - no Google quota is
+spent. Shape the fakes with FAKE_<NAME>_LATENCY / _JITTER / _ERROR_RATE (see
+settings.FAKE_AI); --seed makes the injected latencies and failures repeat
+from run to run. Requests are made as a throwaway `benchmark` user, deleted
+afterwards together with the lesson progress and XP it gained, so it never
+stays on the leaderboard. Synthesized audio goes to a temporary TTS cache
+directory, not TTS_CACHE_DIR.
+
+--url drives a running server over HTTP instead (whatever backend it is
+configured with); DB queries per request are not available then.
+
+Each endpoint runs as its own phase: --warmup requests that are not
+counted, then --requests requests from --concurrency threads. Chat messages
+and TTS sentences are unique per run, so the caches start cold; --distinct N
+cycles through N of them to measure the cache / single-flight hit path.
+--max-p95 MS exits non-zero when an endpoint's p95 is over MS (CI).
+"""
+import array
+import base64
+import http.client
+import json
+import math
+import threading
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from api import fakes, tts_cache
+from api.models import Lesson, User
+from rest_framework.authtoken.models import Token
+
+BENCHMARK_USERNAME = 'benchmark'
+STT_PROMPT = fakes.FAKE_TRANSCRIPT
+
+
+def _tone_base64(seconds=1.0, sample_rate=16000, hz=220):
+    """A LINEAR16 sine tone, so STT preprocessing doesn't drop it as silence."""
+    samples = array.array('h', (
+        int(8000 * math.sin(2 * math.pi * hz * n / sample_rate)) for n in range(int(seconds * sample_rate))
+    ))
+    return base64.b64encode(samples.tobytes()).decode('ascii')
+
+
+@contextmanager
+def _temporary_tts_cache():
+    """Give the run its own TTS cache directory and a fresh process-wide cache built on it."""
+    with tempfile.TemporaryDirectory(prefix='benchmark-tts-') as directory:
+        previous, tts_cache._cache = tts_cache._cache, None
+        try:
+            with override_settings(TTS_CACHE_DIR=directory, TTS_AUDIO_STORE_DIR=None):
+                yield
+        finally:
+            tts_cache._cache = previous
+
+
+# --- Endpoints: name -> (method, path, body for request i) ---
+def _endpoints(run_id, distinct, lesson_ids):
+    def nth(i):
+        return i % distinct if distinct else i
+
+    audio = _tone_base64()
+    return {
+        'chat': lambda i: ('POST', '/api/chat/', {
+            'message': f'How do I say number {nth(i)}? ({run_id})', 'context': {},
+        }),
+        'tts': lambda i: ('POST', '/api/generate-gemini-audio/', {
+            'text': f'This is benchmark sentence number {nth(i)}, run {run_id}.',
+        }),
+        'stt': lambda i: ('POST', '/api/transcribe-audio/', {
+            'audio_base64': audio, 'prompt': STT_PROMPT, 'platform': 'native',
+        }),
+        'lessons': lambda i: ('GET', '/api/lessons/', None),
+        'complete': lambda i: ('POST', '/api/complete-lesson/', {
+            'lesson_id': lesson_ids[i % len(lesson_ids)],
+        }),
+    }
+
+
+ENDPOINT_NAMES = ('chat', 'tts', 'stt', 'lessons', 'complete')
+
+
+# --- Transports: send(method, path, body) -> (status code, DB queries or None) ---
+class InProcessTransport:
+    def __init__(self, token):
+        self.token = token
+        self._local = threading.local()
+
+    def send(self, method, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, body, content_type='application/json')
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        return response.status_code, queries[0]
+
+    def close(self):
+        connection.close()
+
+
+class HttpTransport:
+    def __init__(self, url, token):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.headers = {'Authorization': f'Token {token}', 'Content-Type': 'application/json'}
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.netloc, timeout=120)
+        return conn
+
+    def send(self, method, path, body):
+        payload = json.dumps(body).encode() if body is not None else None
+        for attempt in range(2): # Reconnect once if the server closed the keep-alive connection
+            conn = self._connection()
+            try:
+                conn.request(method, self.prefix + path, body=payload, headers=self.headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status, None
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def get_json(self, path):
+        conn = self._connection()
+        conn.request('GET', self.prefix + path, headers=self.headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise CommandError(f"GET {path} returned {response.status}")
+        return json.loads(data)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+
+
+# --- Stats ---
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(name, samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, code, _ in samples if code is None or code >= 400)
+    queries = [q for _, _, q in samples if q is not None]
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        'endpoint': name,
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API endpoints (fake AI upstreams in-process, or a live server with --url)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', dest='endpoints', action='append', choices=ENDPOINT_NAMES,
+                            help="Endpoint to benchmark; repeat for several (default: all).")
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per endpoint.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at once.")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per endpoint first.")
+        parser.add_argument('--distinct', type=int, default=0,
+                            help="Distinct chat messages / TTS sentences to cycle through (0: all unique).")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Seed for the fake upstreams' latency and failures (default FAKE_AI_SEED).")
+        parser.add_argument('--url', help="Benchmark a running server at this base URL instead.")
+        parser.add_argument('--token', help="API token for --url.")
+        parser.add_argument('--max-p95', type=float, default=None,
+                            help="Exit non-zero if any endpoint's p95 latency is above this many ms.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if options['url']:
+            if not options['token']:
+                raise CommandError("--url needs --token.")
+            transport = HttpTransport(options['url'], options['token'])
+            lesson_ids = [lesson['id'] for lesson in transport.get_json('/api/lessons/?fields=id')]
+            results = self._run_all(transport, lesson_ids, options)
+        else:
+            seed = settings.FAKE_AI_SEED if options['seed'] is None else options['seed']
+            user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+            token, _ = Token.objects.get_or_create(user=user)
+            lesson_ids = list(Lesson.objects.order_by('id').values_list('id', flat=True))
+            try:
+                with override_settings(AI_BACKEND='fake', FAKE_AI_SEED=seed,
+                                       ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), _temporary_tts_cache():
+                    fakes.reseed()
+                    results = self._run_all(InProcessTransport(token.key), lesson_ids, options)
+            finally:
+                # Cascades to its progress, token and jobs; the signals take its XP off the leaderboard
+                User.objects.filter(pk=user.pk).delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self._print_table(results)
+
+        if options['max_p95'] is not None:
+            slow = [r['endpoint'] for r in results if r['p95_ms'] is not None and r['p95_ms'] > options['max_p95']]
+            if slow:
+                raise CommandError(f"p95 above {options['max_p95']} ms: {', '.join(slow)}")
+
+    def _run_all(self, transport, lesson_ids, options):
+        names = options['endpoints'] or list(ENDPOINT_NAMES)
+        if 'complete' in names and not lesson_ids:
+            self.stderr.write("No lessons in the database; skipping complete.")
+            names = [name for name in names if name != 'complete']
+        endpoints = _endpoints(uuid.uuid4().hex[:8], options['distinct'], lesson_ids)
+        concurrency = max(options['concurrency'], 1)
+        results = []
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name in names:
+                make_request = endpoints[name]
+                self._phase(pool, transport, make_request, range(options['warmup']))
+                started = time.perf_counter()
+                samples = self._phase(pool, transport, make_request,
+                                      range(options['warmup'], options['warmup'] + options['requests']))
+                results.append(summarize(name, samples, time.perf_counter() - started))
+            # Let each worker thread drop its connection
+            barrier = threading.Barrier(concurrency)
+            list(pool.map(lambda _: (barrier.wait(), transport.close()), range(concurrency)))
+        return results
+
+    def _phase(self, pool, transport, make_request, indexes):
+        def one(i):
+            method, path, body = make_request(i)
+            started = time.perf_counter()
+            try:
+                code, queries = transport.send(method, path, body)
+            except Exception as e:
+                self.stderr.write(f"{method} {path} failed: {e}")
+                code, queries = None, None
+            return time.perf_counter() - started, code, queries
+
+        return list(pool.map(one, indexes))
+
+    def _print_table(self, results):
+        columns = ('endpoint', 'requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+                   'queries_per_request')
+        rows = [columns] + [tuple('-' if r[c] is None else str(r[c]) for c in columns) for r in results]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+        for row in rows:
+            self.stdout.write('  '.join(value.ljust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,98 @@
+# /superlingo_be/api/management/commands/benchmark_json.py
+"""
+Compare JSON serialization and response sizes before and after the
+orjson renderer/parser and response compression.
+
+    python manage.py benchmark_json --iterations 500
+
+For each payload (the lesson list from the database, a TTS data-URI reply,
+a Korean tutor reply) it reports the median render and parse time with DRF's
+stdlib JSONRenderer/JSONParser and with FastJSONRenderer/FastJSONParser,
+whether both renderers produce the same bytes, and the body size raw, gzipped
+and brotli-compressed (when the brotli package is installed).
+"""
+import base64
+import io
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api import compression
+from api.models import Lesson
+from api.parsers import FastJSONParser, orjson
+from api.renderers import FastJSONRenderer
+from api.serializers import LessonSerializer
+
+TTS_SENTENCE_CHARS = 60
+TTS_BYTES_PER_CHARACTER = 270 # ~32 kbps MP3, as api/fakes.py
+TUTOR_REPLY = (
+    "좋은 질문이에요! 'I like pizza'에서 'like'는 '좋아하다'라는 뜻의 동사예요. "
+    "영어 문장은 보통 주어(I) + 동사(like) + 목적어(pizza) 순서로 만들어요. "
+) * 6
+
+
+def _payloads():
+    lessons = LessonSerializer(Lesson.objects.order_by('id'), many=True,
+                               context={'completed_lesson_ids': frozenset()}).data
+    # MP3 bytes are incompressible, so random bytes stand in for a real clip
+    audio = random.Random(0).randbytes(TTS_SENTENCE_CHARS * TTS_BYTES_PER_CHARACTER)
+    return {
+        f'lesson list ({len(lessons)} lessons)': lessons,
+        'tts audioUrl': {'audioUrl': 'data:audio/mpeg;base64,' + base64.b64encode(audio).decode('ascii')},
+        'tutor reply': {'reply': TUTOR_REPLY},
+    }
+
+
+def _median_ms(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmark JSON rendering/parsing (stdlib vs orjson) and compressed response sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="Timed runs per measurement.")
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        if orjson is None:
+            self.stderr.write("orjson is not installed; the fast renderer/parser fall back to json.")
+        rows = []
+        for name, data in _payloads().items():
+            before = JSONRenderer().render(data)
+            after = FastJSONRenderer().render(data)
+            row = {
+                'payload': name,
+                'render json ms': _median_ms(lambda: JSONRenderer().render(data), iterations),
+                'render fast ms': _median_ms(lambda: FastJSONRenderer().render(data), iterations),
+                'parse json ms': _median_ms(lambda: JSONParser().parse(io.BytesIO(before)), iterations),
+                'parse fast ms': _median_ms(lambda: FastJSONParser().parse(io.BytesIO(before)), iterations),
+                'same bytes': 'yes' if before == after else 'NO',
+                'raw bytes': len(after),
+                'gzip bytes': len(compression.compress(after, 'gzip')),
+                'br bytes': len(compression.compress(after, 'br')) if compression.brotli else None,
+            }
+            rows.append(row)
+        self._print_table(rows)
+
+    def _print_table(self, rows):
+        columns = list(rows[0])
+
+        def cell(value):
+            if value is None:
+                return '-'
+            return f'{value:.3f}' if isinstance(value, float) else str(value)
+
+        table = [columns] + [[cell(row[c]) for c in columns] for row in rows]
+        widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+        for line in table:
+            self.stdout.write('  '.join(value.ljust(width) for value, width in zip(line, widths)))
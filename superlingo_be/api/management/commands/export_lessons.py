@@ -0,0 +1,45 @@
+# /superlingo_be/api/management/commands/export_lessons.py
+"""
+Export the lesson catalog as JSON Lines, one lesson per line.
+
+    python manage.py export_lessons -o lessons.jsonl
+    python manage.py export_lessons | gzip > lessons.jsonl.gz
+
+Each line is {"key", "title", "level", "order", "topics"}, the format
+`import_lessons` reads. Rows are streamed from the database in --chunk-size
+batches and written as they arrive, so memory stays flat however big the
+catalog is.
+"""
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.models import Lesson
+from api.renderers import json_bytes
+
+EXPORT_FIELDS = ('key', 'title', 'level', 'order', 'topics')
+
+
+class Command(BaseCommand):
+    help = "Write all lessons to a JSON Lines file (or stdout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help="File to write (default: stdout).")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Lessons fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        to_stdout = options['output'] == '-'
+        out = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        count = 0
+        try:
+            rows = (Lesson.objects.order_by('order', 'id').values(*EXPORT_FIELDS)
+                    .iterator(chunk_size=max(options['chunk_size'], 1)))
+            for row in rows:
+                out.write(json_bytes(row) + b'\n')
+                count += 1
+            out.flush()
+        finally:
+            if not to_stdout:
+                out.close()
+        if not to_stdout:
+            self.stdout.write(f"Exported {count} lessons to {options['output']}.")
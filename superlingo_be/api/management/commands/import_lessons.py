@@ -0,0 +1,129 @@
+# /superlingo_be/api/management/commands/import_lessons.py
+"""
+Import lessons from JSON Lines (as written by `export_lessons`).
+
+    python manage.py import_lessons lessons.jsonl
+    zcat lessons.jsonl.gz | python manage.py import_lessons - --atomic
+    python manage.py import_lessons lessons.jsonl --dry-run
+
+Lessons are matched on `key` (defaulting to the slugified title): new keys
+are created, existing ones updated, and lessons whose content is already
+identical are left alone so their `updated_at` - and the clients' delta
+syncs - don't move. Every line is checked against the activity schemas
+(api/lesson_content.py); invalid lines are reported with their line number
+and skipped. When a key appears more than once, the last line wins.
+
+The file is read line by line and written in --batch-size upserts (one
+INSERT ... ON CONFLICT per batch, each in its own transaction), so memory is
+bounded by the batch, not the file. --atomic runs the whole import in one
+transaction and rolls it back if any line is invalid.
+
+bulk_create skips the Lesson signals, so the catalog version and tutor
+answer cache are invalidated here instead; other processes pick the change
+up within LESSON_CATALOG_MAX_AGE. Run `prerender_tts` afterwards for new
+speakable text.
+"""
+import functools
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.catalog import bump_catalog_version
+from api.lesson_content import LessonValidationError, clean_lesson
+from api.models import Lesson
+from api.parsers import loads
+from api.tutor_cache import invalidate_lesson
+
+IMPORT_FIELDS = ('key', 'title', 'level', 'order', 'topics')
+UPDATE_FIELDS = ['title', 'level', 'order', 'topics', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = "Create or update lessons from a JSON Lines file (or stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON Lines file to read, or - for stdin.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Lessons written per upsert.")
+        parser.add_argument('--atomic', action='store_true',
+                            help="All or nothing: roll everything back if any line is invalid.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing.")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+        batch_size = max(options['batch_size'], 1)
+        invalid = 0
+        if options['path'] == '-':
+            source = sys.stdin.buffer
+        else:
+            try:
+                source = open(options['path'], 'rb')
+            except OSError as e:
+                raise CommandError(f"Cannot read {options['path']}: {e}") from e
+        try:
+            with transaction.atomic() if options['atomic'] else nullcontext():
+                batch, seen_at = {}, {}
+                for lineno, line in enumerate(source, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        values = clean_lesson(loads(line))
+                    except LessonValidationError as e:
+                        invalid += 1
+                        for problem in e.problems:
+                            self.stderr.write(f"line {lineno}: {problem}")
+                        continue
+                    except ValueError as e: # Bad JSON or UTF-8
+                        invalid += 1
+                        self.stderr.write(f"line {lineno}: not valid JSON ({e})")
+                        continue
+                    key = values['key']
+                    if key in seen_at:
+                        self.stderr.write(f"line {lineno}: key {key!r} repeats line {seen_at[key]}; using this one")
+                    seen_at[key] = lineno
+                    batch[key] = values
+                    if len(batch) >= batch_size:
+                        self._write(batch)
+                        batch = {}
+                self._write(batch)
+                if invalid and options['atomic']:
+                    raise CommandError(f"{invalid} invalid line(s); nothing was imported.")
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+
+        verb = "Would create" if self.dry_run else "Created"
+        self.stdout.write(f"{verb} {self.counts['created']}, updated {self.counts['updated']}, "
+                          f"left {self.counts['unchanged']} unchanged; {invalid} invalid line(s).")
+        if invalid:
+            raise CommandError(f"{invalid} invalid line(s) were skipped.")
+
+    def _write(self, batch):
+        if not batch:
+            return
+        existing = {row['key']: row for row in Lesson.objects.filter(key__in=batch).values('id', *IMPORT_FIELDS)}
+        changed = [
+            values for key, values in batch.items()
+            if key not in existing or any(existing[key][field] != values[field] for field in IMPORT_FIELDS)
+        ]
+        created = sum(1 for values in changed if values['key'] not in existing)
+        self.counts['created'] += created
+        self.counts['updated'] += len(changed) - created
+        self.counts['unchanged'] += len(batch) - len(changed)
+        if self.dry_run or not changed:
+            return
+
+        now = timezone.now() # bulk_create doesn't apply auto_now on the UPDATE side of an upsert
+        with transaction.atomic():
+            Lesson.objects.bulk_create(
+                [Lesson(**values, updated_at=now) for values in changed],
+                update_conflicts=True, unique_fields=['key'], update_fields=UPDATE_FIELDS,
+            )
+            transaction.on_commit(bump_catalog_version)
+            for values in changed:
+                old = existing.get(values['key'])
+                if old is not None: # Cached tutor answers may quote the old content
+                    transaction.on_commit(functools.partial(invalidate_lesson, old['id'], old['title']))
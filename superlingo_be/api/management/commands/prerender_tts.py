@@ -0,0 +1,89 @@
+# /superlingo_be/api/management/commands/prerender_tts.py
+"""
+Pre-render TTS audio for every speakable string in the lesson catalog.
+
+    python manage.py prerender_tts --workers 8 --format mp3 --format opus
+
+Clips are content-addressed, so re-runs only synthesize strings that are new
+or changed since the last run. `--prune` removes stored clips whose text is no
+longer in any lesson.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import clients
+from api.audio_response import AUDIO_FORMATS
+from api.lesson_content import iter_speakable_texts
+from api.models import Lesson
+from api.tts_cache import get_tts_cache, tts_cache_key
+
+
+class Command(BaseCommand):
+    help = "Synthesize TTS audio for all lesson text into the persistent audio store."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8,
+                            help="Concurrent Cloud TTS requests (default: 8).")
+        parser.add_argument('--format', dest='formats', action='append', choices=sorted(AUDIO_FORMATS),
+                            help="Audio format to render; repeat for several (default: mp3).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report what would be synthesized.")
+        parser.add_argument('--prune', action='store_true',
+                            help="Delete stored clips not needed for the catalog in the requested formats.")
+
+    def handle(self, *args, **options):
+        # Imported here so `manage.py help` does not build the Google clients
+        from api import views
+
+        cache = get_tts_cache()
+        if not cache.store_directory:
+            raise CommandError("TTS_AUDIO_STORE_DIR is not set; there is nowhere to persist the audio.")
+
+        # dict keeps first-seen order while de-duplicating across lessons
+        texts = {}
+        for topics in Lesson.objects.values_list('topics', flat=True).iterator():
+            for text in iter_speakable_texts(topics):
+                texts.setdefault(text, None)
+
+        encodings = [AUDIO_FORMATS[fmt][0] for fmt in (options['formats'] or ['mp3'])]
+        wanted = {
+            tts_cache_key(text, views.TTS_VOICE_NAME, encoding): (text, encoding)
+            for text in texts for encoding in encodings
+        }
+        stored = cache.pinned_keys()
+        todo = {key: job for key, job in wanted.items() if key not in stored}
+
+        self.stdout.write(
+            f"{len(texts)} unique strings, {len(wanted)} clips: "
+            f"{len(wanted) - len(todo)} already stored, {len(todo)} to synthesize."
+        )
+
+        if options['prune']:
+            stale = stored - set(wanted)
+            if not options['dry_run']:
+                for key in stale:
+                    cache.unpin(key)
+            self.stdout.write(f"Pruned {len(stale)} stale clips.")
+
+        if options['dry_run'] or not todo:
+            return
+        if not clients.tts_ready():
+            raise CommandError("Google Cloud TTS client is not configured.")
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                pool.submit(views.synthesize_tts_audio, text, encoding, True): text
+                for text, encoding in todo.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Failed to synthesize '{futures[future]}': {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Synthesized {len(todo) - failed} clips ({failed} failed)."))
+        if failed:
+            raise CommandError(f"{failed} clips failed; re-run to retry them.")
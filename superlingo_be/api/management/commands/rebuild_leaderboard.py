@@ -0,0 +1,36 @@
+# /superlingo_be/api/management/commands/rebuild_leaderboard.py
+"""
+Recount the leaderboard's XP buckets from the user table.
+
+    python manage.py rebuild_leaderboard
+
+The buckets are maintained incrementally (api/leaderboard.py); run this after
+bulk changes that bypass the ORM, e.g. a raw SQL import of users, or
+`--check` from a cron job to see whether they have drifted.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from api.leaderboard import rebuild_buckets
+from api.models import User, XPBucket
+
+
+class Command(BaseCommand):
+    help = "Rebuild the XP buckets behind leaderboard ranks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare the buckets with the user table; exit non-zero on drift.")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            actual = dict(User.objects.values_list('experience_points').annotate(n=Count('id')).order_by())
+            stored = {xp: n for xp, n in XPBucket.objects.values_list('experience_points', 'user_count') if n}
+            drifted = sorted(xp for xp in actual.keys() | stored.keys() if actual.get(xp, 0) != stored.get(xp, 0))
+            if drifted:
+                raise CommandError(f"{len(drifted)} XP buckets out of date (e.g. {drifted[:5]}); run without --check.")
+            self.stdout.write(self.style.SUCCESS(f"All {len(actual)} XP buckets match."))
+            return
+
+        count = rebuild_buckets()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} XP buckets."))
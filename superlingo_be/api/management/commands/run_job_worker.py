@@ -0,0 +1,99 @@
+# /superlingo_be/api/management/commands/run_job_worker.py
+"""
+Run queued background jobs (api/jobs.py).
+
+    python manage.py run_job_worker --concurrency 4
+
+Each thread claims one job at a time with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of workers can run side by side on PostgreSQL. The upstream
+bulkheads (api/resilience.py) still cap calls per process, so --concurrency
+beyond an upstream's max_concurrent only queues inside the worker.
+
+SIGTERM/SIGINT stop claiming new jobs; running jobs are finished first.
+`--once` drains the jobs that are due and exits (cron, tests).
+"""
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from api import jobs
+
+MAINTENANCE_INTERVAL = 60 # Seconds between stale-job requeues / purges
+
+
+class Command(BaseCommand):
+    help = "Process background TTS/STT/tutor jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Jobs run at the same time (threads).")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds to sleep when the queue is empty (default JOB_WORKER_POLL_INTERVAL).")
+        parser.add_argument('--once', action='store_true', help="Exit once no due jobs are left.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.poll_interval = options['poll_interval'] or settings.JOB_WORKER_POLL_INTERVAL
+        self.once = options['once']
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._request_stop)
+
+        self._maintenance()
+        threads = [
+            threading.Thread(target=self._loop, args=(f"{self.worker_id}:{n}",), name=f"job-worker-{n}")
+            for n in range(max(options['concurrency'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Job worker {self.worker_id} running {len(threads)} thread(s).")
+
+        last_maintenance = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+            if not self.stop.is_set() and time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                self._maintenance()
+                last_maintenance = time.monotonic()
+        self.stdout.write(self.style.SUCCESS("Job worker stopped."))
+
+    def _request_stop(self, signum, frame):
+        self.stdout.write("Stopping after the running jobs finish...")
+        self.stop.set()
+
+    def _maintenance(self):
+        requeued = jobs.requeue_stale()
+        purged = jobs.purge()
+        if requeued or purged:
+            self.stdout.write(f"Requeued {requeued} stale job(s), purged {purged} finished job(s).")
+        close_old_connections()
+
+    def _loop(self, worker_id):
+        try:
+            while not self.stop.is_set():
+                close_old_connections() # Honour CONN_MAX_AGE as request threads do
+                try:
+                    claimed = jobs.claim(worker_id)
+                except DatabaseError as e: # Lost connection / lock timeout: back off, keep the thread
+                    self.stderr.write(f"Could not claim jobs: {e}")
+                    self.stop.wait(self.poll_interval)
+                    continue
+                if not claimed:
+                    if self.once:
+                        return
+                    self.stop.wait(self.poll_interval)
+                    continue
+                for job in claimed:
+                    try:
+                        status = jobs.run(job)
+                    except DatabaseError as e: # Outcome not stored; requeue_stale picks the job up again
+                        self.stderr.write(f"Job {job.pk} ({job.kind}): could not store the outcome: {e}")
+                        continue
+                    self.stdout.write(f"Job {job.pk} ({job.kind}): {status}")
+        finally:
+            connection.close()
@@ -0,0 +1,233 @@
+# /superlingo_be/api/metrics.py
+"""
+In-process latency metrics, exposed in Prometheus text format at /metrics.
+
+- MetricsMiddleware records one histogram sample per request, labelled with
+  the URL name ('chat-with-tutor', 'lesson-list', ...), method and status.
+- `timed('gemini' | 'tts' | 'stt')` wraps upstream calls; DB time is
+  recorded for every query through a connection execute wrapper. Both are
+  attributed to the endpoint currently being served.
+- Other modules can contribute gauges/counters (cache stats etc.) with
+  `register_collector`.
+
+Each worker process keeps its own numbers; scrape every worker, or run one
+process per container.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+# Seconds. Covers fast cached reads up to slow LLM replies.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_endpoint = contextvars.ContextVar('superlingo_endpoint', default='other')
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {} # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            base = list(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_labels(base + [("le", repr(bound))])} {count}')
+            lines.append(f'{self.name}_bucket{_labels(base + [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(base)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{_labels(base)} {series[-1]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+REQUEST_LATENCY = Histogram(
+    'superlingo_request_duration_seconds', 'Time to produce a response, per endpoint.',
+    ['endpoint', 'method', 'status'],
+)
+UPSTREAM_LATENCY = Histogram(
+    'superlingo_upstream_duration_seconds', 'Time spent in upstream calls (gemini, tts, stt, db), per endpoint.',
+    ['upstream', 'endpoint', 'outcome'],
+)
+TUTOR_STREAM_TTFT = Histogram(
+    'superlingo_tutor_stream_first_token_seconds', 'Time to the first streamed Gemini token.', [],
+)
+
+_collectors = []
+
+
+def register_collector(collect):
+    """
+    `collect()` returns an iterable of (name, type, help, value, labels dict)
+    samples rendered on every scrape.
+    """
+    _collectors.append(collect)
+
+
+def current_endpoint():
+    return _current_endpoint.get()
+
+
+@contextmanager
+def timed(upstream, endpoint=None):
+    """Record the duration of an upstream call; outcome is 'error' if it raised."""
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(
+            time.perf_counter() - started,
+            upstream=upstream, endpoint=endpoint or _current_endpoint.get(), outcome=outcome,
+        )
+
+
+def _db_timer(execute, sql, params, many, context):
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_db_timer(sender, connection, **kwargs):
+    if _db_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_timer)
+
+
+def render_metrics():
+    lines = []
+    for histogram in (REQUEST_LATENCY, UPSTREAM_LATENCY, TUTOR_STREAM_TTFT):
+        lines.extend(histogram.render())
+    # Samples of one metric must be contiguous, whichever collector produced them
+    families = {}
+    for collect in _collectors:
+        for name, metric_type, help_text, value, labels in collect():
+            family = families.setdefault(name, [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}'])
+            family.append(f'{name}{_labels(sorted(labels.items()))} {value}')
+    for family in families.values():
+        lines.extend(family)
+    return '\n'.join(lines) + '\n'
+
+
+def _endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match else None) or 'unmatched'
+
+
+class MetricsMiddleware:
+    """Per-endpoint request latency. Works for both sync and async views."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        token = _current_endpoint.set('unmatched')
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_endpoint.reset(token)
+        self._record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        token = _current_endpoint.set('unmatched')
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_endpoint.reset(token)
+        self._record(request, response, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # URL resolution has happened; label everything below with the endpoint
+        _current_endpoint.set(_endpoint_name(request))
+        return None
+
+    @staticmethod
+    def _record(request, response, started):
+        # For streamed responses this is time to headers, not to the last byte
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            endpoint=_endpoint_name(request), method=request.method, status=response.status_code,
+        )
+
+
+def cache_stats_collector():
+    """The numbers behind the */stats endpoints, as `superlingo_cache_<stat>{cache=...}` gauges."""
+    from .authentication import auth_cache_stats
+    from .tts_cache import get_tts_cache
+    from .tutor_cache import get_tutor_answer_cache
+
+    sources = {'tts': get_tts_cache().stats, 'auth': auth_cache_stats}
+    answer_cache = get_tutor_answer_cache()
+    if answer_cache is not None:
+        sources['tutor_answer'] = answer_cache.stats
+    for cache_name, stats in sources.items():
+        for stat, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f'superlingo_cache_{stat}', 'gauge', f'Cache stat "{stat}".', value, {'cache': cache_name}
+
+
+def metrics_view(request):
+    """
+    GET /metrics in Prometheus text format, for scrapers sending
+    `Authorization: Bearer <METRICS_TOKEN>` or a logged-in staff user.
+    The cache and job-queue numbers are admin-only on the API, so without a
+    token the endpoint is closed to everyone else.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scraper = bool(token) and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    user = getattr(request, 'user', None)
+    if not scraper and not (user is not None and user.is_staff):
+        if token:
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
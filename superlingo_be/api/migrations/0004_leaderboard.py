@@ -0,0 +1,32 @@
+# /superlingo_be/api/migrations/0004_leaderboard.py
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_xp_buckets(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    XPBucket = apps.get_model('api', 'XPBucket')
+    counts = User.objects.values('experience_points').annotate(n=Count('id')).order_by()
+    XPBucket.objects.bulk_create(
+        [XPBucket(experience_points=row['experience_points'], user_count=row['n']) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [('api', '0003_add_speaking_activity')]
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-experience_points', 'id'], name='api_user_xp_rank_idx'),
+        ),
+        migrations.CreateModel(
+            name='XPBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('experience_points', models.IntegerField(unique=True)),
+                ('user_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_xp_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# /superlingo_be/api/migrations/0005_lesson_updated_at.py
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [('api', '0004_leaderboard')]
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='updated_at',
+            # Existing lessons count as changed now, so clients' first delta sync picks them all up
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
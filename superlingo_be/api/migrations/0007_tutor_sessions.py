@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(blank=True, max_length=20)),
+                ('activity_key', models.CharField(max_length=64)),
+                ('lesson_id', models.IntegerField(blank=True, null=True)),
+                ('summary', models.TextField(blank=True)),
+                ('turn_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tutor_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TutorTurn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.IntegerField()),
+                ('student', models.TextField()),
+                ('tutor', models.TextField()),
+                ('tokens', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turns', to='api.tutorsession')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tutorsession',
+            index=models.Index(fields=['user', 'activity_key', '-updated_at'], name='api_tutorsession_resume_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tutorturn',
+            constraint=models.UniqueConstraint(fields=('session', 'seq'), name='api_tutorturn_session_seq_uniq'),
+        ),
+    ]
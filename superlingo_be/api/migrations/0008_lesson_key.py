@@ -0,0 +1,49 @@
+# /superlingo_be/api/migrations/0008_lesson_key.py
+# Gives every lesson a stable, unique `key` for manage.py import_lessons /
+# export_lessons. 0002 and 0003 both inserted "Lesson 3 - Basic Speaking";
+# lessons with the same title and content are merged into the oldest row
+# first (progress moves over, a user keeps at most one row per lesson).
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def merge_duplicates_and_fill_keys(apps, schema_editor):
+    Lesson = apps.get_model('api', 'Lesson')
+    UserLessonProgress = apps.get_model('api', 'UserLessonProgress')
+    kept = {}
+    for lesson in Lesson.objects.order_by('id'):
+        original = kept.get(lesson.title)
+        if original is None or original.topics != lesson.topics:
+            kept.setdefault(lesson.title, lesson)
+            continue
+        if not original.order and lesson.order:
+            Lesson.objects.filter(pk=original.pk).update(order=lesson.order)
+        already = UserLessonProgress.objects.filter(lesson=original).values('user_id')
+        UserLessonProgress.objects.filter(lesson=lesson, user_id__in=already).delete()
+        UserLessonProgress.objects.filter(lesson=lesson).update(lesson=original)
+        lesson.delete()
+
+    used = set()
+    for lesson in Lesson.objects.order_by('id'):
+        key = slugify(lesson.title, allow_unicode=True)[:100] or 'lesson'
+        if key in used: # Same title, different content: keep both, disambiguated by id
+            key = f'{key[:90]}-{lesson.pk}'
+        used.add(key)
+        Lesson.objects.filter(pk=lesson.pk).update(key=key)
+
+
+class Migration(migrations.Migration):
+    dependencies = [('api', '0007_tutor_sessions')]
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='key',
+            field=models.SlugField(allow_unicode=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(merge_duplicates_and_fill_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lesson',
+            name='key',
+            field=models.SlugField(allow_unicode=True, blank=True, max_length=100, unique=True),
+        ),
+    ]
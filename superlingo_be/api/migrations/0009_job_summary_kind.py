@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_lesson_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('tts', 'Text to speech'), ('stt', 'Speech to text'), ('chat', 'Tutor reply'), ('summary', 'Tutor session summary')], max_length=10),
+        ),
+    ]
@@ -1,16 +1,28 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+
+from .lesson_content import lesson_key
 
 class User(AbstractUser):
     # Add email field and new experience field
     email = models.EmailField(unique=True, blank=False)
     experience_points = models.IntegerField(default=0)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Leaderboard order: top-N and "users around me" are range scans on this
+            models.Index(fields=['-experience_points', 'id'], name='api_user_xp_rank_idx'),
+        ]
+
 class Lesson(models.Model):
+    # Stable identity for import/export ("lesson-1-daily-routine"); left blank, save() uses the slugified title
+    key = models.SlugField(max_length=100, unique=True, blank=True, allow_unicode=True)
     title = models.CharField(max_length=100) # This will be like "Lesson 1 - Daily Routine"
     level = models.CharField(max_length=10)
     topics = models.JSONField() # This holds the activities, title, etc.
     order = models.IntegerField(default=0) # To keep lessons in order
+    updated_at = models.DateTimeField(auto_now=True, db_index=True) # For ?updated_since= delta syncs
 
     class Meta:
         ordering = ['order']
@@ -18,6 +30,11 @@ class Lesson(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = lesson_key(self.title)
+        super().save(*args, **kwargs)
+
 # NEW Model to track which user completed which lesson
 class UserLessonProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -26,4 +43,78 @@ class UserLessonProgress(models.Model):
 
     class Meta:
         # Ensure a user can only have one entry per lesson
-        unique_together = ('user', 'lesson')
\ No newline at end of file
+        unique_together = ('user', 'lesson')
+
+# Number of users at each XP total, kept up to date by record_lesson_completions
+# and the User signals. A user's rank is 1 + the users in buckets above theirs,
+# so rank lookups read a few hundred rows however many users there are.
+class XPBucket(models.Model):
+    experience_points = models.IntegerField(unique=True)
+    user_count = models.IntegerField(default=0)
+
+
+# Slow AI work (TTS, STT, tutor replies) queued for `manage.py run_job_worker`; see api/jobs.py
+class Job(models.Model):
+    KIND_CHOICES = [
+        ('tts', 'Text to speech'), ('stt', 'Speech to text'), ('chat', 'Tutor reply'),
+        ('summary', 'Tutor session summary'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    payload = models.JSONField(default=dict) # Same fields as the matching synchronous endpoint
+    audio = models.BinaryField(null=True, blank=True) # STT recording, kept out of the JSON payload
+    result = models.JSONField(null=True, blank=True) # Same body as the synchronous endpoint returns
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now) # Pushed back between retries
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True) # Worker id while running
+
+    class Meta:
+        indexes = [
+            # The worker's claim query: next queued jobs that are due
+            models.Index(fields=['status', 'run_after'], name='api_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} job {self.pk} ({self.status})'
+
+
+# Multi-turn tutor conversation (api/tutor_sessions.py). Turns that no longer fit the
+# history budget are folded into `summary` and deleted, so a session stays small.
+class TutorSession(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tutor_sessions')
+    activity_type = models.CharField(max_length=20, blank=True)
+    activity_key = models.CharField(max_length=64) # Hash of the activity context, to resume by activity
+    lesson_id = models.IntegerField(null=True, blank=True) # Plain id: a session outlives lesson edits
+    summary = models.TextField(blank=True) # Rolling summary of the folded turns
+    turn_count = models.IntegerField(default=0) # Turns ever recorded; the next turn's seq
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'activity_key', '-updated_at'], name='api_tutorsession_resume_idx'),
+        ]
+
+
+class TutorTurn(models.Model):
+    session = models.ForeignKey(TutorSession, on_delete=models.CASCADE, related_name='turns')
+    seq = models.IntegerField()
+    student = models.TextField()
+    tutor = models.TextField()
+    tokens = models.IntegerField() # Estimated prompt tokens of both messages
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'seq'], name='api_tutorturn_session_seq_uniq'),
+        ]
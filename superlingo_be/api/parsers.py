@@ -0,0 +1,83 @@
+# /superlingo_be/api/parsers.py
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework import exceptions, status
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - optional dependency
+    orjson = None
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Audio upload too large.'
+    default_code = 'upload_too_large'
+
+
+def max_audio_upload_bytes():
+    return getattr(settings, 'TRANSCRIBE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+
+
+def read_limited(stream, limit):
+    """Read a whole body, but never more than `limit` bytes (for uploads without Content-Length)."""
+    data = stream.read(limit + 1)
+    if len(data) > limit:
+        raise UploadTooLarge()
+    return data
+
+
+class RawAudioParser(BaseParser):
+    """
+    Accepts a bare `audio/*` request body (e.g. `Content-Type: audio/wav`)
+    and exposes it as `request.data['audio']`, read once straight from the
+    request stream. Other fields (prompt, platform) come from the query string.
+    """
+    media_type = 'audio/*'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None: # Empty body
+            return {}
+        return {'audio': read_limited(stream, max_audio_upload_bytes())}
+
+
+def loads(body):
+    """Parse a JSON request body (bytes); orjson when installed. Raises ValueError."""
+    if orjson is not None:
+        return orjson.loads(body) # orjson.JSONDecodeError is a ValueError
+    return json.loads(body)
+
+
+class AudioJSONParser(BaseParser):
+    """
+    JSON for the audio upload endpoints (`audio_base64`), read with
+    read_limited up to TRANSCRIBE_MAX_UPLOAD_BYTES. Not a JSONParser subclass
+    on purpose: DRF feeds those request.body, which Django caps at
+    DATA_UPLOAD_MAX_MEMORY_SIZE for every endpoint.
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None: # Empty body
+            return {}
+        try:
+            return loads(read_limited(stream, max_audio_upload_bytes()))
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser backed by orjson when it is installed (UTF-8 bodies; orjson is always strict)."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
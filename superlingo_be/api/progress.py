@@ -0,0 +1,87 @@
+# /superlingo_be/api/progress.py
+"""
+Recording lesson completions and awarding XP.
+
+Everything happens in one transaction with two statements, whatever the
+number of lessons:
+
+1. INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING lesson_id
+   creates the missing UserLessonProgress rows (only for lessons that exist)
+   and tells us which ones are new, and
+2. UPDATE ... SET experience_points = experience_points + n RETURNING ...
+   awards XP for exactly those rows (and the user moves XP bucket on the
+   leaderboard, see api/leaderboard.py).
+
+The unique (user, lesson) constraint plus the in-database increment mean two
+concurrent completions can neither award XP twice nor lose an increment.
+Both PostgreSQL and SQLite (3.35+) support this syntax.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+from . import db_router, leaderboard
+from .models import Lesson, User, UserLessonProgress
+
+XP_PER_LESSON = 100
+MAX_BATCH_SIZE = 500
+
+CompletionResult = namedtuple(
+    'CompletionResult',
+    ['completed', 'already_completed', 'not_found', 'xp_gained', 'total_experience_points'],
+)
+
+
+def _insert_progress(cursor, user_id, lesson_ids):
+    qn = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(lesson_ids))
+    cursor.execute(
+        f"INSERT INTO {qn(UserLessonProgress._meta.db_table)} (user_id, lesson_id, completed) "
+        f"SELECT %s, id, %s FROM {qn(Lesson._meta.db_table)} WHERE id IN ({placeholders}) "
+        f"ON CONFLICT (user_id, lesson_id) DO NOTHING "
+        f"RETURNING lesson_id",
+        [user_id, True, *lesson_ids],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _add_experience(cursor, user_id, xp):
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"UPDATE {qn(User._meta.db_table)} SET experience_points = experience_points + %s "
+        f"WHERE id = %s RETURNING experience_points",
+        [xp, user_id],
+    )
+    return cursor.fetchone()[0]
+
+
+def record_lesson_completions(user, lesson_ids):
+    """
+    Mark `lesson_ids` completed for `user` and award XP for the new ones.
+    Also updates `user.experience_points` in memory.
+    """
+    lesson_ids = list(dict.fromkeys(lesson_ids)) # De-duplicate, keep order
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            new_ids = set(_insert_progress(cursor, user.pk, lesson_ids)) if lesson_ids else set()
+            xp_gained = XP_PER_LESSON * len(new_ids)
+            # Runs even for xp_gained == 0 so the total we return is the current one
+            total = _add_experience(cursor, user.pk, xp_gained)
+            # Keep the leaderboard's rank buckets in step, in the same transaction
+            leaderboard.move_user(cursor, total - xp_gained, total)
+
+    # The user's next lesson list must show these as completed, even if the replica lags
+    db_router.pin_after_commit(db_router.user_pin(user.pk))
+
+    rest = [lesson_id for lesson_id in lesson_ids if lesson_id not in new_ids]
+    existing = set(Lesson.objects.filter(id__in=rest).values_list('id', flat=True)) if rest else set()
+
+    # Only this object: a cached copy of the user (api/authentication.py) keeps its old XP
+    user.experience_points = total
+    return CompletionResult(
+        completed=[lesson_id for lesson_id in lesson_ids if lesson_id in new_ids],
+        already_completed=[lesson_id for lesson_id in rest if lesson_id in existing],
+        not_found=[lesson_id for lesson_id in rest if lesson_id not in existing],
+        xp_gained=xp_gained,
+        total_experience_points=total,
+    )
@@ -0,0 +1,89 @@
+# /superlingo_be/api/renderers.py
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - optional dependency
+    orjson = None
+
+_drf_encoder = JSONEncoder()
+# Datetimes go through DRF's encoder so they render exactly as before ('...Z', milliseconds)
+_ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def _stdlib_json_bytes(data):
+    ret = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+def json_bytes(data):
+    """
+    Compact UTF-8 JSON, byte-for-byte what DRF's JSONRenderer produces with
+    the default settings, via orjson when it is installed.
+    """
+    if orjson is None:
+        return _stdlib_json_bytes(data)
+    try:
+        ret = orjson.dumps(data, default=_drf_encoder.default, option=_ORJSON_OPTIONS)
+    except TypeError: # orjson.JSONEncodeError, e.g. an int over 64 bits; let json have a go
+        return _stdlib_json_bytes(data)
+    # Like DRF: escape U+2028/U+2029, which are valid JSON but end a JavaScript line
+    for raw, escaped in _LINE_SEPARATORS:
+        if raw in ret:
+            ret = ret.replace(raw, escaped)
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson (several times faster on the lesson list
+    and base64 TTS payloads). Falls back to DRF's renderer for indented
+    output (`Accept: application/json; indent=2`), non-default JSON settings
+    or when orjson is missing.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or not (self.ensure_ascii is False and self.compact and self.strict) \
+                or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return json_bytes(data)
+
+
+class AudioRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: audio/*`. Audio views return
+    a ready-made HttpResponse, so only error payloads ever reach render(),
+    and those are still written as JSON.
+    """
+    media_type = 'audio/*'
+    format = 'audio'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: text/event-stream` for the
+    streaming chat view. Error payloads are sent as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
@@ -0,0 +1,349 @@
+# /superlingo_be/api/resilience.py
+"""
+Bulkheads and circuit breakers for the AI upstreams (Gemini, Cloud TTS,
+Cloud STT).
+
+A slow upstream used to hold a worker thread per request until the platform
+timed out, starving cheap endpoints like /api/lessons/. Every upstream call
+now goes through `upstream(name).call()` (or `.acall()` in async views):
+
+- the circuit breaker rejects the call straight away while the upstream is
+  failing (error rate over the last CIRCUIT_BREAKER_WINDOW calls above
+  CIRCUIT_BREAKER_ERROR_RATE), then lets one trial call through after
+  CIRCUIT_BREAKER_RESET_TIMEOUT seconds;
+- the bulkhead caps concurrent calls, queues a bounded number of callers for
+  at most UPSTREAM_QUEUE_TIMEOUT seconds and rejects the rest;
+- the per-call deadline (UPSTREAM_LIMITS[name]['timeout']) is handed to the
+  client call.
+
+Rejections raise UpstreamUnavailable; views answer those with their usual
+error payload and a 503. Only transient upstream faults (see is_transient)
+count against the breaker, so one client sending bad audio can't open it for
+everyone. Limits are per process.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+DEFAULT_LIMITS = {'max_concurrent': 8, 'max_queue': 16, 'timeout': 30.0}
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not attempted: breaker open or bulkhead full."""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class BulkheadFull(UpstreamUnavailable):
+    pass
+
+
+# --- Bulkhead ---
+class _ThreadWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def grant(self):
+        self.event.set()
+        return True
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def grant(self):
+        try:
+            self.loop.call_soon_threadsafe(self._set)
+        except RuntimeError: # Loop closed; give the slot to the next waiter
+            return False
+        return True
+
+    def _set(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Bulkhead:
+    """
+    Counting semaphore with a bounded FIFO queue, usable from threads and
+    coroutines alike. A released slot is handed directly to the next waiter.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self.rejected = 0
+        self.queue_timeouts = 0
+
+    def _enter(self, make_waiter):
+        """None if a slot was taken, else a queued waiter. Raises BulkheadFull."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise BulkheadFull(f"{self.name}: too many calls in flight")
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter):
+        """After a queue timeout: True if the waiter left the queue, False if it was granted meanwhile."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            self.queue_timeouts += 1
+            return True
+
+    def _queue_timed_out(self, waiter):
+        if not self._abandon(waiter):
+            self.release() # Granted just as we gave up; pass the slot on
+        return BulkheadFull(f"{self.name}: timed out waiting for a free slot")
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft().grant():
+                    return # Slot handed over, _active unchanged
+            self._active -= 1
+
+    @contextmanager
+    def slot(self):
+        waiter = self._enter(_ThreadWaiter)
+        if waiter is not None and not waiter.event.wait(self.queue_timeout):
+            raise self._queue_timed_out(waiter)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        waiter = self._enter(_AsyncWaiter)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._queue_timed_out(waiter) from None
+            except asyncio.CancelledError:
+                self._queue_timed_out(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self._active,
+                'queued': len(self._waiters),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'rejected': self.rejected,
+                'queue_timeouts': self.queue_timeouts,
+            }
+
+
+# --- Circuit breaker ---
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, error_rate, min_calls, window, reset_timeout, clock=time.monotonic):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window) # True = failure
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpen unless the call may go ahead."""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True # This call is the trial
+                return
+            self.short_circuited += 1
+            raise CircuitOpen(f"{self.name}: circuit open")
+
+    def cancel_call(self):
+        """The call never reached the upstream (e.g. bulkhead rejected it)."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, failed):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.error_rate):
+                self._open()
+
+    # Callers hold self._lock
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.opened += 1
+
+
+# --- Upstreams ---
+def is_transient(exc):
+    """
+    True for faults that say the upstream is unhealthy: timeouts, connection
+    errors and 5xx (google.api_core's ServerError family, incl.
+    DeadlineExceeded and ServiceUnavailable, carries the HTTP status in
+    `code`). Errors the request caused, e.g. InvalidArgument for a malformed
+    upload, don't.
+    """
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, 'code', None)
+    return isinstance(code, int) and code >= 500
+
+
+class Upstream:
+    def __init__(self, name, bulkhead, breaker, timeout):
+        self.name = name
+        self.bulkhead = bulkhead
+        self.breaker = breaker
+        self.timeout = timeout
+
+    def _record_error(self, exc):
+        if is_transient(exc):
+            self.breaker.record(failed=True)
+        else: # The request's fault; no verdict on the upstream
+            self.breaker.cancel_call()
+
+    @contextmanager
+    def call(self):
+        """`with upstream('tts').call() as deadline:` around one upstream request."""
+        self.breaker.before_call()
+        try:
+            with self.bulkhead.slot():
+                try:
+                    yield self.timeout
+                except Exception as e:
+                    self._record_error(e)
+                    raise
+                except BaseException: # Cancelled / generator closed: no verdict on the upstream
+                    self.breaker.cancel_call()
+                    raise
+                self.breaker.record(failed=False)
+        except UpstreamUnavailable:
+            self.breaker.cancel_call()
+            raise
+
+    @asynccontextmanager
+    async def acall(self):
+        self.breaker.before_call()
+        try:
+            async with self.bulkhead.aslot():
+                try:
+                    yield self.timeout
+                except Exception as e:
+                    self._record_error(e)
+                    raise
+                except BaseException:
+                    self.breaker.cancel_call()
+                    raise
+                self.breaker.record(failed=False)
+        except UpstreamUnavailable:
+            self.breaker.cancel_call()
+            raise
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream(name):
+    try:
+        return _upstreams[name]
+    except KeyError:
+        pass
+    with _upstreams_lock:
+        if name not in _upstreams:
+            limits = {**DEFAULT_LIMITS, **getattr(settings, 'UPSTREAM_LIMITS', {}).get(name, {})}
+            _upstreams[name] = Upstream(
+                name,
+                Bulkhead(name, limits['max_concurrent'], limits['max_queue'],
+                         getattr(settings, 'UPSTREAM_QUEUE_TIMEOUT', 5.0)),
+                CircuitBreaker(
+                    name,
+                    error_rate=getattr(settings, 'CIRCUIT_BREAKER_ERROR_RATE', 0.5),
+                    min_calls=getattr(settings, 'CIRCUIT_BREAKER_MIN_CALLS', 10),
+                    window=getattr(settings, 'CIRCUIT_BREAKER_WINDOW', 20),
+                    reset_timeout=getattr(settings, 'CIRCUIT_BREAKER_RESET_TIMEOUT', 30.0),
+                ),
+                limits['timeout'],
+            )
+        return _upstreams[name]
+
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def resilience_collector():
+    """/metrics samples: breaker state (0 closed, 1 half-open, 2 open), bulkhead usage and rejections."""
+    with _upstreams_lock:
+        upstreams = list(_upstreams.values())
+    for up in upstreams:
+        labels = {'upstream': up.name}
+        bulkhead = up.bulkhead.stats()
+        yield ('superlingo_upstream_breaker_state', 'gauge',
+               'Circuit breaker state: 0 closed, 1 half-open, 2 open.', _STATE_VALUES[up.breaker.state], labels)
+        yield ('superlingo_upstream_breaker_opened_total', 'counter',
+               'Times the circuit breaker opened.', up.breaker.opened, labels)
+        yield ('superlingo_upstream_short_circuited_total', 'counter',
+               'Calls rejected by an open circuit breaker.', up.breaker.short_circuited, labels)
+        yield ('superlingo_upstream_in_flight', 'gauge',
+               'Upstream calls holding a bulkhead slot.', bulkhead['active'], labels)
+        yield ('superlingo_upstream_queue_depth', 'gauge',
+               'Calls waiting for a bulkhead slot.', bulkhead['queued'], labels)
+        yield ('superlingo_upstream_bulkhead_rejected_total', 'counter',
+               'Calls rejected because the bulkhead queue was full.', bulkhead['rejected'], labels)
+        yield ('superlingo_upstream_queue_timeouts_total', 'counter',
+               'Calls that gave up waiting for a bulkhead slot.', bulkhead['queue_timeouts'], labels)
@@ -26,10 +26,23 @@ class LessonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lesson
         # Make sure 'completed' is in the fields list
-        fields = ('id', 'title', 'level', 'topics', 'completed')
+        fields = ('id', 'title', 'level', 'topics', 'updated_at', 'completed')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset (?fields=id,title,...), passed in by LessonViewSet
+        only = self.context.get('fields')
+        if only is not None:
+            for name in set(self.fields) - set(only):
+                self.fields.pop(name)
 
     # This function calculates the 'completed' field
     def get_completed(self, obj):
+        # LessonViewSet loads the user's completed ids once per request;
+        # fall back to a per-lesson query only when used on its own
+        completed_ids = self.context.get('completed_lesson_ids')
+        if completed_ids is not None:
+            return obj.id in completed_ids
         user = self.context.get('request').user
         if user and user.is_authenticated:
             return UserLessonProgress.objects.filter(user=user, lesson=obj).exists()
@@ -0,0 +1,66 @@
+# /superlingo_be/api/signals.py
+import functools
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user
+from .catalog import bump_catalog_version
+from . import leaderboard
+from .models import Lesson, User
+from .tutor_cache import invalidate_lesson
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    # Wait for the commit so a rebuild can't read the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+    # Cached tutor answers may quote the old content; dropped after the commit too, so
+    # a rolled-back save keeps them and a concurrent request can't re-cache the old answer
+    transaction.on_commit(functools.partial(invalidate_lesson, instance.pk, instance.title))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # is_active, password resets etc. must not be served from the auth cache
+    invalidate_user(instance.pk)
+
+
+# --- Leaderboard buckets (api/leaderboard.py) ---
+# XP awarded by record_lesson_completions moves the buckets itself; these cover
+# sign-ups, deletions and XP edited through the ORM (e.g. the admin)
+@receiver(pre_save, sender=User)
+def remember_experience_points(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and 'experience_points' not in update_fields):
+        instance._saved_experience_points = None # Nothing to compare (e.g. last_login updates)
+        return
+    instance._saved_experience_points = (
+        User.objects.filter(pk=instance.pk).values_list('experience_points', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved_leaderboard(sender, instance, created, **kwargs):
+    with connection.cursor() as cursor:
+        if created:
+            leaderboard.adjust_buckets(cursor, {instance.experience_points: 1})
+        else:
+            old_xp = getattr(instance, '_saved_experience_points', None)
+            if old_xp is not None:
+                leaderboard.move_user(cursor, old_xp, instance.experience_points)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted_leaderboard(sender, instance, **kwargs):
+    with connection.cursor() as cursor:
+        leaderboard.adjust_buckets(cursor, {instance.experience_points: -1})
@@ -0,0 +1,140 @@
+# /superlingo_be/api/singleflight.py
+"""
+Request coalescing for upstream calls.
+
+When a class starts the same lesson together, many identical requests (same
+TTS sentence, same tutor question) arrive at once. `do(key, fn)` runs `fn`
+for the first caller of a key; callers that arrive while it is in flight wait
+for that call and share its result or its exception instead of making their
+own upstream call. Nothing is remembered once the call finishes; the caches
+in front of the upstreams are what keep later requests cheap.
+
+SingleFlight is for threads (sync views), AsyncSingleFlight for coroutines on
+one event loop (async views). Only callers in the same process coalesce.
+"""
+import asyncio
+import threading
+import weakref
+
+from django.conf import settings
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A follower gave up waiting for the in-flight call."""
+
+
+_counters = {} # flight name -> counters, shared by the sync and async flight of that name
+_counters_lock = threading.Lock()
+
+
+def _counters_for(name):
+    with _counters_lock:
+        return _counters.setdefault(name, {'calls': 0, 'shared': 0, 'timeouts': 0, 'errors': 0})
+
+
+def _count(counters, field):
+    with _counters_lock:
+        counters[field] += 1
+
+
+def default_timeout():
+    return getattr(settings, 'SINGLE_FLIGHT_TIMEOUT', 30)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = _counters_for(name)
+
+    def do(self, key, fn, timeout=None):
+        """
+        Return fn() for the first caller of `key`, or the in-flight result for
+        the others. Followers wait at most `timeout` seconds (default
+        SINGLE_FLIGHT_TIMEOUT) and then raise SingleFlightTimeout; the leader
+        is never cut short.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            _count(self._counters, 'calls')
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                _count(self._counters, 'errors')
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        _count(self._counters, 'shared')
+        if not call.done.wait(default_timeout() if timeout is None else timeout):
+            _count(self._counters, 'timeouts')
+            raise SingleFlightTimeout(f"Timed out waiting for in-flight {self.name} call")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._tasks = weakref.WeakKeyDictionary() # event loop -> {key: Task}
+        self._counters = _counters_for(name)
+
+    async def do(self, key, coro_fn, timeout=None):
+        """
+        Await coro_fn() once per key. The call runs as its own task, so a
+        caller that disconnects (is cancelled) doesn't cancel it for the rest.
+        """
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            _count(self._counters, 'calls')
+            task = tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda t: self._finish(tasks, key, t))
+            return await asyncio.shield(task)
+
+        _count(self._counters, 'shared')
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), default_timeout() if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            _count(self._counters, 'timeouts')
+            raise SingleFlightTimeout(f"Timed out waiting for in-flight {self.name} call") from None
+
+    def _finish(self, tasks, key, task):
+        if tasks.get(key) is task:
+            del tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            _count(self._counters, 'errors')
+
+
+def singleflight_stats():
+    with _counters_lock:
+        return {name: dict(counters) for name, counters in _counters.items()}
+
+
+def singleflight_collector():
+    """/metrics samples: `shared` is the number of upstream calls saved."""
+    for name, counters in singleflight_stats().items():
+        for field, value in counters.items():
+            yield (f'superlingo_singleflight_{field}_total', 'counter',
+                   f'Single-flight {field} (calls = upstream calls made, shared = calls saved).',
+                   value, {'upstream': name})
@@ -0,0 +1,883 @@
+# /superlingo_be/api/tests.py
+"""
+Run with `DB_ENGINE=sqlite AI_BACKEND=fake python manage.py test api`.
+"""
+import array
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import (
+    async_views, audio_preprocess, authentication, fakes, jobs, leaderboard, resilience, singleflight, tts_cache,
+    tutor_cache, tutor_sessions, views,
+)
+from .audio_response import audio_response
+from .catalog import bump_catalog_version
+from .models import Job, Lesson, User, UserLessonProgress
+
+LESSON_TOPICS = {'title': 'Test', 'activities': [{'type': 'SPEAKING', 'title': 'Say it', 'prompt': 'I like pizza'}]}
+
+
+def make_user(username, experience_points=0):
+    # No password: hashing one per user would dominate the run time
+    return User.objects.create(username=username, email=f'{username}@example.com',
+                               experience_points=experience_points)
+
+
+def token_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return client
+
+
+@override_settings(AI_BACKEND='fake')
+class LessonListQueryTests(TestCase):
+    """GET /api/lessons/ must cost the same few queries however many lessons there are (no N+1)."""
+    LESSONS = 20
+
+    def setUp(self):
+        self.user = make_user('learner')
+        lessons = [Lesson.objects.create(title=f'Lesson {i}', level='A1', topics=LESSON_TOPICS, order=i)
+                   for i in range(self.LESSONS)]
+        UserLessonProgress.objects.bulk_create(
+            [UserLessonProgress(user=self.user, lesson=lesson, completed=True) for lesson in lessons[::2]]
+        )
+        self.total = Lesson.objects.count() # Includes the lessons seeded by the data migrations
+        self.client = token_client(self.user)
+        bump_catalog_version() # Don't reuse a snapshot built by another test
+        self.client.get('/api/lessons/') # Token now in the auth cache, catalog built
+
+    def test_cold_catalog(self):
+        bump_catalog_version()
+        # The lessons (catalog rebuild) + the user's completed ids
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/lessons/')
+        self.assertEqual(response.status_code, 200)
+        lessons = response.json()
+        self.assertEqual(len(lessons), self.total)
+        self.assertEqual(sum(lesson['completed'] for lesson in lessons), self.LESSONS // 2)
+
+    def test_warm_catalog(self):
+        with self.assertNumQueries(1): # Only the user's completed ids
+            response = self.client.get('/api/lessons/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), self.total)
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/lessons/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/lessons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class LessonCompletionTests(TestCase):
+    """Completing a lesson is an idempotent upsert: one progress row, XP awarded once."""
+
+    def setUp(self):
+        self.user = make_user('learner')
+        self.lessons = [Lesson.objects.create(title=f'Lesson {i}', level='A1', topics=LESSON_TOPICS, order=i)
+                        for i in range(3)]
+        self.client = token_client(self.user)
+
+    def complete(self, lesson):
+        return self.client.post('/api/complete-lesson/', {'lesson_id': lesson.pk}, format='json')
+
+    def test_completing_twice_awards_xp_once(self):
+        first, second = self.complete(self.lessons[0]), self.complete(self.lessons[0])
+        self.assertEqual(first.json(), {'status': 'Lesson completed', 'xp_gained': 100, 'total_experience_points': 100})
+        self.assertEqual(second.json()['xp_gained'], 0)
+        self.assertEqual(second.json()['total_experience_points'], 100)
+        self.assertEqual(UserLessonProgress.objects.filter(user=self.user).count(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.experience_points, 100)
+
+    def test_unknown_lesson(self):
+        response = self.client.post('/api/complete-lesson/', {'lesson_id': 999999}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(UserLessonProgress.objects.filter(user=self.user).exists())
+
+    def test_batch_sync(self):
+        self.complete(self.lessons[0])
+        ids = [self.lessons[0].pk, self.lessons[1].pk, self.lessons[1].pk, self.lessons[2].pk, 999999]
+        response = self.client.post('/api/complete-lessons/', {'lesson_ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['completed'], [self.lessons[1].pk, self.lessons[2].pk])
+        self.assertEqual(body['already_completed'], [self.lessons[0].pk])
+        self.assertEqual(body['not_found'], [999999])
+        self.assertEqual(body['xp_gained'], 200)
+        self.assertEqual(body['total_experience_points'], 300)
+        # Replaying the same sync changes nothing
+        again = self.client.post('/api/complete-lessons/', {'lesson_ids': ids}, format='json').json()
+        self.assertEqual(again['xp_gained'], 0)
+        self.assertEqual(again['total_experience_points'], 300)
+        self.assertEqual(UserLessonProgress.objects.filter(user=self.user).count(), 3)
+
+
+class LeaderboardTests(TestCase):
+    """Bucket ranks must match a plain COUNT over the user table, with ties sharing a rank."""
+    XP = [700, 500, 300, 300, 300, 100, 0, 0]
+
+    def setUp(self):
+        self.users = [make_user(f'user{i}', xp) for i, xp in enumerate(self.XP)]
+
+    def expected_rank(self, xp):
+        return 1 + User.objects.filter(experience_points__gt=xp).count()
+
+    def test_top(self):
+        entries, total_users = leaderboard.top(5)
+        self.assertEqual(total_users, len(self.XP))
+        self.assertEqual([e.experience_points for e in entries], [700, 500, 300, 300, 300])
+        self.assertEqual([e.rank for e in entries], [1, 2, 3, 3, 3])
+
+    def test_around(self):
+        me, above, below, total_users = leaderboard.around(self.users[5], neighbors=2) # 100 XP
+        self.assertEqual(total_users, len(self.XP))
+        self.assertEqual(me.rank, self.expected_rank(100))
+        for entry in above + below:
+            self.assertEqual(entry.rank, self.expected_rank(entry.experience_points))
+        self.assertEqual([e.experience_points for e in above], [300, 300])
+        self.assertEqual([e.experience_points for e in below], [0, 0])
+
+    def test_completing_a_lesson_moves_the_rank(self):
+        lesson = Lesson.objects.create(title='Lesson X', level='A1', topics=LESSON_TOPICS)
+        learner = self.users[6] # 0 XP
+        token_client(learner).post('/api/complete-lesson/', {'lesson_id': lesson.pk}, format='json')
+        me, _, _, _ = leaderboard.around(learner)
+        self.assertEqual(me.experience_points, 100)
+        self.assertEqual(me.rank, self.expected_rank(100))
+
+    def test_query_count_does_not_grow_with_distinct_xp(self):
+        for i in range(50):
+            make_user(f'filler{i}', 1000 + 100 * i)
+        # Page of users, the above/total aggregate, the page's buckets
+        with self.assertNumQueries(3):
+            entries, _ = leaderboard.top(10)
+        for entry in entries:
+            self.assertEqual(entry.rank, self.expected_rank(entry.experience_points))
+
+
+def linear16(seconds, amplitude=0, hz=220, sample_rate=16000):
+    samples = array.array('h', (
+        int(amplitude * math.sin(2 * math.pi * hz * n / sample_rate)) for n in range(int(seconds * sample_rate))
+    ))
+    return samples.tobytes()
+
+
+@unittest.skipUnless(audio_preprocess.is_available(), "NumPy is not installed")
+@override_settings(AI_BACKEND='fake', STT_PREPROCESS_ENABLED=True)
+class AudioPreprocessTests(TestCase):
+    def test_silent_clip_is_rejected_without_calling_stt(self):
+        client = token_client(make_user('learner'))
+        audio = base64.b64encode(linear16(1.0)).decode('ascii')
+        with mock.patch.object(fakes.SpeechClient, 'recognize') as recognize:
+            response = client.post('/api/transcribe-audio/',
+                                   {'audio_base64': audio, 'prompt': 'hello', 'platform': 'native'}, format='json')
+        self.assertEqual(response.json(), views.NO_SPEECH_RESULT)
+        recognize.assert_not_called()
+
+    def test_silence_is_trimmed(self):
+        speech = linear16(0.5, amplitude=8000)
+        clip = linear16(1.0) + speech + linear16(1.0)
+        trimmed = audio_preprocess.preprocess_linear16(clip)
+        padding = 2 * audio_preprocess.PADDING_MS * 16000 // 1000 * 2 # Both sides, 2 bytes per sample
+        self.assertLessEqual(len(trimmed), len(speech) + padding)
+        self.assertGreaterEqual(len(trimmed), len(speech))
+
+    def test_stereo_48k_is_downmixed_and_resampled(self):
+        mono = linear16(0.5, amplitude=8000, sample_rate=48000)
+        stereo = array.array('h')
+        stereo.frombytes(mono)
+        interleaved = array.array('h', (sample for value in stereo for sample in (value, value)))
+        out = audio_preprocess.preprocess_linear16(interleaved.tobytes(), sample_rate=48000, channels=2)
+        self.assertAlmostEqual(len(out) / 2 / 16000, 0.5, delta=0.05)
+
+
+class ClientError(Exception):
+    code = 400 # Like google.api_core's InvalidArgument
+
+
+class ResilienceTests(SimpleTestCase):
+    """Breaker and bulkhead behaviour around one upstream (api/resilience.py)."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = resilience.CircuitBreaker('test', error_rate=0.5, min_calls=4, window=10,
+                                                 reset_timeout=30.0, clock=lambda: self.now)
+        self.upstream = resilience.Upstream(
+            'test', resilience.Bulkhead('test', max_concurrent=1, max_queue=1, queue_timeout=0.05), self.breaker, 5.0,
+        )
+
+    def call(self, error=None):
+        try:
+            with self.upstream.call():
+                if error is not None:
+                    raise error
+        except (TimeoutError, ConnectionError, ClientError, fakes.FakeUpstreamError):
+            pass
+
+    def test_opens_at_the_error_rate(self):
+        self.call()
+        self.call(TimeoutError())
+        self.call()
+        self.assertEqual(self.breaker.state, resilience.CLOSED) # Under min_calls
+        self.call(fakes.FakeUpstreamError())
+        self.assertEqual(self.breaker.state, resilience.OPEN) # 2 of 4 failed
+        with self.assertRaises(resilience.CircuitOpen):
+            self.call()
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.call(ConnectionError())
+        self.now += 30
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        with self.upstream.call():
+            with self.assertRaises(resilience.CircuitOpen): # Only one trial call at a time
+                self.breaker.before_call()
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(4):
+            self.call(ConnectionError())
+        self.now += 30
+        self.call(TimeoutError())
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        self.assertEqual(self.breaker.opened, 2)
+
+    def test_client_errors_do_not_open_the_circuit(self):
+        for _ in range(10):
+            self.call(ClientError())
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+        self.call() # The next caller still gets through
+
+    def test_client_error_frees_the_probe(self):
+        for _ in range(4):
+            self.call(ConnectionError())
+        self.now += 30
+        self.call(ClientError())
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        self.call()
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+
+    def test_bulkhead_queue_timeout(self):
+        bulkhead = self.upstream.bulkhead
+        with bulkhead.slot():
+            with self.assertRaises(resilience.BulkheadFull):
+                with bulkhead.slot():
+                    pass
+        self.assertEqual(bulkhead.stats()['queue_timeouts'], 1)
+        self.assertEqual(bulkhead.stats()['active'], 0)
+        self.call() # The timed-out call left no verdict on the breaker
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+
+    def test_bulkhead_rejects_when_the_queue_is_full(self):
+        bulkhead = resilience.Bulkhead('test', max_concurrent=1, max_queue=1, queue_timeout=5.0)
+        with bulkhead.slot():
+            waiter = threading.Thread(target=self._take_slot, args=(bulkhead,))
+            waiter.start()
+            while bulkhead.stats()['queued'] == 0:
+                time.sleep(0.001)
+            with self.assertRaises(resilience.BulkheadFull):
+                with bulkhead.slot():
+                    pass
+            self.assertEqual(bulkhead.stats()['rejected'], 1)
+        waiter.join() # Granted the released slot
+        self.assertEqual(bulkhead.stats()['active'], 0)
+
+    @staticmethod
+    def _take_slot(bulkhead):
+        with bulkhead.slot():
+            pass
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent callers of one key make one call and share its result or exception."""
+    CALLERS = 8
+
+    def run_threads(self, flight, fn):
+        results = []
+
+        def caller():
+            try:
+                results.append(flight.do('key', fn))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(self.CALLERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def leader_fn(self, flight, outcome):
+        """fn that returns/raises `outcome` once every other caller is waiting on it."""
+        calls = []
+
+        def fn():
+            calls.append(1)
+            while flight._counters['shared'] < self.CALLERS - 1:
+                time.sleep(0.001)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return fn, calls
+
+    def test_threads_share_one_call(self):
+        flight = singleflight.SingleFlight(f'test-{self._testMethodName}')
+        fn, calls = self.leader_fn(flight, 'audio')
+        self.assertEqual(self.run_threads(flight, fn), ['audio'] * self.CALLERS)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight._calls, {})
+
+    def test_threads_share_the_exception(self):
+        flight = singleflight.SingleFlight(f'test-{self._testMethodName}')
+        error = ValueError('upstream failed')
+        fn, calls = self.leader_fn(flight, error)
+        self.assertEqual(self.run_threads(flight, fn), [error] * self.CALLERS)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.do('key', lambda: 'retried'), 'retried') # Key released
+
+    def run_coroutines(self, flight, outcome):
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            while flight._counters['shared'] < self.CALLERS - 1:
+                await asyncio.sleep(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        async def main():
+            results = await asyncio.gather(*(flight.do('key', fn) for _ in range(self.CALLERS)),
+                                           return_exceptions=True)
+            retried = await flight.do('key', lambda: asyncio.sleep(0, 'retried'))
+            return results, retried
+
+        results, retried = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(retried, 'retried') # Key released
+        return results
+
+    def test_coroutines_share_one_call(self):
+        flight = singleflight.AsyncSingleFlight(f'test-{self._testMethodName}')
+        self.assertEqual(self.run_coroutines(flight, 'audio'), ['audio'] * self.CALLERS)
+
+    def test_coroutines_share_the_exception(self):
+        flight = singleflight.AsyncSingleFlight(f'test-{self._testMethodName}')
+        error = ValueError('upstream failed')
+        self.assertEqual(self.run_coroutines(flight, error), [error] * self.CALLERS)
+        self.assertEqual(singleflight.singleflight_stats()[flight.name]['errors'], 1)
+
+
+@override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=5)
+class JobQueueTests(TestCase):
+    """Claiming, retries and stale requeues of the api_job queue (api/jobs.py)."""
+
+    def setUp(self):
+        self.user = make_user('learner')
+        self.job = jobs.submit(self.user, 'tts', {'text': 'Hello'})
+
+    def make_due(self):
+        Job.objects.filter(pk=self.job.pk).update(run_after=timezone.now())
+
+    def test_a_claimed_job_is_not_handed_out_twice(self):
+        claimed = jobs.claim('worker-1', limit=5)
+        self.assertEqual([job.pk for job in claimed], [self.job.pk])
+        self.assertEqual((claimed[0].status, claimed[0].locked_by, claimed[0].attempts), (jobs.RUNNING, 'worker-1', 1))
+        self.assertEqual(jobs.claim('worker-2', limit=5), [])
+
+    def test_failing_job_is_retried_with_backoff_then_failed(self):
+        failing = mock.Mock(side_effect=fakes.FakeUpstreamError('fake tts: injected failure'))
+        delays = []
+        with mock.patch.dict(jobs.HANDLERS, {'tts': failing}):
+            for attempt in (1, 2):
+                job, = jobs.claim('worker-1')
+                started = timezone.now()
+                self.assertEqual(jobs.run(job), jobs.QUEUED)
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+                delays.append(round((job.run_after - started).total_seconds()))
+                self.assertEqual(jobs.claim('worker-1'), []) # Not due yet
+                self.make_due()
+            job, = jobs.claim('worker-1')
+            self.assertEqual(jobs.run(job), jobs.FAILED)
+        self.assertEqual(delays, [5, 10])
+        self.assertEqual(failing.call_count, 3)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (jobs.FAILED, 3, 'fake tts: injected failure'))
+        self.assertEqual(jobs.claim('worker-1'), [])
+
+    def test_job_error_fails_without_retrying(self):
+        Job.objects.filter(pk=self.job.pk).update(payload={}) # No text: Cloud TTS would never accept it
+        job, = jobs.claim('worker-1')
+        self.assertEqual(jobs.run(job), jobs.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.error), (1, 'No text provided for audio'))
+
+    def test_stale_running_jobs_are_requeued(self):
+        job, = jobs.claim('worker-1')
+        self.assertEqual(jobs.requeue_stale(older_than=300), 0) # Still fresh
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(seconds=600))
+        self.assertEqual(jobs.requeue_stale(older_than=300), 1)
+        retried, = jobs.claim('worker-2')
+        self.assertEqual((retried.pk, retried.attempts), (job.pk, 2))
+        # The first worker comes back: its outcome must not overwrite the new run
+        with mock.patch.dict(jobs.HANDLERS, {'tts': lambda job: {'audioUrl': 'stale'}}):
+            jobs.run(job)
+        retried.refresh_from_db()
+        self.assertEqual((retried.status, retried.locked_by), (jobs.RUNNING, 'worker-2'))
+
+    def test_stale_job_out_of_attempts_is_failed(self):
+        Job.objects.filter(pk=self.job.pk).update(
+            status=jobs.RUNNING, attempts=3, started_at=timezone.now() - timedelta(seconds=600),
+        )
+        jobs.requeue_stale(older_than=300)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, jobs.FAILED)
+
+    def test_job_detail_only_shows_own_jobs(self):
+        url = f'/api/jobs/{self.job.pk}/'
+        response = token_client(self.user).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], jobs.QUEUED)
+        response = token_client(make_user('someone-else')).get(url)
+        self.assertEqual(response.status_code, 404)
+
+
+class TokenAuthCacheTests(TestCase):
+    """Cached tokens stop working as soon as they are deleted or their user is deactivated, not after the TTL."""
+    URL = '/api/leaderboard/me/'
+
+    def setUp(self):
+        authentication.get_token_cache().clear()
+        self.user = make_user('learner')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get(self.URL).status_code, 200) # Now cached
+
+    def test_served_from_the_cache(self):
+        hits = authentication.get_token_cache().stats()['hits']
+        self.assertEqual(self.client.get(self.URL).status_code, 200)
+        self.assertEqual(authentication.get_token_cache().stats()['hits'], hits + 1)
+
+    def test_deleted_token(self):
+        self.token.delete()
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+    @override_settings(TOKEN_AUTH_CACHE_ALIAS='default')
+    def test_deactivated_user_in_the_shared_cache(self):
+        caches['default'].clear()
+        authentication.get_token_cache().clear()
+        self.client.get(self.URL) # Now in both caches
+        self.assertIsNotNone(caches['default'].get('auth-token:' + self.token.key))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+    def test_xp_is_read_from_the_database(self):
+        # The raw-SQL XP update doesn't invalidate the cached user; views must not trust its XP
+        lesson = Lesson.objects.create(title='Lesson X', level='A1', topics=LESSON_TOPICS)
+        self.client.post('/api/complete-lesson/', {'lesson_id': lesson.pk}, format='json')
+        self.assertEqual(self.client.get(self.URL).json()['experience_points'], 100)
+
+
+@override_settings(TUTOR_ANSWER_CACHE_ENABLED=True)
+class LessonChangeInvalidationTests(TestCase):
+    """Cached tutor answers for a lesson are dropped when a change commits, not before."""
+
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title='Lesson X', level='A1', topics=LESSON_TOPICS)
+        self.cache = tutor_cache.get_tutor_answer_cache()
+        self.cache.set('answer', 'Nice try!', tags=tutor_cache.lesson_tags(self.lesson.pk))
+
+    def test_rolled_back_save_keeps_answers(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.lesson.save()
+                self.assertEqual(self.cache.get('answer'), 'Nice try!') # Not before the commit
+                raise RuntimeError
+        self.assertEqual(self.cache.get('answer'), 'Nice try!')
+
+    def test_committed_save_drops_answers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.save()
+            self.assertEqual(self.cache.get('answer'), 'Nice try!')
+        self.assertIsNone(self.cache.get('answer'))
+
+
+class TTSAudioCacheTests(SimpleTestCase):
+    """Byte-bounded LRU tiers and the persistent store of api/tts_cache.py."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.disk_dir = os.path.join(tmp.name, 'cache')
+        self.store_dir = os.path.join(tmp.name, 'store')
+
+    def test_memory_is_bounded_by_bytes(self):
+        cache = tts_cache.TTSAudioCache(memory_max_bytes=10)
+        cache.set('a', b'aaaa')
+        cache.set('b', b'bbbb')
+        cache.get('a') # Now b is the least recently used
+        cache.set('c', b'cccc')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (b'aaaa', b'cccc'))
+        cache.set('big', b'x' * 11) # Larger than the whole tier: not kept
+        stats = cache.stats()
+        self.assertEqual((stats['memory_entries'], stats['memory_bytes'], stats['memory_evictions']), (2, 8, 1))
+
+    def test_disk_evicts_least_recently_used(self):
+        cache = tts_cache.TTSAudioCache(self.disk_dir, memory_max_bytes=0, disk_max_bytes=10)
+        cache.set('a', b'aaaa')
+        cache.set('b', b'bbbb')
+        self.assertEqual(cache.get('a'), b'aaaa') # From disk; b is now the oldest
+        cache.set('c', b'cccc')
+        self.assertFalse(os.path.exists(cache._path('b')))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (b'aaaa', b'cccc'))
+        stats = cache.stats()
+        self.assertEqual((stats['disk_entries'], stats['disk_bytes'], stats['disk_evictions']), (2, 8, 1))
+
+    def test_restart_rebuilds_the_disk_lru(self):
+        cache = tts_cache.TTSAudioCache(self.disk_dir, memory_max_bytes=0)
+        for key in ('old', 'newest', 'middle'):
+            cache.set(key, b'1234')
+        for age, key in enumerate(['newest', 'middle', 'old']):
+            os.utime(cache._path(key), (1_000_000 - age, 1_000_000 - age))
+        restarted = tts_cache.TTSAudioCache(self.disk_dir, memory_max_bytes=0, disk_max_bytes=10)
+        self.assertEqual(list(restarted._disk), ['old', 'middle', 'newest'])
+        self.assertEqual(restarted.stats()['disk_bytes'], 12)
+        self.assertEqual(restarted.get('old'), b'1234') # From disk, and now the most recent
+        restarted.set('new', b'1234') # Over the limit: middle, then newest go
+        self.assertEqual(list(restarted._disk), ['old', 'new'])
+
+    def test_pinned_clips_live_in_the_store(self):
+        cache = tts_cache.TTSAudioCache(self.disk_dir, store_directory=self.store_dir, disk_max_bytes=4)
+        cache.set('lesson', b'audio', pin=True)
+        cache.set('lesson', b'audio', pin=True) # Re-pinning doesn't count twice
+        self.assertTrue(cache.is_pinned('lesson'))
+        self.assertFalse(os.path.exists(cache._path('lesson'))) # Not in the evictable tier
+        self.assertEqual(cache.stats()['store_entries'], 1)
+        cache.set('chat', b'1234')
+        cache.set('other', b'1234') # Evicts chat from disk, never the pinned clip
+        cache.clear_memory()
+        self.assertEqual(cache.get('lesson'), b'audio')
+        self.assertEqual(cache.stats()['store_hits'], 1)
+
+        restarted = tts_cache.TTSAudioCache(self.disk_dir, store_directory=self.store_dir)
+        self.assertEqual(restarted.stats()['store_entries'], 1)
+        self.assertEqual(restarted.pinned_keys(), {'lesson'})
+        restarted.unpin('lesson')
+        restarted.unpin('lesson')
+        self.assertEqual(restarted.stats()['store_entries'], 0)
+        self.assertIsNone(restarted.get('lesson'))
+
+
+class AudioResponseTests(SimpleTestCase):
+    """Conditional and Range requests for raw audio (api/audio_response.py)."""
+    AUDIO = bytes(range(100))
+    KEY = 'abc123'
+
+    def get(self, **headers):
+        request = RequestFactory().get('/api/tts-audio/', **headers)
+        return audio_response(request, self.AUDIO, 'audio/mpeg', self.KEY)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_body(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.AUDIO)
+        self.assertEqual((response['Content-Length'], response['ETag'], response['Accept-Ranges']),
+                         ('100', '"abc123"', 'bytes'))
+
+    def test_open_ended_range(self):
+        response = self.get(HTTP_RANGE='bytes=0-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 0-99/100')
+        self.assertEqual(self.body(response), self.AUDIO)
+
+    def test_bounded_range(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 10-19/100'))
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), self.AUDIO[10:20])
+
+    def test_suffix_range(self):
+        response = self.get(HTTP_RANGE='bytes=-10')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 90-99/100'))
+        self.assertEqual(self.body(response), self.AUDIO[-10:])
+        response = self.get(HTTP_RANGE='bytes=-500') # Longer than the clip: all of it
+        self.assertEqual(response['Content-Range'], 'bytes 0-99/100')
+
+    def test_end_past_the_clip_is_clamped(self):
+        response = self.get(HTTP_RANGE='bytes=90-500')
+        self.assertEqual(response['Content-Range'], 'bytes 90-99/100')
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=100-', 'bytes=50-10', 'bytes=-0'):
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_ignored_ranges(self):
+        for header in ('bytes=0-1,5-6', 'items=0-1', 'bytes=-'):
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.body(response), self.AUDIO)
+
+    def test_if_range(self):
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"abc123"')
+        self.assertEqual(response.status_code, 206)
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old-clip"') # Changed since: whole clip
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.AUDIO)
+
+    def test_if_none_match(self):
+        for header in ('"abc123"', 'W/"abc123"', '"other", W/"abc123"', '*'):
+            with self.subTest(header=header):
+                response = self.get(HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], '"abc123"')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='W/"other"').status_code, 200)
+
+    def test_not_streamed_for_async_views(self):
+        request = RequestFactory().get('/api/tts-audio/', HTTP_RANGE='bytes=10-19')
+        response = audio_response(request, self.AUDIO, 'audio/mpeg', self.KEY, stream=False)
+        self.assertFalse(response.streaming)
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 10-19/100'))
+        self.assertEqual(response.content, self.AUDIO[10:20])
+
+
+@override_settings(AI_BACKEND='fake')
+class AsyncTTSViewTests(TestCase):
+    async def test_raw_audio_is_not_a_sync_stream(self):
+        user = await sync_to_async(make_user)('learner')
+        token = await sync_to_async(Token.objects.create)(user=user)
+        request = AsyncRequestFactory().post(
+            '/api/generate-gemini-audio/', {'text': 'Hello', 'audio_format': 'mp3'},
+            content_type='application/json', headers={'Authorization': f'Token {token.key}'},
+        )
+        response = await async_views.generate_cloud_tts_audio(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+
+class LessonImportExportTests(TestCase):
+    """manage.py export_lessons / import_lessons (JSON Lines, upsert on key)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'lessons.jsonl')
+        self.lesson = Lesson.objects.create(title='Daily Routine', level='A1', topics=LESSON_TOPICS, order=1)
+
+    def lesson_record(self, key, title='Imported', **fields):
+        return {'key': key, 'title': title, 'level': 'A1', 'order': 5, 'topics': LESSON_TOPICS, **fields}
+
+    def write(self, *records):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write((record if isinstance(record, str) else json.dumps(record, ensure_ascii=False)) + '\n')
+
+    def run_command(self, name, *args, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command(name, *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def catalog(self):
+        return list(Lesson.objects.order_by('key').values('key', 'title', 'level', 'order', 'topics'))
+
+    def test_round_trip(self):
+        before = self.catalog()
+        self.run_command('export_lessons', output=self.path)
+        Lesson.objects.filter(pk=self.lesson.pk).update(title='Edited', order=9)
+        Lesson.objects.exclude(pk=self.lesson.pk).first().delete()
+        out, _ = self.run_command('import_lessons', self.path)
+        self.assertEqual(self.catalog(), before)
+        self.assertIn(f"Created 1, updated 1, left {len(before) - 2} unchanged; 0 invalid line(s).", out)
+
+    def test_unchanged_rows_keep_updated_at(self):
+        updated_at = Lesson.objects.get(pk=self.lesson.pk).updated_at
+        self.run_command('export_lessons', output=self.path)
+        self.run_command('import_lessons', self.path)
+        self.assertEqual(Lesson.objects.get(pk=self.lesson.pk).updated_at, updated_at)
+
+    def test_last_duplicate_key_wins(self):
+        self.write(self.lesson_record('dup', title='First'), self.lesson_record('dup', title='Second'))
+        _, err = self.run_command('import_lessons', self.path)
+        self.assertEqual(Lesson.objects.get(key='dup').title, 'Second')
+        self.assertIn("line 2: key 'dup' repeats line 1", err)
+
+    def test_atomic_rolls_back_on_an_invalid_line(self):
+        count = Lesson.objects.count()
+        self.write(self.lesson_record('good'), self.lesson_record('bad', topics={'activities': []}))
+        with self.assertRaises(CommandError):
+            self.run_command('import_lessons', self.path, atomic=True)
+        self.assertEqual(Lesson.objects.count(), count)
+        self.assertFalse(Lesson.objects.filter(key='good').exists())
+
+    def test_invalid_keys_are_rejected(self):
+        self.write(self.lesson_record('has space!'), self.lesson_record('수업-1'), self.lesson_record(''))
+        with self.assertRaises(CommandError):
+            self.run_command('import_lessons', self.path)
+        self.assertFalse(Lesson.objects.filter(key='has space!').exists())
+        self.assertTrue(Lesson.objects.filter(key='수업-1').exists()) # Unicode slugs are fine
+        self.assertTrue(Lesson.objects.filter(key='imported').exists()) # Empty key: from the title
+
+
+class Turn:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+
+@override_settings(AI_BACKEND='fake', FAKE_AI={}, TUTOR_HISTORY_TOKEN_BUDGET=100, TUTOR_SUMMARY_BATCH=2)
+class TutorSessionHistoryTests(TestCase):
+    """The history window budget, and folding older turns into the summary (api/tutor_sessions.py)."""
+
+    def setUp(self):
+        self.user = make_user('learner')
+        self.session = tutor_sessions.resume_or_start(self.user, {'type': 'SPEAKING', 'prompt': 'I like pizza'})
+
+    def add_turns(self, count, size=40):
+        # 'x' * 4 * n is n estimated tokens; each turn is `size` tokens
+        for i in range(count):
+            tutor_sessions.record_turn(self.session, f"{i} " + 'x' * (2 * size - 8), 'y' * (2 * size))
+
+    def sent_turns(self):
+        contents = tutor_sessions.next_contents(self.session, 'New message')
+        return [message['parts'][0].split(' ', 1)[0] for message in contents[:-1:2]]
+
+    def test_window_fits_the_budget(self):
+        overflow, window = tutor_sessions.split_window([Turn(30), Turn(50), Turn(40), Turn(60)])
+        self.assertEqual(([t.tokens for t in overflow], [t.tokens for t in window]), ([30, 50], [40, 60]))
+        overflow, window = tutor_sessions.split_window([Turn(30), Turn(50), Turn(60)])
+        self.assertEqual(([t.tokens for t in overflow], [t.tokens for t in window]), ([30, 50], [60]))
+        with mock.patch.object(tutor_sessions, 'MAX_WINDOW_TURNS', 3):
+            overflow, window = tutor_sessions.split_window([Turn(1)] * 5)
+        self.assertEqual((len(overflow), len(window)), (2, 3))
+
+    def test_unfolded_turns_are_still_sent(self):
+        self.add_turns(3) # Only two fit the budget
+        self.assertEqual(self.sent_turns(), ['0', '1', '2'])
+        self.assertIsNone(tutor_sessions.schedule_fold(self.session)) # One over the budget, batch is two
+
+    def test_fold_is_scheduled_once(self):
+        self.add_turns(4)
+        job = tutor_sessions.schedule_fold(self.session)
+        self.assertEqual((job.kind, job.payload), ('summary', {'session_id': self.session.pk}))
+        self.assertIsNone(tutor_sessions.schedule_fold(self.session)) # Already pending
+        self.assertEqual(self.sent_turns(), ['0', '1', '2', '3']) # Nothing dropped while it waits
+
+    def test_fold_summarizes_the_oldest_turns(self):
+        self.add_turns(4)
+        self.assertIsNotNone(tutor_sessions.schedule_fold(self.session))
+        job, = jobs.claim('worker-1')
+        self.assertEqual(jobs.run(job), jobs.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'session_id': self.session.pk, 'folded': 2})
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.summary)
+        self.assertEqual(self.sent_turns(), ['2', '3'])
+        contents = tutor_sessions.next_contents(self.session, 'New message')
+        self.assertIn(f"Earlier in this conversation: {self.session.summary}", contents[-1]['parts'][0])
+
+    @mock.patch.object(tutor_sessions, 'MAX_WINDOW_ROWS', 4)
+    @mock.patch.object(tutor_sessions, 'MAX_WINDOW_TURNS', 2)
+    def test_large_backlog_is_folded_inline(self):
+        self.add_turns(5) # No worker ran: more unfolded turns than a request reads
+        self.assertEqual(self.sent_turns(), ['3', '4']) # Everything outside the window was folded
+        self.assertTrue(self.session.summary)
+        self.assertEqual(self.session.turns.count(), 2)
+
+
+@override_settings(AI_BACKEND='fake', FAKE_AI={}, STT_PREPROCESS_ENABLED=False,
+                   DATA_UPLOAD_MAX_MEMORY_SIZE=10_000, TRANSCRIBE_MAX_UPLOAD_BYTES=100_000)
+class UploadLimitTests(TestCase):
+    """Recordings may exceed DATA_UPLOAD_MAX_MEMORY_SIZE; nothing else may."""
+
+    def setUp(self):
+        self.client = token_client(make_user('learner'))
+        self.audio = base64.b64encode(b'\0' * 30_000).decode('ascii') # 40 KB of base64
+
+    def transcribe(self, audio):
+        return self.client.post('/api/transcribe-audio/', {'audio_base64': audio, 'prompt': 'hello', 'platform': 'web'},
+                                format='json')
+
+    def test_base64_recording_over_the_global_limit(self):
+        self.assertEqual(self.transcribe(self.audio).status_code, 200)
+        response = self.client.post('/api/jobs/', {'kind': 'stt', 'audio_base64': self.audio, 'prompt': 'hello'},
+                                    format='json')
+        self.assertEqual(response.status_code, 202)
+
+    def test_multipart_recording_over_the_global_limit(self):
+        upload = SimpleUploadedFile('clip.webm', b'\0' * 30_000, content_type='audio/webm')
+        response = self.client.post('/api/transcribe-audio/', {'audio': upload, 'prompt': 'hello', 'platform': 'web'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_recording_over_the_transcribe_limit(self):
+        response = self.transcribe(self.audio * 3)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('Audio upload too large', response.json()['error'])
+
+    def test_other_endpoints_keep_the_global_limit(self):
+        response = self.client.post('/api/chat/', {'message': 'x' * 20_000, 'context': {}}, format='json')
+        self.assertEqual(response.status_code, 400) # Django's RequestDataTooBig
+
+
+@override_settings(FAKE_AI={})
+class BenchmarkCommandTests(TransactionTestCase):
+    """The in-process benchmark must leave no trace in the real caches or on the leaderboard."""
+
+    def test_leaves_no_trace(self):
+        Lesson.objects.create(title='Lesson X', level='A1', topics=LESSON_TOPICS)
+        real_cache = tts_cache.TTSAudioCache()
+        with mock.patch.object(tts_cache, '_cache', real_cache):
+            self.run_benchmark()
+            self.assertIs(tts_cache._cache, real_cache)
+        self.assertEqual(real_cache.stats()['memory_entries'], 0)
+        self.assertFalse(User.objects.filter(username='benchmark').exists())
+        entries, total_users = leaderboard.top(10)
+        self.assertEqual((entries, total_users), ([], 0))
+
+    def run_benchmark(self):
+        out = io.StringIO()
+        call_command('benchmark', endpoints=['tts', 'complete'], requests=2, warmup=0, concurrency=1,
+                     json=True, stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual([(r['endpoint'], r['errors']) for r in results], [('tts', 0), ('complete', 0)])
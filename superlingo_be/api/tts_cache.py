@@ -0,0 +1,296 @@
+# /superlingo_be/api/tts_cache.py
+"""
+Content-addressed cache for synthesized TTS audio.
+
+Almost everything we send to Cloud TTS is the same handful of lesson
+sentences with the same voice, so the audio is cached under a hash of
+(text, voice, encoding). Lookups go through three tiers:
+
+1. an in-process LRU bounded by total bytes,
+2. a persistent audio store for pre-rendered lesson audio (written by
+   `manage.py prerender_tts`, never evicted), and
+3. an on-disk cache (shared by every worker on the box) bounded by total
+   bytes, evicting the least recently used files first.
+
+Counters for hits, misses and evictions are kept so the limits can be sized
+from real traffic (see `TTSAudioCache.stats`).
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+AUDIO_FILE_SUFFIX = '.audio'
+
+
+def tts_cache_key(text, voice, encoding):
+    """Stable key for one synthesized clip. Any change to the inputs changes the key."""
+    digest = hashlib.sha256()
+    for part in (text, voice, encoding):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0') # Separator so ("ab", "c") != ("a", "bc")
+    return digest.hexdigest()
+
+
+class TTSAudioCache:
+    def __init__(self, directory=None, memory_max_bytes=32 * 1024 * 1024, disk_max_bytes=512 * 1024 * 1024,
+                 store_directory=None):
+        self.directory = str(directory) if directory else None
+        self.store_directory = str(store_directory) if store_directory else None
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict() # key -> bytes, least recently used first
+        self._memory_bytes = 0
+        self._disk = OrderedDict() # key -> size on disk, least recently used first
+        self._disk_bytes = 0
+        self._store_entries = 0
+        self._counters = {
+            'memory_hits': 0,
+            'store_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._scan_disk()
+        if self.store_directory:
+            os.makedirs(self.store_directory, exist_ok=True)
+            # Counted once here, then kept up to date by set(pin=True) and unpin; clips another
+            # process (e.g. prerender_tts) adds show up in stats() after a restart
+            self._store_entries = sum(1 for _ in _iter_keys(self.store_directory))
+
+    # --- Public API ---
+    def get(self, key):
+        """Return the cached audio for `key`, or None on a miss."""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return audio
+
+        audio = self._read_store(key)
+        if audio is not None:
+            with self._lock:
+                self._counters['store_hits'] += 1
+                self._remember(key, audio)
+            return audio
+
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._remember(key, audio)
+        return audio
+
+    def set(self, key, audio, pin=False):
+        """
+        Store `audio` under `key`. With `pin=True` it goes to the persistent
+        store instead of the evictable disk cache.
+        """
+        audio = bytes(audio)
+        if pin and self.store_directory:
+            path = self._store_path(key)
+            new = not os.path.exists(path)
+            if _atomic_write(path, audio) and new:
+                with self._lock:
+                    self._store_entries += 1
+        else:
+            self._write_disk(key, audio)
+        with self._lock:
+            self._remember(key, audio)
+
+    def is_pinned(self, key):
+        return bool(self.store_directory) and os.path.exists(self._store_path(key))
+
+    def pinned_keys(self):
+        if not self.store_directory:
+            return set()
+        return set(_iter_keys(self.store_directory))
+
+    def unpin(self, key):
+        """Drop a clip from the persistent store (e.g. its text left the catalog)."""
+        try:
+            os.remove(self._store_path(key))
+            removed = True
+        except OSError:
+            removed = False
+        with self._lock:
+            if removed:
+                self._store_entries -= 1
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(self._counters[name] for name in ('memory_hits', 'store_hits', 'disk_hits', 'misses'))
+            hits = lookups - self._counters['misses']
+            return {
+                **self._counters,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_max_bytes': self.memory_max_bytes,
+                'store_entries': self._store_entries,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'disk_max_bytes': self.disk_max_bytes if self.directory else 0,
+            }
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    # --- Memory tier (callers hold self._lock) ---
+    def _remember(self, key, audio):
+        if len(audio) > self.memory_max_bytes:
+            return # Would evict everything else, not worth it
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._counters['memory_evictions'] += 1
+
+    # --- Persistent store ---
+    def _store_path(self, key):
+        return _key_path(self.store_directory, key)
+
+    def _read_store(self, key):
+        if not self.store_directory:
+            return None
+        try:
+            with open(self._store_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # --- Disk tier ---
+    def _path(self, key):
+        return _key_path(self.directory, key)
+
+    def _scan_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(AUDIO_FILE_SUFFIX):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-len(AUDIO_FILE_SUFFIX)], st.st_size))
+        entries.sort() # Oldest first, so the OrderedDict starts in LRU order
+        for _, key, size in entries:
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                audio = f.read()
+            os.utime(path) # Bump mtime so a restart rebuilds the same LRU order
+        except OSError:
+            # Missing, or evicted by another worker sharing the directory
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+        with self._lock:
+            if key not in self._disk:
+                self._disk_bytes += len(audio)
+            self._disk[key] = len(audio)
+            self._disk.move_to_end(key)
+        return audio
+
+    def _write_disk(self, key, audio):
+        if not self.directory or len(audio) > self.disk_max_bytes:
+            return
+        if not _atomic_write(self._path(key), audio):
+            return
+
+        with self._lock:
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_bytes -= old
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            victims = []
+            while self._disk_bytes > self.disk_max_bytes and self._disk:
+                victim, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._counters['disk_evictions'] += 1
+                victims.append(victim)
+
+        for victim in victims:
+            try:
+                os.remove(self._path(victim))
+            except OSError:
+                pass
+
+
+def _key_path(directory, key):
+    # Two-character fan-out keeps directories small
+    return os.path.join(directory, key[:2], key + AUDIO_FILE_SUFFIX)
+
+
+def _iter_keys(directory):
+    for _, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(AUDIO_FILE_SUFFIX):
+                yield name[:-len(AUDIO_FILE_SUFFIX)]
+
+
+def _atomic_write(path, data):
+    """Write to a temp file and rename so readers never see a partial clip."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Process-wide cache built from the TTS_CACHE_* settings."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSAudioCache(
+                    directory=getattr(settings, 'TTS_CACHE_DIR', None),
+                    memory_max_bytes=getattr(settings, 'TTS_CACHE_MEMORY_MAX_BYTES', 32 * 1024 * 1024),
+                    disk_max_bytes=getattr(settings, 'TTS_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024),
+                    store_directory=getattr(settings, 'TTS_AUDIO_STORE_DIR', None),
+                )
+    return _cache
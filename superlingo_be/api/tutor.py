@@ -0,0 +1,83 @@
+# /superlingo_be/api/tutor.py
+"""
+Prompt templates and model instances for the AI tutor.
+
+Each activity type has a fixed system instruction, compiled once at import.
+Everything that varies per request (the words or sentence of the activity,
+the student's message) goes into the request contents instead, so there are
+only a handful of distinct system instructions and the GenerativeModel for
+each one is built once and reused from a small LRU.
+"""
+import functools
+from collections import namedtuple
+
+from . import clients
+
+TUTOR_MODEL_NAME = 'gemini-2.5-flash'
+TUTOR_TEMPERATURE = 0.7
+
+BASE_PROMPT = "You are Betterlingo, a friendly English tutor AI..." # Keep your full prompt
+
+# system: fixed instruction for the activity type
+# describe: activity context dict -> line sent with the student's message (or None)
+TutorPrompt = namedtuple('TutorPrompt', ['system', 'describe'])
+
+
+def _matching_words(context):
+    words = [p[0] for p in context.get('pairs', []) if isinstance(p, list) and len(p) > 0]
+    return f"Student is matching vocabulary: {', '.join(words)}."
+
+
+PROMPT_TEMPLATES = {
+    'MATCHING': TutorPrompt(
+        system="The student is doing a vocabulary matching activity. ANSWER IN KOREAN. First, find out what exactly the user needs help with for THIS ACTIVITY. Serveral words are given in random order, user is trying to match the korean-english word pairs",
+        describe=_matching_words,
+    ),
+    'ORDERING': TutorPrompt(
+        system="The student is putting the words of a sentence in order. ANSWER IN KOREAN. First, find out what exactly the user needs help with for this activity. explain grammer why each words in sentences comes there and what's their purpose, with examples.",
+        describe=lambda context: f"Student practiced sentence: '{context.get('prompt', '')}'.",
+    ),
+    'LISTENING': TutorPrompt(
+        system="The student is doing a listening activity. ANSWER IN KOREAN. First, find out what exactly the user needs help with for this activity. Teach them the actual pronunciation vs spelling.",
+        describe=lambda context: f"Student identified word '{context.get('correct_answer', '')}'.",
+    ),
+    'SPEAKING': TutorPrompt(
+        system="The student is practicing speaking a sentence aloud. ANSWER IN KOREAN. First, find out what exactly the user needs help with for this activity. Focus on pronunciation, intonation, or specific tricky words in that sentence. Offer to break it down for them.",
+        describe=lambda context: f"Student practiced speaking the sentence: '{context.get('prompt', '')}'.",
+    ),
+}
+DEFAULT_PROMPT = TutorPrompt(system="Ask a simple question...", describe=lambda context: None)
+
+# Rendered once: activity type -> full system instruction
+SYSTEM_INSTRUCTIONS = {
+    activity_type: BASE_PROMPT + "\n" + template.system
+    for activity_type, template in {**PROMPT_TEMPLATES, None: DEFAULT_PROMPT}.items()
+}
+
+
+@functools.lru_cache(maxsize=16)
+def get_tutor_model(system_instruction):
+    """GenerativeModel for one system instruction, built on first use."""
+    return clients.genai_module().GenerativeModel(TUTOR_MODEL_NAME, system_instruction=system_instruction)
+
+
+# Models hold gRPC clients once used; a forked worker must build its own
+clients.on_fork(get_tutor_model.cache_clear)
+
+
+def build_tutor_prompt(activity_context, user_message):
+    """Return (system_instruction, contents) for one tutor request."""
+    activity_context = activity_context if isinstance(activity_context, dict) else {}
+    activity_type = activity_context.get('type')
+    template = PROMPT_TEMPLATES.get(activity_type, DEFAULT_PROMPT)
+    system_instruction = SYSTEM_INSTRUCTIONS[activity_type if activity_type in PROMPT_TEMPLATES else None]
+
+    description = template.describe(activity_context)
+    contents = f"Student said: {user_message}"
+    if description:
+        contents = f"{description}\n{contents}"
+    return system_instruction, contents
+
+
+def generation_config():
+    return clients.genai_module().types.GenerationConfig(temperature=TUTOR_TEMPERATURE)
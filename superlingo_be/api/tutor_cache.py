@@ -0,0 +1,68 @@
+# /superlingo_be/api/tutor_cache.py
+"""
+Opt-in cache of tutor answers (TUTOR_ANSWER_CACHE_ENABLED).
+
+Learners tend to ask the same thing about the same activity ("why is 'I'
+first?"), so answers are keyed by the system instruction, the activity
+content and the student's message with case, whitespace and punctuation
+folded. Entries expire after TUTOR_ANSWER_CACHE_TTL seconds and are dropped
+early when their lesson changes (see api/signals.py).
+"""
+import hashlib
+import json
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from .caching import TTLCache
+
+
+def normalize_message(message):
+    """'Why is "I" first?? ' and 'why is i first' map to the same string."""
+    folded = unicodedata.normalize('NFKC', str(message)).casefold()
+    kept = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in folded)
+    return ' '.join(kept.split())
+
+
+def tutor_answer_key(system_instruction, activity_context, user_message):
+    payload = json.dumps(
+        [system_instruction, activity_context, normalize_message(user_message)],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def lesson_tags(lesson_id=None, lesson_title=None):
+    tags = []
+    if lesson_id not in (None, ''):
+        tags.append(f'lesson:{lesson_id}')
+    if lesson_title:
+        tags.append(f'lesson-title:{lesson_title}')
+    return tags
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tutor_answer_cache():
+    """The process-wide answer cache, or None when the cache is disabled."""
+    global _cache
+    if not getattr(settings, 'TUTOR_ANSWER_CACHE_ENABLED', False):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache(
+                    maxsize=getattr(settings, 'TUTOR_ANSWER_CACHE_MAX_ENTRIES', 2048),
+                    ttl=getattr(settings, 'TUTOR_ANSWER_CACHE_TTL', 24 * 60 * 60),
+                )
+    return _cache
+
+
+def invalidate_lesson(lesson_id=None, lesson_title=None):
+    cache = get_tutor_answer_cache()
+    if cache is None:
+        return 0
+    return sum(cache.invalidate_tag(tag) for tag in lesson_tags(lesson_id, lesson_title))
@@ -0,0 +1,255 @@
+# /superlingo_be/api/tutor_sessions.py
+"""
+Multi-turn tutor sessions with a bounded history.
+
+A chat request that names a session (`session_id`, or `session: true` to
+resume the learner's recent session on the same activity) is answered with
+the conversation so far instead of the single message:
+
+    [recent turns as user/model messages] + [activity, summary, new message]
+
+The history window is the newest turns that fit TUTOR_HISTORY_TOKEN_BUDGET
+(estimated tokens, at most MAX_WINDOW_TURNS). Older turns are folded into the
+session's rolling summary by a short Gemini call once TUTOR_SUMMARY_BATCH of
+them have piled up, then deleted; until then they are still sent verbatim, so
+no turn is ever missing from the prompt. However long a conversation runs, the
+prompt stays around the budget plus a summary of about
+TUTOR_SUMMARY_MAX_TOKENS, and a session keeps only that summary plus a
+handful of rows.
+
+Folding runs as a background job (api/jobs.py, `manage.py run_job_worker`),
+not inside the learner's request. Requests read at most MAX_WINDOW_ROWS
+turns; only when the unfolded backlog outgrows that (no worker running, or
+summaries failing for a long time) does a request fold inline.
+
+Session replies depend on the history, so they skip the answer cache and
+single-flight.
+"""
+import hashlib
+import json
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import timed
+from .models import Job, TutorSession, TutorTurn
+from .resilience import upstream
+from .tutor import generation_config, get_tutor_model
+
+logger = logging.getLogger(__name__)
+
+MAX_WINDOW_TURNS = 32 # Turns in the window even when they are short enough to fit more in the budget
+MAX_WINDOW_ROWS = 64 # Turns read per request: the window plus unfolded turns sent verbatim
+MAX_FOLD_TURNS = 32 # Turns summarized per Gemini call; a larger backlog takes several jobs
+
+SUMMARY_INSTRUCTION = (
+    "You keep notes on a conversation between an English tutor and a Korean-speaking student. "
+    "Merge the new exchanges into the existing notes. Keep what the student struggled with, "
+    "what was explained and any open questions. Write plain sentences, no greeting."
+)
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+def estimate_tokens(text):
+    """
+    Rough token count without a tokenizer call: ~4 ASCII characters per token,
+    one token per other character (Hangul etc.), which errs on the high side.
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def activity_key(activity_context):
+    payload = json.dumps(activity_context if isinstance(activity_context, dict) else {},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# --- Finding sessions ---
+def get_session(user, session_id):
+    try:
+        return TutorSession.objects.get(pk=session_id, user=user)
+    except (TutorSession.DoesNotExist, ValueError, TypeError):
+        raise SessionNotFound(session_id) from None
+
+
+def resume_or_start(user, activity_context, lesson_id=None):
+    """The user's session on this activity if used within TUTOR_SESSION_IDLE_TIMEOUT, else a new one."""
+    key = activity_key(activity_context)
+    idle_cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'TUTOR_SESSION_IDLE_TIMEOUT', 3600))
+    session = (TutorSession.objects.filter(user=user, activity_key=key, updated_at__gte=idle_cutoff)
+               .order_by('-updated_at').first())
+    if session is not None:
+        return session
+    try:
+        lesson_id = int(lesson_id) if lesson_id not in (None, '') else None
+    except (TypeError, ValueError):
+        lesson_id = None
+    activity_type = activity_context.get('type') if isinstance(activity_context, dict) else None
+    return TutorSession.objects.create(
+        user=user, activity_key=key, lesson_id=lesson_id, activity_type=str(activity_type or '')[:20],
+    )
+
+
+# --- History window ---
+def _newest_turns(session, limit):
+    """Up to `limit` of the newest turns, oldest first."""
+    turns = session.turns.order_by('-seq').only('seq', 'student', 'tutor', 'tokens')[:limit]
+    return list(turns)[::-1]
+
+
+def split_window(turns):
+    """
+    (overflow, window) of `turns` (oldest first): the window is the newest
+    turns that fit TUTOR_HISTORY_TOKEN_BUDGET, at most MAX_WINDOW_TURNS.
+    """
+    budget = getattr(settings, 'TUTOR_HISTORY_TOKEN_BUDGET', 1200)
+    start, used = len(turns), 0
+    while start > 0 and len(turns) - start < MAX_WINDOW_TURNS and used + turns[start - 1].tokens <= budget:
+        start -= 1
+        used += turns[start].tokens
+    return turns[:start], turns[start:]
+
+
+def history_window(session):
+    """
+    The turns to send with the next message, oldest first: the window plus the
+    older turns not folded into the summary yet. Folds inline when there are
+    more of those than a request reads.
+    """
+    turns = _newest_turns(session, MAX_WINDOW_ROWS + 1)
+    while len(turns) > MAX_WINDOW_ROWS:
+        logger.warning("Tutor session %s has more unsummarized turns than a request reads; folding inline",
+                       session.pk)
+        fold_overflow(session) # Upstream errors propagate like the reply's own
+        turns = _newest_turns(session, MAX_WINDOW_ROWS + 1)
+    return turns
+
+
+def overflow_turns(session, window, limit):
+    """Up to `limit` of the oldest turns that are no longer in `window`, oldest first."""
+    turns = session.turns.order_by('seq')
+    if window:
+        turns = turns.filter(seq__lt=window[0].seq)
+    return list(turns[:limit])
+
+
+def build_contents(session, window, prompt_content):
+    """Gemini `contents` for the next message: history_window() turns, then summary + activity + message."""
+    contents = []
+    for turn in window:
+        contents.append({'role': 'user', 'parts': [turn.student]})
+        contents.append({'role': 'model', 'parts': [turn.tutor]})
+    if session.summary:
+        prompt_content = f"Earlier in this conversation: {session.summary}\n{prompt_content}"
+    contents.append({'role': 'user', 'parts': [prompt_content]})
+    return contents
+
+
+def next_contents(session, prompt_content):
+    return build_contents(session, history_window(session), prompt_content)
+
+
+# --- Recording and folding ---
+def record_turn(session, student, tutor):
+    with transaction.atomic():
+        # Row lock hands out seq numbers one at a time per session
+        seq = TutorSession.objects.select_for_update().values_list('turn_count', flat=True).get(pk=session.pk) + 1
+        turn = TutorTurn.objects.create(
+            session=session, seq=seq, student=student, tutor=tutor,
+            tokens=estimate_tokens(student) + estimate_tokens(tutor),
+        )
+        TutorSession.objects.filter(pk=session.pk).update(turn_count=F('turn_count') + 1, updated_at=timezone.now())
+    session.turn_count = seq
+    return turn
+
+
+def _summary_prompt(summary, turns):
+    lines = [f"Notes so far: {summary or '(none)'}", "", "New exchanges:"]
+    for turn in turns:
+        lines.append(f"Student: {turn.student}")
+        lines.append(f"Tutor: {turn.tutor}")
+    max_words = getattr(settings, 'TUTOR_SUMMARY_MAX_TOKENS', 300) * 3 // 4
+    lines += ["", f"Updated notes, at most {max_words} words:"]
+    return '\n'.join(lines)
+
+
+def _clip(text, max_tokens):
+    while text and estimate_tokens(text) > max_tokens: # Summaries are short; a few passes at most
+        text = text[:int(len(text) * 0.9)]
+    return text
+
+
+def summarize(summary, turns):
+    """New rolling summary covering `summary` and `turns`. Raises on upstream errors."""
+    with upstream('gemini').call() as deadline, timed('gemini'):
+        response = get_tutor_model(SUMMARY_INSTRUCTION).generate_content(
+            _summary_prompt(summary, turns),
+            generation_config=generation_config(),
+            request_options={'timeout': deadline},
+        )
+    return _clip(response.text.strip(), getattr(settings, 'TUTOR_SUMMARY_MAX_TOKENS', 300))
+
+
+def schedule_fold(session):
+    """
+    Queue a summary job once TUTOR_SUMMARY_BATCH turns have left the history
+    window, unless one is already pending for the session. Returns the job or None.
+    """
+    from . import jobs # jobs runs fold_overflow; import late to keep the modules independent
+
+    batch = getattr(settings, 'TUTOR_SUMMARY_BATCH', 4)
+    overflow, _ = split_window(_newest_turns(session, MAX_WINDOW_ROWS))
+    if len(overflow) < batch:
+        return None
+    pending = Job.objects.filter(kind='summary', status__in=jobs.PENDING, payload__session_id=session.pk)
+    if pending.exists():
+        return None
+    return jobs.submit(session.user, 'summary', {'session_id': session.pk})
+
+
+def fold_overflow(session):
+    """
+    Fold up to MAX_FOLD_TURNS of the oldest turns outside the history window
+    into the summary. Returns the number folded. Upstream errors propagate, so
+    the summary job is retried; the turns stay in the prompt meanwhile.
+    """
+    _, window = split_window(_newest_turns(session, MAX_WINDOW_ROWS))
+    overflow = overflow_turns(session, window, MAX_FOLD_TURNS)
+    if not overflow:
+        return 0
+    previous = session.summary
+    summary = summarize(previous, overflow)
+    with transaction.atomic():
+        # A concurrent fold may have summarized the same turns meanwhile; keep its summary
+        if not TutorSession.objects.filter(pk=session.pk, summary=previous).update(summary=summary):
+            session.refresh_from_db(fields=['summary'])
+            return 0
+        TutorTurn.objects.filter(session=session, seq__lte=overflow[-1].seq).delete()
+    session.summary = summary
+    logger.debug("Folded %s turns of tutor session %s into the summary", len(overflow), session.pk)
+    return len(overflow)
+
+
+def session_body(session):
+    """GET /api/chat/sessions/<id>/: summary plus the turns still stored."""
+    return {
+        'session_id': session.pk,
+        'activity_type': session.activity_type,
+        'lesson_id': session.lesson_id,
+        'summary': session.summary,
+        'turn_count': session.turn_count,
+        'turns': [
+            {'seq': turn.seq, 'student': turn.student, 'tutor': turn.tutor, 'created_at': turn.created_at}
+            for turn in session.turns.order_by('seq')
+        ],
+        'updated_at': session.updated_at,
+    }
@@ -1,22 +1,42 @@
 # /superlingo_be/api/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # Import the NEW TTS view, remove old one
 from .views import (
     register_user, login_user, chat_with_tutor, 
     generate_cloud_tts_audio, transcribe_audio, LessonViewSet,
-    complete_lesson # <-- IMPORT NEW VIEW
+    complete_lesson, complete_lessons, # <-- IMPORT NEW VIEW
+    tts_audio, tts_cache_stats, chat_with_tutor_stream, tutor_cache_stats, auth_cache_stats, health,
+    leaderboard, my_leaderboard_rank, submit_job, job_detail, tutor_session,
 )
 
+if settings.ASYNC_AI_VIEWS:
+    # Same paths and contracts, served by the async Google clients (run under ASGI);
+    # job_detail adds the ?wait=N long-poll
+    from .async_views import chat_with_tutor, generate_cloud_tts_audio, job_detail, transcribe_audio
+
 router = DefaultRouter()
 router.register(r'lessons', LessonViewSet, basename='lesson')
 
 urlpatterns = [
+    path('health/', health, name='health'),
     path('register/', register_user, name='register'),
     path('login/', login_user, name='login'),
     path('chat/', chat_with_tutor, name='chat-with-tutor'),
+    path('chat/stream/', chat_with_tutor_stream, name='chat-with-tutor-stream'),
+    path('chat/sessions/<int:session_id>/', tutor_session, name='tutor-session'),
     path('transcribe-audio/', transcribe_audio, name='transcribe-audio'),
     path('generate-gemini-audio/', generate_cloud_tts_audio, name='generate-cloud-audio'),
+    path('tts-audio/', tts_audio, name='tts-audio'),
+    path('tts-cache/stats/', tts_cache_stats, name='tts-cache-stats'),
+    path('tutor-cache/stats/', tutor_cache_stats, name='tutor-cache-stats'),
+    path('auth-cache/stats/', auth_cache_stats, name='auth-cache-stats'),
     path('complete-lesson/', complete_lesson, name='complete-lesson'),
+    path('complete-lessons/', complete_lessons, name='complete-lessons'),
+    path('leaderboard/', leaderboard, name='leaderboard'),
+    path('leaderboard/me/', my_leaderboard_rank, name='leaderboard-me'),
+    path('jobs/', submit_job, name='job-submit'),
+    path('jobs/<int:job_id>/', job_detail, name='job-detail'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,58 +1,103 @@
 # /superlingo_be/api/views.py
 from django.contrib.auth import authenticate
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.pagination import CursorPagination
+from rest_framework.decorators import api_view, parser_classes, permission_classes, renderer_classes
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from .models import Lesson
 from .serializers import UserSerializer, LessonSerializer
-import google.generativeai as genai
-from google.cloud import texttospeech # Import Google Cloud TTS client
-import os
-import traceback # Import traceback for better error logging
+import logging
 import base64  
-from google.cloud import speech
-from .models import Lesson, UserLessonProgress
-
-# --- Configure APIs ---
-gemini_model = None
-tts_client = None # Google Cloud TTS Client
-speech_client = None 
-
-gemini_api_configured = False
-gcloud_tts_configured = False
-gcloud_stt_configured = False
-
-
-try:
-    # Gemini Setup
-    GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
-    if not GOOGLE_API_KEY or GOOGLE_API_KEY == 'YOUR_GEMINI_API_KEY_HERE':
-        raise ValueError("GOOGLE_API_KEY missing or placeholder.")
-    genai.configure(api_key=GOOGLE_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-2.5-flash') # Use stable model name
-    gemini_api_configured = True
-    print("Gemini API configured successfully.")
-except Exception as e:
-    print(f"FATAL ERROR: Could not configure Gemini API: {e}")
-    print(traceback.format_exc()) # Print full traceback
-
-try:
-    if os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'):
-        tts_client = texttospeech.TextToSpeechClient()
-        gcloud_tts_configured = True
-        print("Google Cloud TTS client configured successfully.")
-        
-        speech_client = speech.SpeechClient()
-        gcloud_stt_configured = True
-        print("Google Cloud STT client configured successfully.")
-    else:
-        raise ValueError("GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
-except Exception as e:
-    print(f"FATAL ERROR: Could not configure Google Cloud TTS client: {e}")
-    print(traceback.format_exc()) # Print full traceback
+import contextvars
+import json
+import queue
+import threading
+import time
+from .models import Job, UserLessonProgress
+from .tts_cache import get_tts_cache, tts_cache_key
+from .audio_response import AUDIO_FORMATS, audio_response, etag_matches, not_modified_response
+from .renderers import AudioRenderer, EventStreamRenderer
+from .parsers import AudioJSONParser, RawAudioParser, max_audio_upload_bytes
+from .progress import MAX_BATCH_SIZE, record_lesson_completions
+from . import jobs, leaderboard as ranking, tutor_sessions
+from .authentication import auth_cache_stats as get_auth_cache_stats
+from . import audio_preprocess, clients
+from .catalog import get_lesson_catalog
+from .db_router import reads_from_replica
+from .tutor import build_tutor_prompt, get_tutor_model, generation_config as tutor_generation_config
+from .tutor_cache import get_tutor_answer_cache, lesson_tags, tutor_answer_key
+from .metrics import TUTOR_STREAM_TTFT, timed
+from .singleflight import SingleFlight
+from .resilience import UpstreamUnavailable, upstream
+
+logger = logging.getLogger(__name__)
+
+
+# --- Cloud TTS voice (every lesson prompt uses the same one) ---
+TTS_LANGUAGE_CODE = "en-US"
+TTS_VOICE_NAME = "en-US-Studio-O"
+
+# Identical concurrent upstream calls share one request (api/singleflight.py)
+tts_flight = SingleFlight('tts')
+gemini_flight = SingleFlight('gemini')
+
+
+def tts_request(text, encoding='MP3'):
+    """Keyword arguments for (Async)TextToSpeechClient.synthesize_speech."""
+    texttospeech = clients.texttospeech_module()
+    return {
+        'input': texttospeech.SynthesisInput(text=text),
+        'voice': texttospeech.VoiceSelectionParams(language_code=TTS_LANGUAGE_CODE, name=TTS_VOICE_NAME),
+        'audio_config': texttospeech.AudioConfig(audio_encoding=getattr(texttospeech.AudioEncoding, encoding)),
+    }
+
+
+def synthesize_tts_audio(text, encoding='MP3', pin=False):
+    """
+    Return (cache_key, audio bytes) for `text`, going through the TTS cache.
+    `encoding` is a texttospeech.AudioEncoding member name, e.g. 'MP3'.
+    `pin=True` keeps the clip in the persistent audio store (see prerender_tts).
+    """
+    cache = get_tts_cache()
+    key = tts_cache_key(text, TTS_VOICE_NAME, encoding)
+    audio = cache.get(key)
+    if audio is None:
+        # Concurrent misses for the same clip wait for one Cloud TTS call
+        audio = tts_flight.do(key, lambda: _fetch_tts_audio(cache, key, text, encoding, pin))
+    if pin and not cache.is_pinned(key):
+        cache.set(key, audio, pin=True)
+    return key, audio
+
+
+def _fetch_tts_audio(cache, key, text, encoding, pin):
+    logger.debug("TTS cache miss, sending text to Google Cloud TTS: %r", text)
+    with upstream('tts').call() as deadline, timed('tts'):
+        response = clients.tts_client().synthesize_speech(**tts_request(text, encoding), timeout=deadline)
+    cache.set(key, response.audio_content, pin=pin)
+    return response.audio_content
+
+
+def _requested_audio_format(request, requested=None):
+    """
+    Raw-audio format asked for via an explicit `audio_format` value ('mp3' or
+    'opus') or an `Accept: audio/...` header. None means the JSON data URI shape.
+    """
+    if requested:
+        return requested if requested in AUDIO_FORMATS else None
+    accept = request.META.get('HTTP_ACCEPT', '')
+    for fmt, (_, content_type) in AUDIO_FORMATS.items():
+        if content_type in accept:
+            return fmt
+    if 'audio/*' in accept:
+        return 'mp3'
+    return None
 
 
 # --- register_user and login_user (remain the same) ---
@@ -61,7 +106,7 @@ except Exception as e:
 def register_user(request): # ... (same code) ...
     serializer = UserSerializer(data=request.data)
     if serializer.is_valid(): serializer.save(); return Response(serializer.data, status=status.HTTP_201_CREATED)
-    print(f"Reg failed: {serializer.errors}"); return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    logger.info("Registration failed: %s", serializer.errors); return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -71,23 +116,123 @@ def login_user(request):
     user = authenticate(username=username, password=password)
     if user:
         token, _ = Token.objects.get_or_create(user=user)
-        print(f"Login OK: {username}")
+        logger.debug("Login OK: %s", username)
         # --- FIX 1: You must return the experience_points ---
         return Response({
             'token': token.key,
             'experience_points': user.experience_points
         })
         # --- END FIX ---
-    print(f"Login Fail: {username}")
+    logger.info("Login failed: %s", username)
     return Response({'error': 'Invalid Credentials'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 # --- chat_with_tutor (Corrected API Call Logic) ---
+TUTOR_FALLBACK_REPLY = "Sorry, I didn't get that. Could you rephrase?"
+TUTOR_BLOCKED_REPLY = "I'm sorry, I can't respond to that topic."
+TUTOR_ERROR_REPLY = "Sorry, AI error."
+
+
+def _is_blocked(candidate):
+    return candidate.finish_reason not in (None, 0, clients.genai_module().types.Candidate.FinishReason.STOP)
+
+
+def _is_cacheable_reply(reply):
+    return reply not in (TUTOR_FALLBACK_REPLY, TUTOR_BLOCKED_REPLY, TUTOR_ERROR_REPLY)
+
+
+def _extract_reply(response):
+    ai_reply = TUTOR_FALLBACK_REPLY
+    # Add more robust checks for safety/blocking
+    if response.candidates:
+         candidate = response.candidates[0]
+         if candidate.content and candidate.content.parts:
+             ai_reply = candidate.content.parts[0].text.strip()
+         elif candidate.finish_reason != clients.genai_module().types.Candidate.FinishReason.STOP:
+             logger.info("Gemini response blocked. Reason: %s", candidate.finish_reason)
+             ai_reply = TUTOR_BLOCKED_REPLY
+         else: logger.warning("Gemini response was empty but not blocked.")
+    else: logger.warning("Gemini response had no candidates.")
+    return ai_reply
+
+
+def _ask_gemini(model, contents):
+    with upstream('gemini').call() as deadline, timed('gemini'):
+        response = model.generate_content(
+             contents, # Pass only user message (and history) here
+             generation_config=tutor_generation_config(),
+             request_options={'timeout': deadline},
+             # Do NOT pass system_instruction here again
+        )
+    return _extract_reply(response)
+
+
+def tutor_reply(user_message, activity_context, lesson_id=None, lesson_title='this lesson', session=None):
+    """
+    The tutor's reply to one message: from the answer cache if enabled,
+    otherwise one (coalesced) Gemini call. Raises on upstream errors.
+    With a TutorSession the reply is made with, and added to, its history.
+    Shared by chat_with_tutor and background chat jobs (api/jobs.py).
+    """
+    # --- FINAL CORRECTED GEMINI CALL ---
+    # Fixed per-activity system instruction (cached model); activity details ride in the content
+    system_instruction, prompt_content = build_tutor_prompt(activity_context, user_message)
+    model_with_system_prompt = get_tutor_model(system_instruction)
+
+    if session is not None:
+        return _session_reply(session, model_with_system_prompt, prompt_content, user_message)
+
+    # Opt-in answer cache: a hit skips Gemini entirely
+    answer_cache = get_tutor_answer_cache()
+    answer_key = tutor_answer_key(system_instruction, activity_context, user_message)
+    if answer_cache is not None:
+        cached_reply = answer_cache.get(answer_key)
+        if cached_reply is not None:
+            return cached_reply
+
+    def ask_gemini():
+        logger.debug("Sending prompt to Gemini Chat. User: %s", user_message)
+        return _ask_gemini(model_with_system_prompt, prompt_content)
+
+    # The same question asked at the same moment (a class on one activity) is sent once
+    ai_reply = gemini_flight.do(answer_key, ask_gemini)
+    if answer_cache is not None and _is_cacheable_reply(ai_reply):
+        answer_cache.set(answer_key, ai_reply, tags=lesson_tags(lesson_id, lesson_title))
+    return ai_reply
+
+
+def _session_reply(session, model, prompt_content, user_message):
+    # History-dependent, so no answer cache or single-flight
+    logger.debug("Sending prompt to Gemini Chat (session %s). User: %s", session.pk, user_message)
+    ai_reply = _ask_gemini(model, tutor_sessions.next_contents(session, prompt_content))
+    if _is_cacheable_reply(ai_reply): # Blocked / empty replies stay out of the history
+        tutor_sessions.record_turn(session, user_message, ai_reply)
+        tutor_sessions.schedule_fold(session) # Summarized by a job worker, not in this request
+    return ai_reply
+
+
+def requested_tutor_session(user, data, activity_context):
+    """
+    The TutorSession a chat request asks for: `session_id` to continue one,
+    `session: true` to resume this activity's recent session or start one.
+    None for a stateless request. Raises tutor_sessions.SessionNotFound.
+    """
+    session_id = data.get('session_id')
+    if session_id not in (None, ''):
+        return tutor_sessions.get_session(user, session_id)
+    if data.get('session') in (True, 'true', '1', 1):
+        return tutor_sessions.resume_or_start(user, activity_context, data.get('lesson_id'))
+    return None
+
+
+SESSION_NOT_FOUND = {'error': 'Tutor session not found'}
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def chat_with_tutor(request):
-    if not gemini_api_configured or not gemini_model: # Check flag
-        print("Error: Gemini model not initialized/configured.");
+    if not clients.gemini_ready(): # Check flag
+        logger.error("Gemini model not initialized/configured.")
         return Response({'error': 'AI model not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     user_message = request.data.get('message', '')
@@ -96,82 +241,213 @@ def chat_with_tutor(request):
 
     if not user_message: return Response({'error': 'No message provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # --- Dynamic Prompt Engineering (Same logic) ---
-    base_prompt = f"""You are Betterlingo, a friendly English tutor AI...""" # Keep your full prompt
-    activity_prompt = "Ask a simple question..."
-    # ... (Keep the rest of your dynamic prompt generation logic based on activity_type) ...
-    activity_type = activity_context.get('type')
-    if activity_type == "MATCHING":
-        words = [p[0] for p in activity_context.get('pairs', []) if isinstance(p, list) and len(p)>0]
-        activity_prompt = f"Student is matching vocabulary: {', '.join(words)}. ANSWER IN KOREAN. First, find out what exactly the user needs help with for THIS ACTIVITY. Serveral words are given in random order, user is trying to match the korean-english word pairs"
-    elif activity_type == "ORDERING":
-        sentence = activity_context.get('prompt', '')
-        activity_prompt = f"Student practiced sentence: '{sentence}'. ANSWER IN KOREAN. First, find out what exactly the user needs help with for this activity. explain grammer why each words in sentences comes there and what's their purpose, with examples."
-    elif activity_type == "LISTENING":
-         word = activity_context.get('correct_answer', '')
-         activity_prompt = f"Student identified word '{word}'.ANSWER IN KOREAN. First, find out what exactly the user needs help with for this activity. Teach them the actual pronunciation vs spelling."
-    elif activity_type == "SPEAKING":
-            sentence = activity_context.get('prompt', '')
-            activity_prompt = f"Student practiced speaking the sentence: '{sentence}'. ANSWER IN KOREAN. First, find out what exactly the user needs help with for this activity. Focus on pronunciation, intonation, or specific tricky words in that sentence. Offer to break it down for them."
-    system_instruction = base_prompt + "\n" + activity_prompt
-    # --- FINAL CORRECTED GEMINI CALL ---
-    # Create a new model instance WITH the system instruction
-    model_with_system_prompt = genai.GenerativeModel(
-        'gemini-2.5-flash',
-        system_instruction=system_instruction
-    )
-    prompt_content = f"Student said: {user_message}" # Content is just the user message
-
     try:
-        print(f"Sending prompt to Gemini Chat. User: {user_message}")
-        response = model_with_system_prompt.generate_content(
-             prompt_content, # Pass only user message here
-             generation_config=genai.types.GenerationConfig(temperature=0.7),
-             # Do NOT pass system_instruction here again
-        )
-        print("Received response from Gemini Chat.")
-
-        ai_reply = "Sorry, I didn't get that. Could you rephrase?"
-        # Add more robust checks for safety/blocking
-        if response.candidates:
-             candidate = response.candidates[0]
-             if candidate.content and candidate.content.parts:
-                 ai_reply = candidate.content.parts[0].text.strip()
-             elif candidate.finish_reason != genai.types.Candidate.FinishReason.STOP:
-                 print(f"Gemini response blocked. Reason: {candidate.finish_reason}")
-                 ai_reply = "I'm sorry, I can't respond to that topic."
-             else: print("Gemini response was empty but not blocked.")
-        else: print("Gemini response had no candidates.")
+        session = requested_tutor_session(request.user, request.data, activity_context)
+    except tutor_sessions.SessionNotFound:
+        return Response(SESSION_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        ai_reply = tutor_reply(user_message, activity_context, request.data.get('lesson_id'), lesson_title, session)
+        if session is not None:
+            return Response({'reply': ai_reply, 'session_id': session.pk})
         return Response({'reply': ai_reply})
 
+    except UpstreamUnavailable as e:
+        # Breaker open or too many calls in flight: fail fast instead of tying up a worker
+        logger.warning("Gemini unavailable: %s", e)
+        return Response({'reply': TUTOR_ERROR_REPLY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Error calling Gemini API: %s", e)
+        return Response({'reply': TUTOR_ERROR_REPLY}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+def _read_gemini_stream(model, prompt_content, chunks):
+    """
+    Producer for _stream_tutor_reply, run in its own thread: reads the Gemini
+    stream inside the bulkhead slot and puts ('text', str), ('blocked',
+    finish_reason), ('error', exception) or ('end', None) on `chunks`. The
+    slot is freed as soon as Gemini is done, however slowly the client reads.
+    """
+    try:
+        with upstream('gemini').call() as deadline:
+            response = model.generate_content(
+                prompt_content,
+                generation_config=tutor_generation_config(),
+                stream=True,
+                request_options={'timeout': deadline},
+            )
+            for chunk in response:
+                if not chunk.candidates:
+                    continue
+                candidate = chunk.candidates[0]
+                text = ''.join(
+                    getattr(part, 'text', '') for part in (candidate.content.parts if candidate.content else [])
+                )
+                if text:
+                    chunks.put(('text', text))
+                elif _is_blocked(candidate):
+                    chunks.put(('blocked', candidate.finish_reason))
+                    return
     except Exception as e:
-        print(f"Error calling Gemini API: {e}")
-        print(traceback.format_exc()) # Log the full traceback
-        fallback_reply = "Sorry, AI error."; return Response({'reply': fallback_reply}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        chunks.put(('error', e))
+        return
+    chunks.put(('end', None))
+
+
+def _stream_tutor_reply(model, prompt_content, on_reply=None, done_extra=None):
+    """
+    Yield SSE events for a streamed Gemini reply:
+    `delta` {"text"} per chunk, then `done` {"reply", "ttft_ms", "total_ms"}
+    plus `done_extra` (or `error` {"reply"}). Blocked candidates end the stream
+    with the same reply text as the non-streaming endpoint. `on_reply(reply)`
+    is called with the finished reply when it is a real answer (not blocked or empty).
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+    reply = None
+    chunks = queue.Queue()
+    # copy_context keeps the request's log/metrics context in the producer thread
+    threading.Thread(
+        target=contextvars.copy_context().run, args=(_read_gemini_stream, model, prompt_content, chunks),
+        name='gemini-stream', daemon=True,
+    ).start()
+    while True:
+        kind, value = chunks.get()
+        if kind == 'text':
+            if ttft_ms is None:
+                ttft = time.perf_counter() - started
+                ttft_ms = round(ttft * 1000, 1)
+                TUTOR_STREAM_TTFT.observe(ttft)
+                logger.debug("Gemini stream first token after %s ms", ttft_ms)
+            parts.append(value)
+            yield _sse_event('delta', {'text': value})
+        elif kind == 'blocked':
+            logger.info("Gemini response blocked. Reason: %s", value)
+            reply = TUTOR_BLOCKED_REPLY
+            break
+        elif kind == 'error':
+            if isinstance(value, UpstreamUnavailable):
+                logger.warning("Gemini unavailable (stream): %s", value)
+            else:
+                logger.error("Error calling Gemini API (stream): %s", value, exc_info=value)
+            yield _sse_event('error', {'reply': TUTOR_ERROR_REPLY})
+            return
+        else:
+            break
+
+    if reply is None:
+        reply = ''.join(parts).strip() or TUTOR_FALLBACK_REPLY
+    if on_reply is not None and _is_cacheable_reply(reply):
+        on_reply(reply)
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    yield _sse_event('done', {'reply': reply, 'ttft_ms': ttft_ms, 'total_ms': total_ms, **(done_extra or {})})
+
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer])
+def chat_with_tutor_stream(request):
+    """
+    Same request body as /api/chat/, but the reply is sent as Server-Sent
+    Events while Gemini generates it (see _stream_tutor_reply for the events).
+    """
+    if not clients.gemini_ready():
+        logger.error("Gemini model not initialized/configured.")
+        return Response({'error': 'AI model not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    user_message = request.data.get('message', '')
+    activity_context = request.data.get('context', {})
+
+    if not user_message: return Response({'error': 'No message provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        session = requested_tutor_session(request.user, request.data, activity_context)
+    except tutor_sessions.SessionNotFound:
+        return Response(SESSION_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+
+    system_instruction, prompt_content = build_tutor_prompt(activity_context, user_message)
+    if session is not None:
+        logger.debug("Streaming prompt to Gemini Chat (session %s). User: %s", session.pk, user_message)
+
+        def events():
+            yield from _stream_tutor_reply(
+                get_tutor_model(system_instruction), tutor_sessions.next_contents(session, prompt_content),
+                lambda reply: tutor_sessions.record_turn(session, user_message, reply),
+                done_extra={'session_id': session.pk},
+            )
+            tutor_sessions.schedule_fold(session)
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    answer_cache = get_tutor_answer_cache()
+    on_reply = None
+    if answer_cache is not None:
+        answer_key = tutor_answer_key(system_instruction, activity_context, user_message)
+        cached_reply = answer_cache.get(answer_key)
+        if cached_reply is not None:
+            events = iter([
+                _sse_event('delta', {'text': cached_reply}),
+                _sse_event('done', {'reply': cached_reply, 'ttft_ms': 0.0, 'total_ms': 0.0, 'cached': True}),
+            ])
+            response = StreamingHttpResponse(events, content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            return response
+        tags = lesson_tags(request.data.get('lesson_id'), request.data.get('lesson_title', 'this lesson'))
+        on_reply = lambda reply: answer_cache.set(answer_key, reply, tags=tags)
+
+    logger.debug("Streaming prompt to Gemini Chat. User: %s", user_message)
+    response = StreamingHttpResponse(
+        _stream_tutor_reply(get_tutor_model(system_instruction), prompt_content, on_reply),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Stop nginx from buffering the stream
+    return response
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def tutor_session(request, session_id):
+    """GET /api/chat/sessions/<id>/ - the session's summary and stored turns; DELETE ends it."""
+    try:
+        session = tutor_sessions.get_session(request.user, session_id)
+    except tutor_sessions.SessionNotFound:
+        return Response(SESSION_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'DELETE':
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(tutor_sessions.session_body(session))
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [AudioRenderer])
 def generate_cloud_tts_audio(request):
-    if not gcloud_tts_configured or not tts_client: # Check flag and client
-        print("Error: Google Cloud TTS client not initialized/configured.")
+    if not clients.tts_ready(): # Check flag and client
+        logger.error("Google Cloud TTS client not initialized/configured.")
         return Response({'error': 'AI Audio model is not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     text_to_speak = request.data.get('text', '')
     if not text_to_speak: return Response({'error': 'No text provided for audio'}, status=status.HTTP_400_BAD_REQUEST)
 
+    # Newer clients can ask for raw bytes; older ones keep getting the JSON data URI
+    audio_format = _requested_audio_format(request, request.data.get('audio_format'))
+    if audio_format:
+        return _tts_audio_response(request, text_to_speak, audio_format)
+
     try:
-        print(f"Sending text to Google Cloud TTS: '{text_to_speak}'")
-        synthesis_input = texttospeech.SynthesisInput(text=text_to_speak)
-        voice = texttospeech.VoiceSelectionParams(language_code="en-US", name="en-US-Studio-O")
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-        
-        response = tts_client.synthesize_speech(input=synthesis_input, voice=voice, audio_config=audio_config)
-        print("Received audio response from Google Cloud TTS.")
+        _, audio_content = synthesize_tts_audio(text_to_speak)
 
         # --- 2. THIS IS THE FIX ---
         # Encode the raw MP3 audio content into Base64
-        audio_base64 = base64.b64encode(response.audio_content).decode('utf-8')
+        audio_base64 = base64.b64encode(audio_content).decode('utf-8')
         
         # Create a data URI string, which Expo AV can play directly
         data_uri = f'data:audio/mpeg;base64,{audio_base64}'
@@ -180,78 +456,246 @@ def generate_cloud_tts_audio(request):
         return Response({'audioUrl': data_uri}, status=status.HTTP_200_OK) 
         # --- END FIX ---
 
+    except UpstreamUnavailable as e:
+        logger.warning("Google Cloud TTS unavailable: %s", e)
+        return Response({'error': f'Failed audio gen: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
-        print(f"Error calling Google Cloud TTS API: {e}"); print(traceback.format_exc());
+        logger.exception("Error calling Google Cloud TTS API: %s", e)
         return Response({'error': f'Failed audio gen: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-
-@api_view(['POST'])
+@api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
-def transcribe_audio(request):
-    if not gcloud_stt_configured:
-        print("Error: Google Cloud STT client not initialized/configured.")
-        return Response({'error': 'Audio transcription not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [AudioRenderer])
+def tts_audio(request):
+    """
+    GET /api/tts-audio/?text=...&audio_format=mp3|opus
+    Raw audio with ETag/Range support, so players and proxies can cache it.
+    """
+    if not clients.tts_ready():
+        logger.error("Google Cloud TTS client not initialized/configured.")
+        return Response({'error': 'AI Audio model is not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    audio_base64 = request.data.get('audio_base64')
-    correct_prompt = request.data.get('prompt')
-    # --- ADD THIS LINE ---
-    platform = request.data.get('platform', 'native') # Get platform, default to native
+    text_to_speak = request.query_params.get('text', '')
+    if not text_to_speak: return Response({'error': 'No text provided for audio'}, status=status.HTTP_400_BAD_REQUEST)
+
+    audio_format = _requested_audio_format(request, request.query_params.get('audio_format')) or 'mp3'
+    return _tts_audio_response(request, text_to_speak, audio_format)
 
-    if not audio_base64 or not correct_prompt:
-        return Response({'error': 'Missing audio data or correct prompt'}, status=status.HTTP_400_BAD_REQUEST)
 
+def _tts_audio_response(request, text, audio_format):
+    encoding, content_type = AUDIO_FORMATS[audio_format]
+    # The ETag is the cache key, so a revalidation never needs the audio itself
+    not_modified = not_modified_response(request, tts_cache_key(text, TTS_VOICE_NAME, encoding))
+    if not_modified is not None:
+        return not_modified
     try:
-        audio_content = base64.b64decode(audio_base64)
-        audio = speech.RecognitionAudio(content=audio_content)
-
-        # --- THIS IS THE FIX ---
-        # Use the correct config based on the platform
-        if platform == 'web':
-            print("Using WEB config (WEBM_OPUS)")
-            # Web sends WEBM_OPUS.
-            # Google requires sample_rate_hertz to be OMITTED for this format.
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                language_code="en-US"
-            )
-        else:
-            print("Using NATIVE config (LINEAR16)")
-            # Native (iOS/Android) sends LINEAR16 at 16000Hz
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000,
-                language_code="en-US"
-            )
-        # --- END OF FIX ---
+        key, audio_content = synthesize_tts_audio(text, encoding)
+    except UpstreamUnavailable as e:
+        logger.warning("Google Cloud TTS unavailable: %s", e)
+        return Response({'error': f'Failed audio gen: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Error calling Google Cloud TTS API: %s", e)
+        return Response({'error': f'Failed audio gen: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return audio_response(request, audio_content, content_type, key)
 
-        print("Sending audio to Google Cloud STT...")
-        response = speech_client.recognize(config=config, audio=audio)
-        print("Received response from Google Cloud STT.")
 
-        if not response.results or not response.results[0].alternatives:
-            print("STT: No speech detected.")
-            # Use a generic message, not Korean
-            return Response({'is_correct': False, 'transcribed_text': '[No speech detected]'})
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def health(request):
+    """
+    Which upstream clients this worker could configure. The first call in a
+    process builds the clients, so it doubles as a warm-up for load balancers.
+    """
+    flags = clients.readiness()
+    ready = all(flags.values())
+    return Response({'status': 'ok' if ready else 'degraded', **flags},
+                    status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        transcription = response.results[0].alternatives[0].transcript.strip()
-        print(f"Transcribed: '{transcription}'")
 
-        transcribed_norm = ''.join(c.lower() for c in transcription if c.isalnum() or c.isspace()).strip()
-        correct_norm = ''.join(c.lower() for c in correct_prompt if c.isalnum() or c.isspace()).strip()
-        
-        is_correct = (transcribed_norm == correct_norm)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def tts_cache_stats(request):
+    # Hit/miss/eviction counters, used to size TTS_CACHE_* limits
+    return Response(get_tts_cache().stats())
 
-        print(f"Comparison: '{transcribed_norm}' vs '{correct_norm}' -> {is_correct}")
 
-        return Response({
-            'is_correct': is_correct,
-            'transcribed_text': transcription
-        })
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def auth_cache_stats(request):
+    # Token auth cache hit rate (TOKEN_AUTH_CACHE_*)
+    return Response(get_auth_cache_stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def tutor_cache_stats(request):
+    # Shows whether the opt-in answer cache pays off (TUTOR_ANSWER_CACHE_*)
+    answer_cache = get_tutor_answer_cache()
+    if answer_cache is None:
+        return Response({'enabled': False})
+    return Response({'enabled': True, **answer_cache.stats()})
+
+
+# Audio uploads may be larger than Django's DATA_UPLOAD_MAX_MEMORY_SIZE: JSON bodies are read
+# with TRANSCRIBE_MAX_UPLOAD_BYTES instead, and upload_too_large() rejects bigger ones up front
+AUDIO_UPLOAD_PARSERS = [AudioJSONParser, *api_settings.DEFAULT_PARSER_CLASSES, RawAudioParser]
 
+
+def upload_too_large(meta):
+    """413 payload when the declared body size is over TRANSCRIBE_MAX_UPLOAD_BYTES, else None."""
+    try:
+        length = int(meta.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length > max_audio_upload_bytes():
+        return {'error': f'Audio upload too large (max {max_audio_upload_bytes()} bytes)'}
+    return None
+
+
+def transcribe_inputs(data, query_params, content_type):
+    """
+    Return (audio, prompt, platform) from any of the accepted upload shapes:
+    JSON `audio_base64`, multipart `audio` file, or a raw `audio/*` body
+    (prompt/platform then come from the query string). `audio` may be None;
+    base64 is decoded lazily by read_upload_audio so errors land in the caller's try.
+    """
+    audio = data.get('audio') or data.get('audio_base64')
+    prompt = data.get('prompt') or query_params.get('prompt')
+    platform = data.get('platform') or query_params.get('platform')
+    if not platform:
+        # Raw uploads: browsers record WEBM/OGG Opus, native clients send LINEAR16
+        platform = 'web' if content_type.startswith(('audio/webm', 'audio/ogg')) else 'native'
+    return audio, prompt, platform
+
+
+def read_upload_audio(audio):
+    if isinstance(audio, str):
+        return base64.b64decode(audio)
+    if hasattr(audio, 'read'): # Multipart UploadedFile
+        return audio.read()
+    return audio
+
+
+# Use a generic message, not Korean
+NO_SPEECH_RESULT = {'is_correct': False, 'transcribed_text': '[No speech detected]'}
+
+
+def prepare_stt_audio(audio_content, platform, data, query_params):
+    """
+    Trim silence / downmix / resample native LINEAR16 recordings before STT
+    (api/audio_preprocess.py). Returns None when the clip has no speech.
+    Web uploads (WEBM_OPUS) are passed through untouched.
+    """
+    if platform == 'web' or not settings.STT_PREPROCESS_ENABLED or not audio_preprocess.is_available():
+        return audio_content
+    try:
+        sample_rate = int(data.get('sample_rate') or query_params.get('sample_rate') or audio_preprocess.TARGET_SAMPLE_RATE)
+        channels = int(data.get('channels') or query_params.get('channels') or 1)
+        processed = audio_preprocess.preprocess_linear16(audio_content, sample_rate=sample_rate, channels=channels)
+    except ValueError as e:
+        # Let STT have a go at anything we can't parse, as before
+        logger.info("STT preprocessing skipped: %s", e)
+        return audio_content
+    if processed is not None:
+        logger.debug("STT preprocessing: %s -> %s bytes", len(audio_content), len(processed))
+    return processed
+
+
+def recognition_config(platform):
+    speech = clients.speech_module()
+    # --- THIS IS THE FIX ---
+    # Use the correct config based on the platform
+    if platform == 'web':
+        logger.debug("Using WEB config (WEBM_OPUS)")
+        # Web sends WEBM_OPUS.
+        # Google requires sample_rate_hertz to be OMITTED for this format.
+        return speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+            language_code="en-US"
+        )
+    logger.debug("Using NATIVE config (LINEAR16)")
+    # Native (iOS/Android) sends LINEAR16 at 16000Hz
+    return speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=16000,
+        language_code="en-US"
+    )
+    # --- END OF FIX ---
+
+
+def transcription_result(response, correct_prompt):
+    """Response body for transcribe_audio from an STT recognize() response."""
+    if not response.results or not response.results[0].alternatives:
+        logger.debug("STT: No speech detected.")
+        # Use a generic message, not Korean
+        return dict(NO_SPEECH_RESULT)
+
+    transcription = response.results[0].alternatives[0].transcript.strip()
+    logger.debug("Transcribed: %r", transcription)
+
+    transcribed_norm = ''.join(c.lower() for c in transcription if c.isalnum() or c.isspace()).strip()
+    correct_norm = ''.join(c.lower() for c in correct_prompt if c.isalnum() or c.isspace()).strip()
+    
+    is_correct = (transcribed_norm == correct_norm)
+
+    logger.debug("Comparison: %r vs %r -> %s", transcribed_norm, correct_norm, is_correct)
+
+    return {
+        'is_correct': is_correct,
+        'transcribed_text': transcription
+    }
+
+
+def transcribe(audio_content, correct_prompt, platform, data, query_params):
+    """
+    Preprocess and recognize one recording; returns the transcribe_audio
+    response body. Raises on upstream errors. Also used by STT jobs.
+    """
+    audio_content = prepare_stt_audio(audio_content, platform, data, query_params)
+    if audio_content is None:
+        logger.debug("STT: silent clip rejected locally.")
+        return dict(NO_SPEECH_RESULT)
+    audio = clients.speech_module().RecognitionAudio(content=audio_content)
+
+    config = recognition_config(platform)
+
+    with upstream('stt').call() as deadline, timed('stt'):
+        response = clients.speech_client().recognize(config=config, audio=audio, timeout=deadline)
+
+    return transcription_result(response, correct_prompt)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@parser_classes(AUDIO_UPLOAD_PARSERS)
+def transcribe_audio(request):
+    """
+    Accepts the recording as JSON `audio_base64`, a multipart `audio` file,
+    or a raw `audio/*` body with ?prompt=...&platform=... in the query string.
+    """
+    if not clients.stt_ready():
+        logger.error("Google Cloud STT client not initialized/configured.")
+        return Response({'error': 'Audio transcription not configured.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    too_large = upload_too_large(request.META)
+    if too_large:
+        return Response(too_large, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    audio_upload, correct_prompt, platform = transcribe_inputs(request.data, request.query_params, request.content_type)
+
+    if not audio_upload or not correct_prompt:
+        return Response({'error': 'Missing audio data or correct prompt'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        audio_content = read_upload_audio(audio_upload)
+        return Response(transcribe(audio_content, correct_prompt, platform, request.data, request.query_params))
+
+    except UpstreamUnavailable as e:
+        logger.warning("Google Cloud STT unavailable: %s", e)
+        return Response({'error': f'Failed to transcribe audio: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
-        print(f"Error calling Google Cloud STT API: {e}")
-        print(traceback.format_exc())
+        logger.exception("Error calling Google Cloud STT API: %s", e)
         return Response({'error': f'Failed to transcribe audio: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -263,47 +707,298 @@ def complete_lesson(request):
 
     if not lesson_id:
         return Response({'error': 'lesson_id not provided'}, status=status.HTTP_400_BAD_REQUEST)
-
     try:
-        lesson = Lesson.objects.get(id=lesson_id)
-    except Lesson.DoesNotExist:
+        lesson_id = int(lesson_id)
+    except (TypeError, ValueError):
+        return Response({'error': 'Invalid lesson_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # One transaction: insert-on-conflict for the progress row, F()-style increment for XP.
+    # XP is only added if the lesson was just completed (see api/progress.py)
+    result = record_lesson_completions(user, [lesson_id])
+    if result.not_found:
         return Response({'error': 'Lesson not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    # --- FIX 3: Correct logic. Use 'created' not 'progress.completed' ---
-    # get_or_create checks if the (user, lesson) pair exists.
-    # 'created' will be True if this is the first time, False otherwise.
-    progress, created = UserLessonProgress.objects.get_or_create(
-        user=user,
-        lesson=lesson
-    )
-
-    xp_gained = 0
-    if created:
-        # Only add XP if the lesson was just completed
-        xp_gained = 100 
-        user.experience_points += xp_gained
-        user.save()
-        print(f"User {user.username} completed {lesson.title}. Total XP: {user.experience_points}")
+    if result.completed:
+        logger.debug("User %s completed lesson %s. Total XP: %s", user.username, lesson_id, result.total_experience_points)
     else:
-        print(f"User {user.username} already completed {lesson.title}. No XP added.")
-    # --- END FIX ---
+        logger.debug("User %s already completed lesson %s. No XP added.", user.username, lesson_id)
 
     return Response({
         'status': 'Lesson completed',
-        'xp_gained': xp_gained,
-        'total_experience_points': user.experience_points
+        'xp_gained': result.xp_gained,
+        'total_experience_points': result.total_experience_points
     }, status=status.HTTP_200_OK)
 
-# --- LessonViewSet (remains the same) ---
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def complete_lessons(request):
+    """
+    Batch version of complete_lesson, e.g. for syncing progress made offline.
+    Body: {"lesson_ids": [1, 2, 3]}. Costs the same few queries for any batch size.
+    """
+    lesson_ids = request.data.get('lesson_ids')
+    if not isinstance(lesson_ids, list) or not lesson_ids:
+        return Response({'error': 'lesson_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(lesson_ids) > MAX_BATCH_SIZE:
+        return Response({'error': f'At most {MAX_BATCH_SIZE} lessons per request'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        lesson_ids = [int(lesson_id) for lesson_id in lesson_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'lesson_ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = record_lesson_completions(request.user, lesson_ids)
+    logger.debug("User %s synced %s lessons, %s new. Total XP: %s",
+                 request.user.username, len(lesson_ids), len(result.completed), result.total_experience_points)
+    return Response(result._asdict(), status=status.HTTP_200_OK)
+
+# --- Leaderboard (api/leaderboard.py) ---
+def _bounded_int(value, default, maximum):
+    try:
+        return min(max(int(value), 1), maximum)
+    except (TypeError, ValueError):
+        return default
+
+
+def _leaderboard_entry(entry):
+    return {'rank': entry.rank, 'username': entry.username, 'experience_points': entry.experience_points}
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def leaderboard(request):
+    """GET /api/leaderboard/?limit=10 - the top learners by XP."""
+    limit = _bounded_int(request.query_params.get('limit'), ranking.DEFAULT_TOP, ranking.MAX_TOP)
+    entries, total_users = ranking.top(limit)
+    return Response({'total_users': total_users, 'results': [_leaderboard_entry(e) for e in entries]})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def my_leaderboard_rank(request):
+    """GET /api/leaderboard/me/?neighbors=2 - my rank plus the learners just above and below me."""
+    neighbors = _bounded_int(request.query_params.get('neighbors'), ranking.DEFAULT_NEIGHBORS, ranking.MAX_NEIGHBORS)
+    me, above, below, total_users = ranking.around(request.user, neighbors)
+    return Response({
+        **_leaderboard_entry(me),
+        'total_users': total_users,
+        'above': [_leaderboard_entry(e) for e in above],
+        'below': [_leaderboard_entry(e) for e in below],
+    })
+
+# --- Background jobs (api/jobs.py) ---
+def job_response_body(job):
+    return {**jobs.job_body(job), 'poll_url': reverse('job-detail', args=[job.pk])}
+
+
+def _job_response(job, status_code=status.HTTP_200_OK):
+    body = job_response_body(job)
+    response = Response(body, status=status_code)
+    if status_code == status.HTTP_202_ACCEPTED:
+        response['Location'] = body['poll_url']
+    return response
+
+
+def _stt_job_inputs(request):
+    """(payload, audio bytes, None) for an STT job, or (None, None, error Response) on bad input."""
+    too_large = upload_too_large(request.META)
+    if too_large:
+        return None, None, Response(too_large, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    audio_upload, correct_prompt, platform = transcribe_inputs(request.data, request.query_params, request.content_type)
+    if not audio_upload or not correct_prompt:
+        return None, None, Response({'error': 'Missing audio data or correct prompt'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        audio_content = read_upload_audio(audio_upload)
+    except ValueError: # Bad base64
+        return None, None, Response({'error': 'Invalid audio data'}, status=status.HTTP_400_BAD_REQUEST)
+    if not audio_content:
+        return None, None, Response({'error': 'Missing audio data or correct prompt'}, status=status.HTTP_400_BAD_REQUEST)
+    payload = {'prompt': correct_prompt, 'platform': platform}
+    for name in ('sample_rate', 'channels'): # Read by prepare_stt_audio when the job runs
+        value = request.data.get(name) or request.query_params.get(name)
+        if value:
+            payload[name] = value
+    return payload, audio_content, None
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@parser_classes(AUDIO_UPLOAD_PARSERS)
+def submit_job(request):
+    """
+    POST /api/jobs/ - queue slow AI work and return 202 at once.
+    Body: `kind` ('tts', 'stt' or 'chat') plus the fields the matching endpoint
+    takes. STT accepts every transcribe_audio upload shape (?kind=stt with a
+    raw audio body). Poll the returned poll_url for the result.
+    """
+    too_large = upload_too_large(request.META)
+    if too_large:
+        return Response(too_large, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    kind = request.data.get('kind') or request.query_params.get('kind')
+    audio_content = None
+
+    if kind == 'tts':
+        text_to_speak = request.data.get('text', '')
+        if not text_to_speak: return Response({'error': 'No text provided for audio'}, status=status.HTTP_400_BAD_REQUEST)
+        payload = {'text': text_to_speak}
+    elif kind == 'chat':
+        user_message = request.data.get('message', '')
+        if not user_message: return Response({'error': 'No message provided'}, status=status.HTTP_400_BAD_REQUEST)
+        payload = {
+            'message': user_message,
+            'context': request.data.get('context', {}),
+            'lesson_id': request.data.get('lesson_id'),
+            'lesson_title': request.data.get('lesson_title', 'this lesson'),
+        }
+        try:
+            session = requested_tutor_session(request.user, request.data, payload['context'])
+        except tutor_sessions.SessionNotFound:
+            return Response(SESSION_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        if session is not None:
+            payload['session_id'] = session.pk
+    elif kind == 'stt':
+        payload, audio_content, error = _stt_job_inputs(request)
+        if error is not None:
+            return error
+    else:
+        return Response({'error': f"Unknown job kind, expected one of: {', '.join(jobs.KINDS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    job = jobs.submit(request.user, kind, payload, audio=audio_content)
+    return _job_response(job, status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def job_detail(request, job_id):
+    """
+    GET /api/jobs/<id>/ - the job's status, and its result once it succeeded.
+    Returns at once; the ?wait=N long-poll is served by the async view
+    (ASYNC_AI_VIEWS), which doesn't hold a worker thread while it waits.
+    """
+    job = Job.objects.filter(pk=job_id, user=request.user).defer('payload', 'audio').first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return _job_response(job)
+
+# --- LessonViewSet ---
+def _completed_lesson_ids(user):
+    if not (user and user.is_authenticated):
+        return set()
+    return set(UserLessonProgress.objects.filter(user=user).values_list('lesson_id', flat=True))
+
+
+def _json_bytes_response(request, body, etag):
+    """Pre-serialized JSON with an ETag; 304 when the client already has it."""
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag): # W/ too: compression weakens the ETag
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Per-user 'completed' flags are baked in, so only the client may cache it
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class LessonCursorPagination(CursorPagination):
+    # Off unless the client asks for it with ?page_size=, so the plain list keeps its shape
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+
+LESSON_FIELDS = ('id', 'title', 'level', 'topics', 'updated_at', 'completed')
+
+
+def _sparse_fields(request):
+    """Field names from ?fields=a,b (None: all fields). Raises ValueError for unknown names."""
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in LESSON_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(LESSON_FIELDS)}")
+    return fields
+
+
+def _updated_since(request):
+    """Aware datetime from ?updated_since= (ISO 8601), or None. Raises ValueError if unparsable."""
+    value = request.query_params.get('updated_since')
+    if not value:
+        return None
+    # An unescaped '+' in the UTC offset arrives as a space
+    since = parse_datetime(value.strip().replace(' ', '+'))
+    if since is None:
+        raise ValueError(f"Invalid updated_since: {value!r} (expected ISO 8601, e.g. 2024-05-01T12:00:00Z)")
+    return since if timezone.is_aware(since) else timezone.make_aware(since, timezone.utc)
+
+
 class LessonViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Lesson.objects.all().order_by('id')
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticated]
-    
+    pagination_class = LessonCursorPagination
+
+    # list/retrieve are served from the pre-serialized catalog snapshot (api/catalog.py);
+    # only the user's completed ids are read per request, from the replica if there is one
+    @reads_from_replica
+    def list(self, request, *args, **kwargs):
+        """
+        ?fields=id,title,level,completed  only these fields (e.g. without the big `topics`)
+        ?updated_since=<sync_token>       only lessons changed since then, as
+                                          {"sync_token", "lesson_ids", "results"}
+        ?page_size=N                      cursor pagination: {"next", "previous", "results"}
+        """
+        try:
+            fields = _sparse_fields(request)
+            since = _updated_since(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self.paginator.get_page_size(request) is not None:
+            return self._paginated_list(request, fields, since)
+
+        catalog = get_lesson_catalog()
+        completed_ids = _completed_lesson_ids(request.user)
+        etag = catalog.list_etag(completed_ids, fields, since)
+        if since is not None:
+            return _json_bytes_response(request, catalog.render_delta(completed_ids, since, fields), etag)
+        return _json_bytes_response(request, catalog.render_list(completed_ids, fields), etag)
+
+    def _paginated_list(self, request, fields, since):
+        # Pages are read from the database, so a cursor stays valid across catalog rebuilds
+        queryset = self.get_queryset()
+        if since is not None:
+            queryset = queryset.filter(updated_at__gt=since)
+        if fields is not None and 'topics' not in fields:
+            queryset = queryset.defer('topics')
+        page = self.paginate_queryset(queryset)
+        context = self.get_serializer_context()
+        context['fields'] = fields
+        return self.get_paginated_response(LessonSerializer(page, many=True, context=context).data)
+
+    @reads_from_replica
+    def retrieve(self, request, *args, **kwargs):
+        catalog = get_lesson_catalog()
+        try:
+            lesson_id = int(kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            raise Http404
+        if lesson_id not in catalog:
+            raise Http404
+        completed = UserLessonProgress.objects.filter(user=request.user, lesson_id=lesson_id).exists()
+        return _json_bytes_response(
+            request, catalog.render_detail(lesson_id, completed), catalog.detail_etag(lesson_id, completed)
+        )
+
     # --- THIS IS THE MISSING PIECE ---
     # This function passes the 'request' object to the serializer
     # so the serializer can access request.user
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({'request': self.request})
-        return context
\ No newline at end of file
+        # One query for the user's completed lessons instead of one per lesson
+        context['completed_lesson_ids'] = _completed_lesson_ids(self.request.user)
+        return context
@@ -20,6 +20,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware', # First, so the latency histograms cover the whole stack
+    'api.compression.CompressionMiddleware', # gzip/br for large JSON; skips audio and streams
     'corsheaders.middleware.CorsMiddleware', # Must be high up
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -37,14 +39,44 @@ TEMPLATES = [{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIR
     'django.contrib.auth.context_processors.auth', 'django.contrib.messages.context_processors.messages',],},},]
 WSGI_APPLICATION = 'superlingo_be.wsgi.application'
 
-DATABASES = {'default': {
-    'ENGINE': 'django.db.backends.postgresql',
-    'NAME': os.environ.get('DB_NAME'),
-    'USER': os.environ.get('DB_USER'),
-    'PASSWORD': os.environ.get('DB_PASSWORD'),
-    'HOST': os.environ.get('DB_HOST'), # Use the service name from docker-compose
-    'PORT': os.environ.get('DB_PORT'),
-}}
+# DB_ENGINE=sqlite runs against local files (DB_NAME, default db.sqlite3) instead of Postgres.
+# Connections are kept open for DB_CONN_MAX_AGE seconds and checked before reuse; under an
+# ASGI server set DB_CONN_MAX_AGE=0 and put a pooler (e.g. PgBouncer) in front instead.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'postgresql')
+if DB_ENGINE == 'sqlite':
+    _db = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.environ.get('DB_NAME') or str(BASE_DIR / 'db.sqlite3')}
+else:
+    _db = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME'),
+        'USER': os.environ.get('DB_USER'),
+        'PASSWORD': os.environ.get('DB_PASSWORD'),
+        'HOST': os.environ.get('DB_HOST'), # Use the service name from docker-compose
+        'PORT': os.environ.get('DB_PORT'),
+    }
+_db.update(
+    CONN_MAX_AGE=int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    CONN_HEALTH_CHECKS=os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes'),
+)
+DATABASES = {'default': _db}
+
+# Optional read replica for the lesson endpoints (api/db_router.py): DB_REPLICA_HOST for
+# Postgres (other settings as the primary unless DB_REPLICA_NAME/PORT/USER/PASSWORD are set),
+# or DB_REPLICA_NAME alone for a second SQLite file in local tests.
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **_db,
+        **{key: os.environ[f'DB_REPLICA_{key}'] for key in ('HOST', 'PORT', 'NAME', 'USER', 'PASSWORD')
+           if os.environ.get(f'DB_REPLICA_{key}')},
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# Seconds a user's lesson reads stay on the primary after they complete a lesson (cover the
+# replica's lag), the shared Django cache that makes that hold across workers, and how long
+# to use the primary after the replica fails to connect
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE_ALIAS = os.environ.get('REPLICA_PIN_CACHE_ALIAS') or None
+REPLICA_RETRY_AFTER = int(os.environ.get('REPLICA_RETRY_AFTER', 30))
 
 AUTH_PASSWORD_VALIDATORS = [{'NAME': f'django.contrib.auth.password_validation.{name}'} for name in
     ['UserAttributeSimilarityValidator', 'MinimumLengthValidator', 'CommonPasswordValidator', 'NumericPasswordValidator']]
@@ -54,10 +86,149 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'api.User' # Tell Django to use your custom User model
 
+# Token auth cache (api/authentication.py). TOKEN_AUTH_CACHE_ALIAS names an optional
+# shared Django cache (e.g. Redis) checked after the in-process one.
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_AUTH_CACHE_MAX_ENTRIES', 10000))
+TOKEN_AUTH_CACHE_ALIAS = os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or None
+
+# Route /api/chat/, /api/generate-gemini-audio/ and /api/transcribe-audio/ to the
+# async views (api/async_views.py). Use with an ASGI server, e.g.
+# `uvicorn superlingo_be.asgi:application`.
+ASYNC_AI_VIEWS = os.environ.get('ASYNC_AI_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Seconds before the in-process lesson catalog snapshot (api/catalog.py) is rebuilt
+# even without a Lesson change signal, so workers that didn't see the write catch up
+LESSON_CATALOG_MAX_AGE = int(os.environ.get('LESSON_CATALOG_MAX_AGE', 60))
+
+# Largest request body transcribe_audio (and STT jobs) accept: JSON base64, multipart or raw
+# audio/*. Checked by those views themselves; every other endpoint keeps Django's
+# DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB)
+TRANSCRIBE_MAX_UPLOAD_BYTES = int(os.environ.get('TRANSCRIBE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+
+# Trim silence / downmix / resample native LINEAR16 audio before STT (api/audio_preprocess.py)
+STT_PREPROCESS_ENABLED = os.environ.get('STT_PREPROCESS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Opt-in cache of tutor answers for repeated questions (api/tutor_cache.py)
+TUTOR_ANSWER_CACHE_ENABLED = os.environ.get('TUTOR_ANSWER_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+TUTOR_ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('TUTOR_ANSWER_CACHE_MAX_ENTRIES', 2048))
+TUTOR_ANSWER_CACHE_TTL = int(os.environ.get('TUTOR_ANSWER_CACHE_TTL', 24 * 60 * 60))
+
+# Multi-turn tutor sessions (api/tutor_sessions.py): estimated tokens of past turns sent with
+# each message (older ones too until they are summarized), target size of the rolling summary,
+# turns folded into it at a time, and how long (seconds) `session: true` keeps resuming the
+# same session for an activity
+TUTOR_HISTORY_TOKEN_BUDGET = int(os.environ.get('TUTOR_HISTORY_TOKEN_BUDGET', 1200))
+TUTOR_SUMMARY_MAX_TOKENS = int(os.environ.get('TUTOR_SUMMARY_MAX_TOKENS', 300))
+TUTOR_SUMMARY_BATCH = int(os.environ.get('TUTOR_SUMMARY_BATCH', 4))
+TUTOR_SESSION_IDLE_TIMEOUT = int(os.environ.get('TUTOR_SESSION_IDLE_TIMEOUT', 60 * 60))
+
+# TTS audio cache (api/tts_cache.py). Set TTS_CACHE_DIR to '' to keep it in memory only.
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', str(BASE_DIR / 'tts_cache'))
+TTS_CACHE_MEMORY_MAX_BYTES = int(os.environ.get('TTS_CACHE_MEMORY_MAX_BYTES', 32 * 1024 * 1024))
+TTS_CACHE_DISK_MAX_BYTES = int(os.environ.get('TTS_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024))
+# Pre-rendered lesson audio written by `manage.py prerender_tts` (never evicted)
+TTS_AUDIO_STORE_DIR = os.environ.get('TTS_AUDIO_STORE_DIR', str(BASE_DIR / 'tts_store'))
+
+# Seconds a request waits for an identical in-flight TTS/Gemini call (api/singleflight.py)
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 30))
+
+# Bulkheads and circuit breakers for the AI upstreams (api/resilience.py). Per upstream:
+# concurrent calls, callers allowed to queue for a slot, per-call deadline in seconds.
+# Override with e.g. GEMINI_MAX_CONCURRENT / GEMINI_MAX_QUEUE / GEMINI_TIMEOUT.
+UPSTREAM_LIMITS = {
+    name: {
+        'max_concurrent': int(os.environ.get(f'{name.upper()}_MAX_CONCURRENT', concurrent)),
+        'max_queue': int(os.environ.get(f'{name.upper()}_MAX_QUEUE', queue)),
+        'timeout': float(os.environ.get(f'{name.upper()}_TIMEOUT', timeout)),
+    }
+    for name, (concurrent, queue, timeout) in {'gemini': (8, 16, 30), 'tts': (8, 32, 15), 'stt': (4, 8, 20)}.items()
+}
+UPSTREAM_QUEUE_TIMEOUT = float(os.environ.get('UPSTREAM_QUEUE_TIMEOUT', 5))
+# Open the breaker when this share of the last CIRCUIT_BREAKER_WINDOW calls failed (after
+# at least CIRCUIT_BREAKER_MIN_CALLS); try one call again after CIRCUIT_BREAKER_RESET_TIMEOUT seconds
+CIRCUIT_BREAKER_ERROR_RATE = float(os.environ.get('CIRCUIT_BREAKER_ERROR_RATE', 0.5))
+CIRCUIT_BREAKER_WINDOW = int(os.environ.get('CIRCUIT_BREAKER_WINDOW', 20))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.environ.get('CIRCUIT_BREAKER_MIN_CALLS', 10))
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_BREAKER_RESET_TIMEOUT', 30))
+
+# 'fake' serves Gemini / Cloud TTS / Cloud STT from the in-process stand-ins in api/fakes.py
+# (load tests with `manage.py benchmark`, local development without credentials)
+AI_BACKEND = os.environ.get('AI_BACKEND', 'google')
+# Fake upstream behaviour: median latency (s), lognormal jitter (sigma), share of calls that fail.
+# Override with e.g. FAKE_GEMINI_LATENCY / FAKE_GEMINI_JITTER / FAKE_GEMINI_ERROR_RATE.
+FAKE_AI = {
+    name: {
+        'latency': float(os.environ.get(f'FAKE_{name.upper()}_LATENCY', latency)),
+        'jitter': float(os.environ.get(f'FAKE_{name.upper()}_JITTER', 0.3)),
+        'error_rate': float(os.environ.get(f'FAKE_{name.upper()}_ERROR_RATE', 0)),
+    }
+    for name, latency in {'gemini': 0.8, 'tts': 0.3, 'stt': 0.5}.items()
+}
+FAKE_AI_SEED = int(os.environ.get('FAKE_AI_SEED', 0))
+
+# Background jobs (api/jobs.py, `manage.py run_job_worker`): attempts per job, first retry
+# delay in seconds (doubles each retry), longest ?wait= a poll may hold a request for (async view),
+# seconds before a running job whose worker vanished is requeued, days finished jobs are kept
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', 5))
+JOB_LONG_POLL_MAX = float(os.environ.get('JOB_LONG_POLL_MAX', 20))
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 300))
+JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))
+# Seconds an idle worker sleeps between queue polls
+JOB_WORKER_POLL_INTERVAL = float(os.environ.get('JOB_WORKER_POLL_INTERVAL', 1))
+
+# Response compression (api/compression.py): bodies smaller than COMPRESSION_MIN_BYTES are
+# sent as-is; brotli is used when installed and accepted, gzip otherwise
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+# Prometheus metrics at /metrics (api/metrics.py). Scrapers send `Authorization: Bearer
+# <METRICS_TOKEN>`; without a token set only logged-in staff (admin session) can read it.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Logging for the api app: API_LOG_LEVEL is DEBUG/INFO/WARNING/ERROR or OFF,
+# API_LOG_FORMAT is 'json' (one record per line, api/log.py) or 'text'
+API_LOG_LEVEL = os.environ.get('API_LOG_LEVEL', 'INFO').upper()
+API_LOG_FORMAT = os.environ.get('API_LOG_FORMAT', 'json')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'api.log.JsonFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': API_LOG_FORMAT},
+        'null': {'class': 'logging.NullHandler'},
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['null'] if API_LOG_LEVEL == 'OFF' else ['console'],
+            'level': 'CRITICAL' if API_LOG_LEVEL == 'OFF' else API_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # REST Framework settings
 REST_FRAMEWORK = {
+    # orjson-backed JSON in and out (api/renderers.py, api/parsers.py); same bytes as DRF's
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication with a token -> user cache (api/authentication.py)
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly', # Or adjust as needed